@@ -1,8 +1,8 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import time
+import os, time
 
-from modules.auth import auth_bp
+from modules.auth import auth_bp, protect
 from modules.threats import threats_bp
 from modules.commands import commands_bp
 from modules.ledger import ledger_bp
@@ -10,13 +10,42 @@ from modules.incidents import incidents_bp
 from modules.ws import ws_bp
 from modules.ops import ops_bp
 from modules.airspace import airspace_bp
-from modules.ai import ai_bp
+from modules.ai import ai_bp, start_model_loading
+from modules.sensors import sensors_bp
+from modules.mqtt_bridge import mqtt_bp, start_bridge_from_env
+from modules.metrics import metrics_bp, instrument_app
+from modules.replay import replay_bp
+from modules.jsonio import OrjsonProvider
+from modules import shared_state, store
 from modules.commands import COMMAND_LOG, DRONE_STATE
 from modules.threats import THREATS
 from modules.ledger import LEDGER
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# Request bodies are capped (default 32 MiB, covers bulk NDJSON, frames and sensor captures)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 2**20))
 CORS(app)
+instrument_app(app)
+
+# Role enforcement per blueprint (see API_SPEC.md "Roles"); active when AUTH_REQUIRED=1
+READERS = ('operator', 'auditor', 'ml_admin')
+protect(threats_bp, READERS, ('operator',))
+protect(commands_bp, READERS, ('operator',))
+protect(incidents_bp, READERS, ('operator',), overrides={'incidents.close_incident': ('supervisor',)})
+protect(ledger_bp, READERS, ('supervisor',))
+protect(ops_bp, READERS, ('supervisor',))
+protect(airspace_bp, READERS, ('supervisor',), overrides={
+    'airspace.classify_points': READERS,  # read-only lookup that takes a POST body
+})
+protect(sensors_bp, READERS, ('operator',))
+protect(mqtt_bp, READERS, ('supervisor',))
+protect(metrics_bp, READERS, ('supervisor',))
+protect(replay_bp, READERS, ('supervisor',))
+protect(ai_bp, READERS, ('operator', 'ml_admin'), overrides={
+    'ai.configure_ai_model': ('ml_admin',),
+    'ai.reset_ai_system': ('ml_admin',),
+})
 
 # Blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -28,12 +57,36 @@ app.register_blueprint(ws_bp, url_prefix='/api')
 app.register_blueprint(ops_bp, url_prefix='/api')
 app.register_blueprint(airspace_bp, url_prefix='/api')
 app.register_blueprint(ai_bp)
+app.register_blueprint(sensors_bp, url_prefix='/api/sensors')
+app.register_blueprint(metrics_bp, url_prefix='/api')
+app.register_blueprint(mqtt_bp, url_prefix='/api/mqtt')
+app.register_blueprint(replay_bp, url_prefix='/api/replay')
+
+# Optional persistence (KAVACH_DB_URL=sqlite:///kavach.db or postgresql://...); hydrates the in-memory
+# collections before anything else can write to them
+store.init_store_from_env()
+
+# Multi-worker mode (KAVACH_STATE_SERVER, see modules/shared_state.py): replicate writes between
+# worker processes and serialize ledger appends through the state server
+shared_state.init_from_env(app)
+
+# YOLO (ENABLE_YOLO=1) loads in the background; /api/ai/ready reports when it is done
+start_model_loading()
+
+# Optional MQTT sensor ingestion (MQTT_BROKER_URL=mqtt://host:1883)
+start_bridge_from_env()
+
+@app.errorhandler(413)
+def body_too_large(e):
+    return jsonify({'error': 'body_too_large', 'detail': f"max {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
 
 @app.route('/api/health')
 def health():
     return jsonify({
         'status': 'ok',
-        'time': time.time()
+        'time': time.time(),
+        'store': store.STORE.status() if store.STORE else {'enabled': False},
+        'shared_state': shared_state.SHARED.status() if shared_state.SHARED else {'enabled': False}
     })
 
 @app.route('/api/dashboard/summary')
@@ -0,0 +1,50 @@
+"""Per-request JWT verification overhead, with and without the decoded-token cache.
+
+Run from backend/:  python -m benchmarks.bench_auth [--requests N]
+"""
+import argparse, time
+
+from modules.auth import AUTH_CONFIG, TOKEN_CACHE, issue_token, verify_token
+
+
+def _per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    n = args.requests
+
+    from app import app
+    client = app.test_client()
+    token = issue_token('operator', ['operator'])
+    headers = {'Authorization': f'Bearer {token}'}
+
+    print('verify_token()')
+    print(f"  uncached  {_per_call_us(lambda: verify_token(token, use_cache=False), n):8.2f} us/call")
+    verify_token(token)
+    print(f"  cached    {_per_call_us(lambda: verify_token(token), n):8.2f} us/call")
+
+    print('GET /api/threats/ via test client')
+    AUTH_CONFIG['required'] = False
+    baseline = _per_call_us(lambda: client.get('/api/threats/'), n)
+    AUTH_CONFIG['required'] = True
+    size = TOKEN_CACHE.maxsize
+    TOKEN_CACHE.maxsize = 0
+    TOKEN_CACHE.clear()
+    uncached = _per_call_us(lambda: client.get('/api/threats/', headers=headers), n)
+    TOKEN_CACHE.maxsize = size
+    cached = _per_call_us(lambda: client.get('/api/threats/', headers=headers), n)
+    print(f"  no auth           {baseline:8.2f} us/request")
+    print(f"  auth, no cache    {uncached:8.2f} us/request  (+{uncached - baseline:.2f})")
+    print(f"  auth, LRU cache   {cached:8.2f} us/request  (+{cached - baseline:.2f})")
+    print(f"  cache hits={TOKEN_CACHE.hits} misses={TOKEN_CACHE.misses}")
+
+
+if __name__ == '__main__':
+    main()
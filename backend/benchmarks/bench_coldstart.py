@@ -0,0 +1,80 @@
+"""Cold start: process launch to first 200 from /api/health, and to /api/ai/ready.
+
+Run from backend/:  python -m benchmarks.bench_coldstart [--runs 5] [--env ENABLE_YOLO=1]
+
+Each run starts a fresh interpreter serving app.py on a free port and polls until the
+endpoints answer 200. --backend points at another checkout's backend/ directory to compare
+against an older revision (it has no /api/ai/ready, which is then reported as n/a).
+"""
+import argparse, os, socket, statistics, subprocess, sys, time, urllib.error, urllib.request
+
+LAUNCH = ("import logging; logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+          "from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def run_once(backend_dir, env, timeout):
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', LAUNCH.format(port=port)], cwd=backend_dir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health = ready = None
+    try:
+        while time.perf_counter() - t0 < timeout and ready is None:
+            if proc.poll() is not None:
+                raise RuntimeError(f'server exited with {proc.returncode}')
+            if health is None and _status(base + '/api/health') == 200:
+                health = time.perf_counter() - t0
+            if health is not None:
+                code = _status(base + '/api/ai/ready')
+                if code == 404:
+                    ready = float('nan')
+                elif code == 200:
+                    ready = time.perf_counter() - t0
+            time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return health, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--backend', default=os.getcwd(), help='backend/ directory to start')
+    parser.add_argument('--env', action='append', default=[], help='KEY=VALUE for the server process')
+    args = parser.parse_args()
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='0')
+    env.update(kv.split('=', 1) for kv in args.env)
+
+    health, ready = [], []
+    for _ in range(args.runs):
+        h, r = run_once(args.backend, env, args.timeout)
+        health.append(h)
+        ready.append(r)
+    fmt = lambda xs: ('n/a' if any(x is None or x != x for x in xs)
+                      else f'median {statistics.median(xs) * 1e3:7.0f} ms  min {min(xs) * 1e3:7.0f} ms')
+    print(f"{args.runs} cold starts of {os.path.abspath(args.backend)} {' '.join(args.env)}")
+    print(f"  first 200 /api/health    {fmt(health)}")
+    print(f"  first 200 /api/ai/ready  {fmt(ready)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""/api/ai/frame throughput with and without the frame cache on a duplicate-heavy stream.
+
+Run from backend/:  python -m benchmarks.bench_frame_cache [--frames 600] [--repeat 3] [--model-ms 25]
+
+The stream mimics a low-fps camera polled by a faster browser loop: each distinct scene is
+sent ``--repeat`` times, half of the repeats byte-identical and half re-encoded at a
+different JPEG quality (near-duplicates only the perceptual hash catches). Without
+ultralytics installed, ``--model-ms`` stands in for YOLO inference time.
+"""
+import argparse, base64, time
+
+import numpy as np
+
+
+def _stream(frames, repeat, cv2, rng):
+    out = []
+    scenes = max(1, frames // repeat)
+    base = (rng.random((48, 64, 3)) * 255).astype(np.uint8)
+    for s in range(scenes):
+        img = cv2.resize(np.roll(base, s * 3, axis=1), (640, 480), interpolation=cv2.INTER_LINEAR)
+        for k in range(repeat):
+            quality = 90 if k % 2 == 0 else 75
+            out.append(base64.b64encode(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1]).decode())
+    return out[:frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--model-ms', type=float, default=25.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import cv2
+    import modules.ai as ai
+    from app import app
+
+    yolo = ai._ultralytics()
+    if yolo is None:
+        simulated = ai._run_inference
+
+        def model(frame):
+            time.sleep(args.model_ms / 1000)
+            return simulated(frame)
+        ai._run_inference = model
+
+    client = app.test_client()
+    stream = _stream(args.frames, args.repeat, cv2, np.random.default_rng(args.seed))
+    print(f"{len(stream)} frames, {args.repeat} sends per scene"
+          + ('' if yolo else f", simulated model {args.model_ms:.0f} ms"))
+    baseline = None
+    for label, cache in (('no cache', {'enabled': False}),
+                         ('exact hash', {'enabled': True, 'perceptual': False}),
+                         ('exact + dHash', {'enabled': True, 'perceptual': True})):
+        client.post('/api/ai/configure', json={'frame_cache': cache})
+        ai.FRAME_CACHE.stats.update(dict.fromkeys(ai.FRAME_CACHE.stats, 0))
+        t0 = time.perf_counter()
+        for b64 in stream:
+            assert client.post('/api/ai/frame', json={'image_base64': b64}).status_code == 200
+        secs = time.perf_counter() - t0
+        baseline = baseline or secs
+        snap = ai.FRAME_CACHE.snapshot()
+        print(f"  {label:<14} {len(stream) / secs:8.1f} frames/s  {secs / len(stream) * 1e3:7.2f} ms/frame"
+              f"  x{baseline / secs:4.1f}  hit_rate={snap['hit_rate'] if cache['enabled'] else 0:.2f}"
+              f"  saved={snap['saved_seconds'] if cache['enabled'] else 0:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Bulk threat ingest versus N single POSTs.
+
+Run from backend/:  python -m benchmarks.bench_ingest [--tracks 1000]
+"""
+import argparse, json, random, time
+
+
+def _tracks(n, rng):
+    return [{'class': rng.choice(['consumer_quadcopter', 'prosumer_quadcopter', 'jammer_sweep']),
+             'confidence': round(rng.uniform(0.5, 0.99), 2),
+             'location': {'lat': 28.5 + rng.uniform(-0.01, 0.01), 'lon': 77.6 + rng.uniform(-0.01, 0.01)},
+             'remote_id': f'RID-{i:06d}'} for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tracks', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import app
+    from modules.airspace import WHITELIST
+    from modules.whitelist import normalize_change
+    WHITELIST.add_rules(normalize_change([f'RID-{i:06d}' for i in range(0, args.tracks, 10)]))
+    client = app.test_client()
+    tracks = _tracks(args.tracks, random.Random(args.seed))
+    ndjson = '\n'.join(json.dumps(t) for t in tracks).encode()
+
+    t0 = time.perf_counter()
+    for t in tracks:
+        assert client.post('/api/threats/', json=t).status_code == 201
+    single = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    r = client.post('/api/threats/bulk', json=tracks)
+    bulk_json = time.perf_counter() - t0
+    assert r.json['created'] == args.tracks
+
+    t0 = time.perf_counter()
+    r = client.post('/api/threats/bulk', data=ndjson, content_type='application/x-ndjson')
+    bulk_nd = time.perf_counter() - t0
+    assert r.json['created'] == args.tracks
+
+    print(f"{args.tracks} tracks")
+    for name, secs in (('single POSTs', single), ('bulk JSON array', bulk_json), ('bulk NDJSON', bulk_nd)):
+        print(f"  {name:<16} {secs * 1e3:9.1f} ms  {args.tracks / secs:10.0f} tracks/s  x{single / secs:.1f}")
+
+
+if __name__ == '__main__':
+    main()
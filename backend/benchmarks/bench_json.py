@@ -0,0 +1,94 @@
+"""Response encoding time and size: Flask's stdlib provider versus the orjson provider.
+
+Run from backend/:  python -m benchmarks.bench_json [--records 50000] [--repeat 5]
+
+Collections mirror /api/threats/, /api/ledger/all and /api/ai/detections. The "native"
+rows build records with datetime / NumPy values and let the provider format them,
+instead of pre-formatting isoformat() strings on every record.
+"""
+import argparse, hashlib, time, uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from modules.jsonio import OrjsonProvider
+
+
+def _threats(n, rng, native=False):
+    t0 = datetime(2025, 1, 1)
+    conf = rng.uniform(0.5, 0.99, n).astype(np.float32)
+    lat = 28.5 + rng.uniform(-0.01, 0.01, n)
+    lon = 77.6 + rng.uniform(-0.01, 0.01, n)
+    out = []
+    for i in range(n):
+        ts = t0 + timedelta(seconds=i)
+        out.append({
+            'id': str(uuid.UUID(int=i)),
+            'class': 'consumer_quadcopter',
+            'confidence': conf[i] if native else round(float(conf[i]), 2),
+            'location': {'lat': float(lat[i]), 'lon': float(lon[i])},
+            'status': 'detected',
+            'created_at': ts if native else ts.isoformat() + 'Z',
+            'remote_id': f'RID-{i:06d}',
+            'authorized': bool(i % 10 == 0),
+        })
+    return out
+
+
+def _ledger(n):
+    prev = '0' * 64
+    out = []
+    for i in range(n):
+        h = hashlib.sha256(f'{prev}{i}'.encode()).hexdigest()
+        out.append({'id': str(uuid.UUID(int=i)), 'event_type': 'command_dispatch_drone',
+                    'payload': {'timestamp': f'2025-01-01T00:00:{i % 60:02d}Z', 'command': 'dispatch_drone',
+                                'threat_id': str(uuid.UUID(int=i + 1))},
+                    'payload_hash': h, 'prev_hash': prev, 'chain_hash': h})
+        prev = h
+    return out
+
+
+def _time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    app = Flask(__name__)
+    stdlib, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+    cases = [
+        ('threats (iso strings)', _threats(args.records, rng)),
+        ('threats (native)', _threats(args.records, rng, native=True)),
+        ('ledger entries', _ledger(args.records)),
+        ('detections x1000', _threats(1000, rng)),
+    ]
+    print(f"{'collection':<24}{'provider':<10}{'best ms':>10}{'MB':>8}{'speedup':>9}")
+    with app.app_context():
+        baseline = None
+        for name, records in cases:
+            for label, provider in (('stdlib', stdlib), ('orjson', fast)):
+                try:
+                    secs, size = _time(lambda: provider.response(records).get_data(), args.repeat)
+                except TypeError:
+                    # stdlib cannot encode datetime/float32; compare against the previous stdlib row
+                    print(f"{name:<24}{label:<10}{'unsupported':>10}")
+                    continue
+                if label == 'stdlib':
+                    baseline = secs
+                print(f"{name:<24}{label:<10}{secs * 1e3:10.1f}{size / 1e6:8.2f}{baseline / secs:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
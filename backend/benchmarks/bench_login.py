@@ -0,0 +1,54 @@
+"""Login throughput versus scrypt cost on the bounded KDF pool.
+
+Run from backend/:  python -m benchmarks.bench_login [--costs 12 13 14 15] [--threads 8]
+"""
+import argparse, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.credentials import LoginBusy, UserStore
+
+
+def _throughput(store, threads, duration):
+    done = busy = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal done, busy
+        while time.perf_counter() < deadline:
+            try:
+                store.authenticate('operator', 'op123')
+                ok = 1
+            except LoginBusy:
+                ok = 0
+            with lock:
+                done += ok
+                busy += 1 - ok
+
+    with ThreadPoolExecutor(threads) as ex:
+        for _ in range(threads):
+            ex.submit(worker)
+    return done / duration, busy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15], help='log2(N) values')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'log2N':>6} {'hash ms':>8} {'logins/s':>9} {'busy':>6}  (threads={args.threads}, kdf workers={args.workers})")
+    for cost in args.costs:
+        store = UserStore(n=2**cost, workers=args.workers, max_pending=args.threads)
+        store.add('operator', 'op123', ['operator'])
+        t0 = time.perf_counter()
+        store.authenticate('operator', 'op123')
+        single_ms = (time.perf_counter() - t0) * 1e3
+        rate, busy = _throughput(store, args.threads, args.duration)
+        print(f"{cost:>6} {single_ms:8.1f} {rate:9.1f} {busy:6d}")
+
+
+if __name__ == '__main__':
+    main()
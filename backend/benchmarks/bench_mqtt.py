@@ -0,0 +1,63 @@
+"""Sustained MQTT ingestion rate through the bridge, using the in-process broker stand-in.
+
+A publisher thread pushes compact detection messages as fast as it can for --duration
+seconds; reports messages/s and detections/s actually consumed plus drops per policy.
+
+Run from backend/:  python -m benchmarks.bench_mqtt [--records 10] [--duration 3]
+"""
+import argparse, random, time
+
+from modules.mqtt_bridge import LocalBroker, MQTTBridge, POLICIES, encode_detections
+
+
+def _payloads(records, rng, n=64):
+    out = []
+    for _ in range(n):
+        out.append(encode_detections([{
+            'class': rng.choice(['drone', 'consumer_quadcopter', 'bird']),
+            'confidence': rng.uniform(0.4, 0.99),
+            'lat': 28.5 + rng.uniform(-0.01, 0.01), 'lon': 77.6 + rng.uniform(-0.01, 0.01),
+            'remote_id': f'R{rng.randrange(10**6):06d}'} for _ in range(records)]))
+    return out
+
+
+def run(policy, records, duration, max_pending, batch_size):
+    broker = LocalBroker()
+    client = broker.client()
+    bridge = MQTTBridge(client, max_pending=max_pending, batch_size=batch_size, policy=policy)
+    client.connect()
+    bridge.start()
+    payloads = _payloads(records, random.Random(0))
+    sent = 0
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    while time.perf_counter() < deadline:
+        broker.publish(f'kavach/sensors/s{sent % 8}/detections', payloads[sent % len(payloads)])
+        sent += 1
+    bridge.drain()
+    elapsed = time.perf_counter() - t0
+    bridge.stop()
+    consumed = bridge.stats['received'] - bridge.stats['dropped']
+    return {'sent': sent, 'consumed': consumed, 'dropped': bridge.stats['dropped'],
+            'msgs_per_s': consumed / elapsed, 'detections_per_s': bridge.stats['detections'] / elapsed,
+            'batches': bridge.stats['batches']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10, help='detections per message')
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--max-pending', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    import app  # noqa: F401 - registers blueprints / stores as in production
+    print(f"{'policy':<12} {'sent':>8} {'consumed':>9} {'dropped':>8} {'msgs/s':>9} {'dets/s':>10} {'batches':>8}")
+    for policy in POLICIES:
+        r = run(policy, args.records, args.duration, args.max_pending, args.batch_size)
+        print(f"{policy:<12} {r['sent']:>8} {r['consumed']:>9} {r['dropped']:>8} "
+              f"{r['msgs_per_s']:>9.0f} {r['detections_per_s']:>10.0f} {r['batches']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""End-to-end pipeline throughput by replaying a capture (see modules/replay.py).
+
+Run from backend/:  python -m benchmarks.bench_replay [--capture captures/session.kvr] [--runs 2]
+
+Without --capture a session is recorded first through the test client: webcam frames
+(a share of them resent), camera ticks, seeded and posted threats, bulk ingest, dispatches
+and ledger notes. Each replay runs as fast as possible in a fresh interpreter. The script
+prints events/s, time per event kind, and whether every run produced the same digest.
+"""
+import argparse, base64, json, os, subprocess, sys, tempfile
+
+import numpy as np
+
+
+def record_session(path, args):
+    import cv2
+    from app import app
+    from modules.replay import RECORDER
+    from modules.commands import PIPELINE
+
+    rng = np.random.default_rng(args.seed)
+    base = (rng.random((48, 64, 3)) * 255).astype(np.uint8)
+    frames = [base64.b64encode(cv2.imencode('.jpg', cv2.resize(np.roll(base, (s // 64, s), axis=(0, 1)), (320, 240), interpolation=cv2.INTER_LINEAR))[1]).decode()
+              for s in range(max(1, args.frames // 3))]
+    client = app.test_client()
+    RECORDER.start(path, seed=args.seed)
+    threat_ids = []
+    for i in range(args.frames):
+        client.post('/api/ai/frame', json={'image_base64': frames[(i // 3) % len(frames)]})
+        if i % 10 == 0:
+            client.post('/api/ai/process', json={})
+        if i % 25 == 0:
+            client.post('/api/threats/seed', json={'count': 3})
+            r = client.post('/api/threats/', json={'class': 'consumer_quadcopter', 'confidence': 0.9,
+                                                   'location': {'lat': 28.5, 'lon': 77.6}})
+            threat_ids.append(r.get_json()['id'])
+        if i % 50 == 0:
+            client.post('/api/threats/bulk', json=[{'class': 'drone', 'confidence': round(float(c), 2)}
+                                                   for c in rng.uniform(0.5, 0.99, 20)])
+        if i % 40 == 0 and threat_ids:
+            client.post('/api/commands/dispatch', json={'threat_id': threat_ids[-1]})
+            client.post('/api/ledger/append', json={'event_type': 'operator_note', 'payload': {'frame': i}})
+    PIPELINE.drain(timeout=10)
+    return RECORDER.stop()
+
+
+def replay(path):
+    out = subprocess.run([sys.executable, '-m', 'modules.replay', 'run', path, '--speed', '0', '--json'],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--capture', help='existing capture to replay instead of recording one')
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--runs', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    path = args.capture
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'bench.kvr')
+        rec = record_session(path, args)
+        print(f"recorded {rec['events'] - 1} events, {rec['bytes'] / 1e6:.1f} MB "
+              f"({', '.join(f'{k}={v}' for k, v in rec['counts'].items() if k != 'header')})")
+
+    runs = [replay(path) for _ in range(args.runs)]
+    for i, r in enumerate(runs, 1):
+        print(f"  run {i}: {r['events']} events in {r['elapsed_s'] * 1e3:8.1f} ms  {r['events_per_s']:10.0f} events/s"
+              f"  threats+{r['threats_created']}  ledger+{r['ledger_appended']}  digest {r['digest'][:12]}")
+    print(f"  {'kind':<14}{'events':>8}{'us/event':>11}")
+    best = min(runs, key=lambda r: r['elapsed_s'])
+    for kind, n in best['by_kind'].items():
+        print(f"  {kind:<14}{n:8d}{best['seconds_by_kind'][kind] / n * 1e6:11.1f}")
+    print('deterministic' if len({r['digest'] for r in runs}) == 1 else 'MISMATCH: runs produced different outcomes')
+
+
+if __name__ == '__main__':
+    main()
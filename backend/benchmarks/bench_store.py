@@ -0,0 +1,63 @@
+"""Write throughput of the persistent store: one transaction per write versus write-behind batching.
+
+Run from backend/:  python -m benchmarks.bench_store [--writes 20000] [--url sqlite:///tmp/bench.db]
+
+"sync" commits every threat in its own transaction (what a naive write-through store does on
+the request path). "write-behind" times the enqueue (the cost seen by a request) and the
+total time until the last batch is durable.
+"""
+import argparse, json, os, random, tempfile, time, uuid
+
+from modules.store import WriteBehindStore, open_backend
+
+
+def _threats(n, rng):
+    return [{'id': str(uuid.uuid4()), 'class': rng.choice(['consumer_quadcopter', 'jammer_sweep']),
+             'confidence': round(rng.uniform(0.5, 0.99), 2),
+             'location': {'lat': 28.5 + rng.uniform(-0.01, 0.01), 'lon': 77.6 + rng.uniform(-0.01, 0.01)},
+             'status': 'detected', 'created_at': f'2025-01-01T00:00:{i % 60:02d}Z',
+             'remote_id': f'RID-{i:06d}', 'authorized': False} for i in range(n)]
+
+
+def _fresh_url(url, tag):
+    if url:
+        return url
+    return 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='kavach-bench-'), f'{tag}.db')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writes', type=int, default=20000)
+    parser.add_argument('--url', help='KAVACH_DB_URL to test (default: temporary SQLite files)')
+    parser.add_argument('--batch', type=int, nargs='+', default=[100, 1000])
+    args = parser.parse_args()
+    threats = _threats(args.writes, random.Random(0))
+
+    store = WriteBehindStore(open_backend(_fresh_url(args.url, 'sync')), batch_size=1)
+    sql = store._upsert_sql['threats']
+    t0 = time.perf_counter()
+    for t in threats:
+        store.backend.execute_batch([(sql, [(t['id'], t['created_at'], json.dumps(t))])])
+    sync = time.perf_counter() - t0
+    store.close()
+    print(f"{args.writes} threat upserts")
+    print(f"  {'sync (1 txn/write)':<26} {sync * 1e3:9.1f} ms  {args.writes / sync:10.0f} writes/s"
+          f"  {sync / args.writes * 1e6:7.1f} us/write on request path")
+
+    for batch in args.batch:
+        store = WriteBehindStore(open_backend(_fresh_url(args.url, f'wb{batch}')), batch_size=batch,
+                                 max_pending=args.writes + 1)
+        t0 = time.perf_counter()
+        for t in threats:
+            store.upsert('threats', t)
+        enqueue = time.perf_counter() - t0
+        store.flush(timeout=600)
+        total = time.perf_counter() - t0
+        txns = store.stats['transactions']
+        store.close()
+        print(f"  {f'write-behind batch={batch}':<26} {total * 1e3:9.1f} ms  {args.writes / total:10.0f} writes/s"
+              f"  {enqueue / args.writes * 1e6:7.1f} us/write on request path  ({txns} txns, x{sync / total:.1f})")
+
+
+if __name__ == '__main__':
+    main()
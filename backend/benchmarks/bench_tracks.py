@@ -0,0 +1,108 @@
+"""Track updates and intercept prediction across thousands of concurrent tracks (see modules/tracks.py).
+
+Run from backend/:  python -m benchmarks.bench_tracks [--tracks 5000] [--rounds 30]
+
+Each round brings one noisy fix per track (constant-velocity targets, 1 Hz). Timed:
+ - update: one vectorized TrackStore.update_many per round versus one call per fix
+ - predict: intercept solutions for every active track in one pass versus one track at a time
+ - POST /api/threats/positions with one fix per track (track, location and zone updates)
+The predicted intercept points are checked against the true target paths (median miss).
+"""
+import argparse, math, time
+
+import numpy as np
+
+BASE = (28.5, 77.6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tracks', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--speed', type=float, default=25.0, help='interceptor speed, m/s')
+    parser.add_argument('--noise', type=float, default=2.0, help='fix noise, metres')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    from modules.tracks import METERS_PER_DEG, TrackStore
+    kx = METERS_PER_DEG * math.cos(math.radians(BASE[0]))
+    n = args.tracks
+    ids = [f'trk-{i}' for i in range(n)]
+    # start 1-5 km out, 5-20 m/s in random directions
+    r, a = rng.uniform(1000, 5000, n), rng.uniform(0, 2 * np.pi, n)
+    x0, y0 = r * np.cos(a), r * np.sin(a)
+    v, h = rng.uniform(5, 20, n), rng.uniform(0, 2 * np.pi, n)
+    vx, vy = v * np.cos(h), v * np.sin(h)
+    t0 = 1.7e9
+
+    def fix(k):
+        x = x0 + vx * k + rng.normal(0, args.noise, n)
+        y = y0 + vy * k + rng.normal(0, args.noise, n)
+        return BASE[0] + y / METERS_PER_DEG, BASE[1] + x / kx
+
+    fixes = [fix(k) for k in range(args.rounds)]
+    batched = TrackStore()
+    t = time.perf_counter()
+    for k, (lat, lon) in enumerate(fixes):
+        batched.update_many(ids, lat, lon, t0 + k)
+    vec_update = (time.perf_counter() - t) / (n * args.rounds)
+
+    single = TrackStore()
+    m = min(n, 1000)
+    t = time.perf_counter()
+    for k, (lat, lon) in enumerate(fixes):
+        for i in range(m):
+            single.update_many([ids[i]], [lat[i]], [lon[i]], t0 + k)
+    one_update = (time.perf_counter() - t) / (m * args.rounds)
+    print(f"{n} tracks x {args.rounds} fixes, history {batched.history}")
+    print(f"  update   batched {1 / vec_update:12,.0f} fixes/s   per fix {1 / one_update:10,.0f} fixes/s   x{one_update / vec_update:5.0f}")
+
+    now = t0 + args.rounds - 1
+    t = time.perf_counter()
+    _, solutions = batched.predict_all(*BASE, args.speed, now=now)
+    vec_predict = time.perf_counter() - t
+    t = time.perf_counter()
+    for i in range(m):
+        single.predict(ids[i], *BASE, args.speed, now=now)
+    one_predict = (time.perf_counter() - t) / m * n
+    print(f"  predict  all tracks {vec_predict * 1e3:8.1f} ms   one at a time {one_predict * 1e3:8.1f} ms   x{one_predict / vec_predict:5.0f}"
+          f"   (extrapolated from {m})")
+
+    # miss distance: true target position at the predicted time versus the aim point
+    index = {tid: i for i, tid in enumerate(ids)}
+    miss, unreachable = [], 0
+    for s in solutions:
+        if not s['reachable']:
+            unreachable += 1
+            continue
+        i, tgo = index[s['threat_id']], s['time_to_go_s']
+        k = args.rounds - 1 + tgo
+        px, py = (s['point']['lon'] - BASE[1]) * kx, (s['point']['lat'] - BASE[0]) * METERS_PER_DEG
+        miss.append(math.hypot(x0[i] + vx[i] * k - px, y0[i] + vy[i] * k - py))
+    print(f"  accuracy median miss {np.median(miss):6.1f} m   p95 {np.percentile(miss, 95):6.1f} m"
+          f"   ({unreachable} of {n} tracks out-running the interceptor)")
+
+    from app import app
+    client = app.test_client()
+    lat, lon = fixes[0]
+    created = client.post('/api/threats/bulk', json=[{'class': 'drone', 'confidence': 0.8, 'location': {'lat': float(a), 'lon': float(b)}}
+                                                     for a, b in zip(lat[:10000], lon[:10000])]).get_json()
+    tids = [res['id'] for res in created['results']]
+    start = time.time()
+    secs = []
+    for k in range(1, min(args.rounds, 10)):
+        lat, lon = fixes[k]
+        body = [{'id': tid, 'lat': float(a), 'lon': float(b), 'ts': start + k} for tid, a, b in zip(tids, lat, lon)]
+        t = time.perf_counter()
+        resp = client.post('/api/threats/positions', json=body)
+        secs.append(time.perf_counter() - t)
+        assert resp.get_json()['accepted'] == len(tids), resp.get_json()
+    t = time.perf_counter()
+    client.get('/api/commands/drone/intercepts?limit=20')
+    print(f"  POST /api/threats/positions with {len(tids)} fixes: {np.median(secs) * 1e3:7.1f} ms"
+          f" ({len(tids) / np.median(secs):9,.0f} fixes/s)   GET /drone/intercepts {(time.perf_counter() - t) * 1e3:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
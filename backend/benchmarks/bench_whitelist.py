@@ -0,0 +1,111 @@
+"""Whitelist rule lookups, bulk loading and incremental reclassification.
+
+Run from backend/:  python -m benchmarks.bench_whitelist [--exact 100000] [--prefixes 2000] [--ranges 1000]
+
+ - lookups: WhitelistRules versus a set plus linear scans over prefixes and ranges
+ - bulk load: one text/plain POST of every exact ID versus one POST per ID (timed on a sample)
+ - reclassification: with --threats tracks present, a prefix / range change revisits only
+   the threats it can affect; compared against rescanning every threat
+"""
+import argparse, time
+
+import numpy as np
+
+
+def _ids(rng, n, prefix='RID'):
+    return [f'{prefix}-{x:08X}' for x in rng.integers(0, 2**32, n)]
+
+
+def _naive(exact, prefixes, ranges):
+    def contains(rid):
+        return rid in exact or any(rid.startswith(p) for p in prefixes) or any(lo <= rid <= hi for lo, hi in ranges)
+    return contains
+
+
+def _rate(fn, items):
+    t0 = time.perf_counter()
+    hits = sum(1 for x in items if fn(x))
+    secs = time.perf_counter() - t0
+    return len(items) / secs, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exact', type=int, default=100000)
+    parser.add_argument('--prefixes', type=int, default=2000)
+    parser.add_argument('--ranges', type=int, default=1000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--threats', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    from modules.whitelist import WhitelistRules, normalize_change
+    exact = _ids(rng, args.exact)
+    prefixes = [f'OP{i:04d}-' for i in range(args.prefixes)]
+    starts = rng.integers(0, 2**32 - 2**20, args.ranges)
+    ranges = [(f'FA3-{s:08X}', f'FA3-{s + 2**16:08X}') for s in starts]
+    change = normalize_change({'exact': exact, 'prefix': prefixes,
+                               'ranges': [{'from': lo, 'to': hi, 'operator': f'op{i}'} for i, (lo, hi) in enumerate(ranges)]})
+    rules = WhitelistRules()
+    t0 = time.perf_counter()
+    rules.add_rules(change)
+    print(f"rules: {args.exact} exact, {args.prefixes} prefixes, {args.ranges} ranges "
+          f"(indexed in {(time.perf_counter() - t0) * 1e3:.0f} ms)")
+
+    # a quarter each: exact hits, prefix hits, range candidates, misses
+    q = args.lookups // 4
+    probes = ([exact[i] for i in rng.integers(0, len(exact), q)]
+              + [f'{prefixes[i]}{j:06d}' for i, j in zip(rng.integers(0, len(prefixes), q), range(q))]
+              + _ids(rng, q, 'FA3') + _ids(rng, q, 'XYZ'))
+    rng.shuffle(probes)
+    fast, hits = _rate(rules.__contains__, probes)
+    sample = probes[:max(1000, args.lookups // 50)]
+    slow, _ = _rate(_naive(set(exact), prefixes, ranges), sample)
+    print(f"  lookup   rules {fast:12,.0f}/s   linear scan {slow:10,.0f}/s   x{fast / slow:6.0f}   ({hits} of {len(probes)} authorized)")
+    t0 = time.perf_counter()
+    matched = rules.match_many(probes)
+    print(f"  match_many over {len(probes)} ids: {(time.perf_counter() - t0) * 1e3:.0f} ms ({len(matched)} distinct ids matched)")
+
+    from app import app
+    from modules.airspace import WHITELIST, change_whitelist
+    from modules.threats import THREATS, add_threats, reclassify
+    client = app.test_client()
+
+    sample = exact[:1000]
+    t0 = time.perf_counter()
+    for rid in sample:
+        client.post('/api/airspace/whitelist', json={'remote_id': rid})
+    per_id = (time.perf_counter() - t0) / len(sample)
+    change_whitelist('replace', normalize_change([]))
+    t0 = time.perf_counter()
+    resp = client.post('/api/airspace/whitelist/rules', data='\n'.join(exact), content_type='text/plain')
+    bulk = time.perf_counter() - t0
+    assert resp.status_code == 200, resp.get_json()
+    print(f"  bulk load {len(exact)} ids: one POST {bulk * 1e3:8.0f} ms   one POST per id ~{per_id * len(exact):8.1f} s"
+          f" (extrapolated from {len(sample)})")
+
+    # threats: remote IDs spread over exact IDs, operator prefixes and range blocks
+    rids = (_ids(rng, args.threats // 2)
+            + [f'OP{i % 5000:04d}-{i:06d}' for i in range(args.threats // 4)]
+            + [f'FA3-{x:08X}' for x in rng.integers(0, 2**32, args.threats - args.threats // 2 - args.threats // 4)])
+    add_threats([{'id': f't{i}', 'class': 'drone', 'confidence': 0.8, 'location': {'lat': 28.5, 'lon': 77.6},
+                  'status': 'detected', 'created_at': '2025-01-01T00:00:00Z', 'remote_id': r,
+                  'authorized': r in WHITELIST} for i, r in enumerate(rids)])
+    print(f"  reclassification with {len(THREATS)} threats:")
+    for label, body in (('+1 prefix', {'prefix': ['OP4999-']}),
+                        ('+10 ranges', {'ranges': [{'from': f'FA3-{s:08X}', 'to': f'FA3-{s + 2**24:08X}'}
+                                                   for s in rng.integers(0, 2**32 - 2**24, 10)]}),
+                        ('+1000 exact', {'exact': rids[:1000]})):
+        t0 = time.perf_counter()
+        resp = client.post('/api/airspace/whitelist/rules', json=body).get_json()
+        incremental = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        assert not reclassify(None)  # already consistent: full rescan finds nothing to flip
+        full = time.perf_counter() - t0
+        print(f"    {label:<12} incremental {incremental * 1e3:8.2f} ms ({resp['reclassified']:5d} flipped)"
+              f"   full rescan {full * 1e3:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
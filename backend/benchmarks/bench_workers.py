@@ -0,0 +1,104 @@
+"""Throughput scaling from 1 to N worker processes sharing state through the state server.
+
+Run from backend/:  python -m benchmarks.bench_workers [--workers 1 2 4] [--duration 10] [--concurrency 16]
+
+For each N a fresh state server and N `app.run` worker processes are started; load
+threads are spread across the workers round-robin (standing in for a load balancer).
+A single process without the state server is measured first as the baseline. After each
+run every worker must report the same ledger head, ledger length and threat count.
+"""
+import argparse, json, os, secrets, socket, subprocess, sys, tempfile, time, urllib.request
+
+from benchmarks.loadtest import parse_mix, run
+from modules.shared_state import start_server
+
+LAUNCH = ("import logging; logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+          "from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)")
+DEFAULT_MIX = 'dashboard=50,sensor=25,dispatch=15,verify=10'
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=10) as r:
+        return json.loads(r.read())
+
+
+def _start_workers(n, env):
+    ports = [_free_port() for _ in range(n)]
+    procs = [subprocess.Popen([sys.executable, '-c', LAUNCH.format(port=p)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for p in ports]
+    urls = [f'http://127.0.0.1:{p}' for p in ports]
+    deadline = time.time() + 60
+    for url in urls:
+        while True:
+            try:
+                _get(url + '/api/health')
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError(f'{url} did not start')
+                time.sleep(0.05)
+    return urls, procs
+
+
+def _views(urls):
+    out = []
+    for url in urls:
+        summary = _get(url + '/api/ledger/summary?window=1')
+        out.append((summary['length'], summary['latest_chain_hash'], _get(url + '/api/dashboard/summary')['threat_count']))
+    return out
+
+
+def measure(n, shared, args):
+    env = dict(os.environ)
+    manager = None
+    if shared:
+        sock = os.path.join(tempfile.mkdtemp(prefix='kavach-state-'), 'state.sock')
+        authkey = secrets.token_hex(16)
+        manager = start_server(sock, authkey)
+        env.update(KAVACH_STATE_SERVER=sock, KAVACH_STATE_AUTHKEY=authkey)
+    urls, procs = _start_workers(n, env)
+    try:
+        results = run(urls, parse_mix(args.mix), args.concurrency, args.duration, seed=args.seed)
+        time.sleep(0.5)  # let queued commands land
+        for url in urls:  # a request triggers the catch-up sync
+            _get(url + '/api/health')
+        views = _views(urls)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+        if manager is not None:
+            manager.shutdown()
+    return results['meta'], views
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"mix={args.mix} concurrency={args.concurrency} duration={args.duration}s cpus={os.cpu_count()}")
+    baseline = None
+    for n, shared in [(1, False)] + [(n, True) for n in args.workers]:
+        meta, views = measure(n, shared, args)
+        baseline = baseline or meta['total_rps']
+        consistent = len(set(views)) == 1
+        label = f"{n} worker{'s' if n > 1 else ''}" + (' + state server' if shared else ' (no sharing)')
+        print(f"  {label:<30} {meta['total_rps']:8.1f} req/s  x{meta['total_rps'] / baseline:4.2f}"
+              f"  errors={meta['total_errors']}  ledger={views[0][0]} threats={views[0][2]}"
+              f"  {'consistent' if consistent else 'DIVERGED ' + str(views)}")
+
+
+if __name__ == '__main__':
+    main()
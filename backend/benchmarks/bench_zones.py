@@ -0,0 +1,92 @@
+"""Zone classification: many points against hundreds of polygons (see modules/zones.py).
+
+Run from backend/:  python -m benchmarks.bench_zones [--points 1000000] [--zones 300]
+
+ - indexed: ZoneIndex.classify_many (sort by longitude, bounding-box slices, vectorized even-odd test)
+ - brute force: the same vectorized test of every point against every polygon, no index
+   (timed on a sample, extrapolated)
+ - per point: ZoneSet.classify, the grid + ray cast path used for single threats and
+   interceptor updates (timed on a sample)
+Labels from the sampled paths are checked against the indexed result.
+"""
+import argparse, time
+
+import numpy as np
+
+
+def random_zones(rng, n, lat0=28.0, lon0=77.0, span=1.0):
+    """Star-shaped polygons with 12-40 vertices, a mix of restricted, buffer and corridor kinds."""
+    from modules.zones import normalize_zone
+    zones = []
+    for i in range(n):
+        c = rng.uniform((lat0, lon0), (lat0 + span, lon0 + span))
+        k = int(rng.integers(12, 41))
+        angles = np.sort(rng.uniform(0, 2 * np.pi, k))
+        radii = rng.uniform(0.005, 0.04, k)
+        zones.append(normalize_zone({'id': f'z{i}', 'kind': ('restricted', 'buffer', 'corridor')[i % 3],
+                                     'polygon': [[c[0] + r * np.sin(a), c[1] + r * np.cos(a)] for r, a in zip(radii, angles)]}))
+    return zones
+
+
+def brute_force(index, lat, lon):
+    """Top zone per point testing every polygon against every point."""
+    best = np.full(len(lat), -1.0)
+    top = np.full(len(lat), -1, dtype=np.int32)
+    for z in range(len(index.zones)):
+        inside = np.zeros(len(lat), dtype=bool)
+        x1, y1, y2, slope = index.edges[z]
+        for k in range(len(x1)):
+            inside ^= ((y1[k] > lat) != (y2[k] > lat)) & (lon < x1[k] + (lat - y1[k]) * slope[k])
+        sev = -0.5 if index.corridor[z] else index.severity[z]
+        upd = inside & (sev > best)
+        best[upd] = sev
+        top[upd] = z
+    return top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--points', type=int, default=1000000)
+    parser.add_argument('--zones', type=int, default=300)
+    parser.add_argument('--sample', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    from modules.zones import ZoneSet
+    zones = ZoneSet()
+    t0 = time.perf_counter()
+    zones.replace(random_zones(rng, args.zones))
+    index = zones.index
+    edges = sum(len(e[0]) for e in index.edges)
+    print(f"{args.zones} zones, {edges} edges (indexed in {(time.perf_counter() - t0) * 1e3:.0f} ms)")
+
+    lat = rng.uniform(27.95, 29.05, args.points)
+    lon = rng.uniform(76.95, 78.05, args.points)
+    t0 = time.perf_counter()
+    _, top, _ = index.classify_many(lat, lon)
+    indexed = time.perf_counter() - t0
+    print(f"  indexed      {args.points:>9} points {indexed * 1e3:9.0f} ms  {args.points / indexed:12,.0f} points/s"
+          f"   ({int((top >= 0).sum())} inside a zone)")
+
+    n = min(args.sample, args.points)
+    t0 = time.perf_counter()
+    brute = brute_force(index, lat[:n], lon[:n])
+    secs = (time.perf_counter() - t0) / n * args.points
+    print(f"  brute force  {args.points:>9} points {secs * 1e3:9.0f} ms  {args.points / secs:12,.0f} points/s"
+          f"   x{secs / indexed:5.1f} (extrapolated from {n})")
+
+    t0 = time.perf_counter()
+    single = [zones.classify(a, b) for a, b in zip(lat[:n].tolist(), lon[:n].tolist())]
+    secs = (time.perf_counter() - t0) / n * args.points
+    print(f"  per point    {args.points:>9} points {secs * 1e3:9.0f} ms  {args.points / secs:12,.0f} points/s"
+          f"   x{secs / indexed:5.1f} (extrapolated from {n})")
+
+    labels = [label and label['id'] for label in zones.classify_many(lat[:n], lon[:n])]
+    mismatched = sum(1 for a, b, c in zip(labels, single, brute.tolist())
+                     if a != (b and b['id']) or a != (index.zones[c]['id'] if c >= 0 else None))
+    print('labels agree' if not mismatched else f'MISMATCH on {mismatched} of {n} points')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""Concurrent mixed-workload load test for the KAVACH backend.
+
+Grown out of validate_system.py: instead of one sequential request per endpoint,
+N worker threads drive a weighted mix of realistic traffic for a fixed duration
+and per-endpoint latency percentiles and throughput are reported.
+
+Run from backend/:
+    python -m benchmarks.loadtest                       # in-process server on a free port
+    python -m benchmarks.loadtest --url http://localhost:8000 --concurrency 16 --duration 30
+    python -m benchmarks.loadtest --mix frame=5,dashboard=1 --out run.json
+    python -m benchmarks.loadtest --compare run.json   # exit 1 if p95 regressed > --threshold %
+
+Results JSON: { meta: {...}, endpoints: { name: {count, errors, rps, mean_ms, p50_ms, p95_ms, p99_ms} } }
+"""
+import argparse, http.client, json, logging, random, sys, threading, time, uuid
+from urllib.parse import urlsplit
+
+SAMPLE_FRAME_B64 = (
+    '/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDABALDA4MChAODQ4SERATGCgaGBYWGDEjJR0oOjM9PDkzODdASFxOQERXRTc4UG1R'
+    'V19iZ2hnPk1xeXBkeFxlZ2P/2wBDARESEhgVGC8aGi9jQjhCY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2Nj'
+    'Y2NjY2NjY2NjY2NjY2P/wAARCAAwAEADASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAA'
+    'AgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6'
+    'Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXG'
+    'x8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREA'
+    'AgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5'
+    'OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPE'
+    'xcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwDz+iiigAorc8Nafa332n7VF5mzbt+YjGc5'
+    '6H2rc/4R/S/+fX/yI3+Nc88TGEuVmMq0YuzOHoruP+Ef0v8A59f/ACI3+NcPV0q0al7FQqKewUUUVqaBRRRQB0vg7/l8/wCA'
+    'f+zV01ch4a1C1sftP2qXy9+3b8pOcZz0HvW5/wAJBpf/AD9f+Q2/wrzMRTk6jaRxVYyc20jTrzSu4/4SDS/+fr/yG3+FcPW2'
+    'EjKN7o0oRavdBRRRXadIUUUUAFFFFABRRRQAUUUUAf/Z'
+)
+# Scenario -> list of (endpoint name, method, path, body factory)
+SCENARIOS = {
+    'frame': [
+        ('POST /api/ai/frame', 'POST', '/api/ai/frame',
+         lambda: {'image_base64': 'data:image/jpeg;base64,' + SAMPLE_FRAME_B64, 'client_timestamp': int(time.time() * 1000)}),
+    ],
+    'dashboard': [
+        ('GET /api/dashboard/summary', 'GET', '/api/dashboard/summary', None),
+        ('GET /api/threats/', 'GET', '/api/threats/', None),
+        ('GET /api/ops/mode', 'GET', '/api/ops/mode', None),
+        ('GET /api/risk/score', 'GET', '/api/risk/score', None),
+        ('GET /api/ros/summary', 'GET', '/api/ros/summary', None),
+        ('GET /api/ledger/summary', 'GET', '/api/ledger/summary', None),
+        ('GET /api/commands/drone', 'GET', '/api/commands/drone', None),
+        ('GET /api/ai/detections', 'GET', '/api/ai/detections', None),
+    ],
+    'dispatch': [
+        ('POST /api/commands/dispatch', 'POST', '/api/commands/dispatch',
+         lambda: {'threat_id': str(uuid.uuid4()), 'coordinates': {'lat': 28.5, 'lon': 77.6}, 'idempotency_key': str(uuid.uuid4())}),
+        ('POST /api/commands/return', 'POST', '/api/commands/return', lambda: {'idempotency_key': str(uuid.uuid4())}),
+    ],
+    'verify': [
+        ('GET /api/ledger/verify', 'GET', '/api/ledger/verify', None),
+    ],
+    'sensor': [
+        ('POST /api/threats/', 'POST', '/api/threats/',
+         lambda: {'class': 'consumer_quadcopter', 'confidence': round(random.uniform(0.5, 0.99), 2),
+                  'location': {'lat': 28.5 + random.uniform(-0.01, 0.01), 'lon': 77.6 + random.uniform(-0.01, 0.01)}}),
+    ],
+}
+DEFAULT_MIX = 'dashboard=50,frame=25,sensor=10,dispatch=10,verify=5'
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def start_local_server():
+    """Serve the Flask app in-process on an ephemeral port; returns (base_url, server)."""
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # per-request access log would dominate
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+class Client:
+    """One keep-alive HTTP connection per worker thread, reopened on failure."""
+
+    def __init__(self, base_url, token=None):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {'Content-Type': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=data, headers=self.headers)
+                resp = self.conn.getresponse()
+                resp.read()
+                if resp.getheader('Connection', '').lower() == 'close' or resp.version == 10:
+                    self.conn.close()
+                    self.conn = None
+                return resp.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def run(base_url, mix, concurrency, duration, token=None, seed=None):
+    """base_url may be a list; worker threads are spread across the URLs round-robin."""
+    urls = [base_url] if isinstance(base_url, str) else list(base_url)
+    rng_seed = seed if seed is not None else int(time.time())
+    ops = []
+    weights = []
+    for scenario, weight in mix.items():
+        steps = SCENARIOS[scenario]
+        for step in steps:
+            ops.append(step)
+            weights.append(weight / len(steps))
+    samples = {}  # name -> list of latency seconds
+    errors = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(idx):
+        rng = random.Random(rng_seed + idx)
+        client = Client(urls[idx % len(urls)], token)
+        local, local_err = {}, {}
+        while time.perf_counter() < deadline:
+            name, method, path, body = rng.choices(ops, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                status = client.request(method, path, body() if body else None)
+                ok = status < 400
+            except Exception:
+                ok = False
+            local.setdefault(name, []).append(time.perf_counter() - t0)
+            if not ok:
+                local_err[name] = local_err.get(name, 0) + 1
+        with lock:
+            for name, values in local.items():
+                samples.setdefault(name, []).extend(values)
+            for name, n in local_err.items():
+                errors[name] = errors.get(name, 0) + n
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        values.sort()
+        endpoints[name] = {
+            'count': len(values),
+            'errors': errors.get(name, 0),
+            'rps': round(len(values) / elapsed, 2),
+            'mean_ms': round(sum(values) / len(values) * 1e3, 3),
+            'p50_ms': round(percentile(values, 0.50) * 1e3, 3),
+            'p95_ms': round(percentile(values, 0.95) * 1e3, 3),
+            'p99_ms': round(percentile(values, 0.99) * 1e3, 3),
+        }
+    total = sum(e['count'] for e in endpoints.values())
+    return {
+        'meta': {
+            'url': base_url,
+            'mix': mix,
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 3),
+            'seed': rng_seed,
+            'total_requests': total,
+            'total_errors': sum(e['errors'] for e in endpoints.values()),
+            'total_rps': round(total / elapsed, 2),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def print_report(results):
+    meta = results['meta']
+    print(f"{meta['total_requests']} requests in {meta['duration_s']}s "
+          f"({meta['total_rps']} req/s, {meta['total_errors']} errors) concurrency={meta['concurrency']}")
+    print(f"{'endpoint':<34} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, e in results['endpoints'].items():
+        print(f"{name:<34} {e['count']:>7} {e['errors']:>5} {e['rps']:>8.1f} {e['p50_ms']:>8.2f} {e['p95_ms']:>8.2f} {e['p99_ms']:>8.2f}")
+
+
+def compare(baseline, current, threshold_pct):
+    """Print per-endpoint p95/throughput deltas; return names whose p95 regressed past the threshold."""
+    regressions = []
+    print(f"\n{'endpoint':<34} {'p95 base':>9} {'p95 now':>9} {'delta':>8} {'rps delta':>10}")
+    for name, now in current['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if not base:
+            continue
+        delta = (now['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0.0
+        rps_delta = (now['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0.0
+        flag = '  REGRESSION' if delta > threshold_pct else ''
+        print(f"{name:<34} {base['p95_ms']:>9.2f} {now['p95_ms']:>9.2f} {delta:>+7.1f}% {rps_delta:>+9.1f}%{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KAVACH mixed-workload load test')
+    parser.add_argument('--url', help='target server; default starts the app in-process')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--token', help='bearer token when AUTH_REQUIRED=1')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--out', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='allowed p95 regression in percent')
+    args = parser.parse_args()
+
+    base_url, server = (args.url, None) if args.url else start_local_server()
+    try:
+        results = run(base_url, parse_mix(args.mix), args.concurrency, args.duration, args.token, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+    print_report(results)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Rolling time-bucketed threat aggregates.
+
+Two fixed-size rings of buckets are updated on every threat insert:
+ - per-second buckets covering the last 10 minutes (ops mode windows)
+ - per-minute buckets covering the last 24 hours (dashboard time-series)
+
+Each slot remembers which epoch second/minute it holds, so stale slots are
+ignored on read and overwritten on the next write; nothing ever needs to
+rescan THREATS. Lifetime totals back the risk score and ROS summary, including
+zone exposure: the summed zone severity of unauthorized threats (see zones.py) and how
+many of them sit inside a restricted zone.
+"""
+
+from datetime import datetime, timezone
+import threading
+import time
+
+
+class _Ring:
+    def __init__(self, slots, width_s):
+        self.slots = slots
+        self.width_s = width_s
+        self.keys = [-1] * slots
+        self.count = [0] * slots
+        self.max_conf = [0.0] * slots
+        self.unauthorized = [0] * slots
+
+    def add(self, ts, confidence, authorized):
+        key = int(ts // self.width_s)
+        i = key % self.slots
+        if self.keys[i] != key:
+            self.keys[i] = key
+            self.count[i] = 0
+            self.max_conf[i] = 0.0
+            self.unauthorized[i] = 0
+        self.count[i] += 1
+        if confidence > self.max_conf[i]:
+            self.max_conf[i] = confidence
+        if not authorized:
+            self.unauthorized[i] += 1
+
+    def reclassify(self, ts, delta):
+        """Move one threat in or out of the unauthorized count, if its slot is still held."""
+        key = int(ts // self.width_s)
+        i = key % self.slots
+        if self.keys[i] == key:
+            self.unauthorized[i] = max(0, self.unauthorized[i] + delta)
+
+    def window(self, now, seconds):
+        """Return (count, max_confidence, unauthorized) over the trailing ``seconds``."""
+        newest = int(now // self.width_s)
+        oldest = newest - min(self.slots, max(1, int(-(-seconds // self.width_s)))) + 1
+        count = unauthorized = 0
+        max_conf = 0.0
+        for i, key in enumerate(self.keys):
+            if oldest <= key <= newest:
+                count += self.count[i]
+                unauthorized += self.unauthorized[i]
+                if self.max_conf[i] > max_conf:
+                    max_conf = self.max_conf[i]
+        return count, max_conf, unauthorized
+
+    def series(self, now, seconds):
+        newest = int(now // self.width_s)
+        n = min(self.slots, max(1, int(-(-seconds // self.width_s))))
+        out = []
+        for key in range(newest - n + 1, newest + 1):
+            i = key % self.slots
+            hit = self.keys[i] == key
+            out.append({
+                't': key * self.width_s,
+                'count': self.count[i] if hit else 0,
+                'max_confidence': self.max_conf[i] if hit else 0.0,
+                'unauthorized': self.unauthorized[i] if hit else 0,
+            })
+        return out
+
+
+class ThreatAggregates:
+    def __init__(self, seconds=600, minutes=1440):
+        self._lock = threading.Lock()
+        self.per_second = _Ring(seconds, 1)
+        self.per_minute = _Ring(minutes, 60)
+        self.totals = {'threats': 0, 'unauthorized': 0, 'max_confidence': 0.0, 'incidents_open': 0,
+                       'zone_severity': 0.0, 'unauthorized_in_restricted': 0}
+
+    def record_threat(self, confidence, authorized, ts=None):
+        self.record_threats([(confidence, authorized)], ts)
+
+    def record_threats(self, items, ts=None):
+        """Record an iterable of (confidence, authorized) pairs under one lock acquisition."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for confidence, authorized in items:
+                confidence = float(confidence or 0)
+                self.per_second.add(ts, confidence, authorized)
+                self.per_minute.add(ts, confidence, authorized)
+                self.totals['threats'] += 1
+                if not authorized:
+                    self.totals['unauthorized'] += 1
+                if confidence > self.totals['max_confidence']:
+                    self.totals['max_confidence'] = confidence
+
+    def reclassify(self, threats):
+        """Adjust unauthorized counts for threats whose ``authorized`` flag was just flipped."""
+        with self._lock:
+            for t in threats:
+                delta = -1 if t.get('authorized') else 1
+                self.totals['unauthorized'] = max(0, self.totals['unauthorized'] + delta)
+                ts = _epoch(t.get('created_at'))
+                if ts is not None:
+                    self.per_second.reclassify(ts, delta)
+                    self.per_minute.reclassify(ts, delta)
+
+    def add_exposure(self, pairs, sign=1):
+        """Add (or with ``sign=-1`` remove) ``exposure()`` pairs from the zone totals."""
+        with self._lock:
+            for severity, restricted in pairs:
+                self.totals['zone_severity'] = max(0.0, self.totals['zone_severity'] + sign * severity)
+                self.totals['unauthorized_in_restricted'] = max(0, self.totals['unauthorized_in_restricted'] + sign * restricted)
+
+    def incident_opened(self):
+        with self._lock:
+            self.totals['incidents_open'] += 1
+
+    def incident_closed(self):
+        with self._lock:
+            self.totals['incidents_open'] = max(0, self.totals['incidents_open'] - 1)
+
+    def window(self, seconds, now=None):
+        """Aggregate over the trailing window, using second buckets when they cover it."""
+        now = time.time() if now is None else now
+        ring = self.per_second if seconds <= self.per_second.slots else self.per_minute
+        with self._lock:
+            count, max_conf, unauthorized = ring.window(now, seconds)
+        return {'count': count, 'max_confidence': max_conf, 'unauthorized': unauthorized}
+
+    def series(self, seconds, resolution='minute', now=None):
+        now = time.time() if now is None else now
+        ring = self.per_second if resolution == 'second' else self.per_minute
+        with self._lock:
+            return ring.series(now, seconds)
+
+    def rebuild(self, threats, incidents):
+        """Reset and recompute from full collections (startup hydration / state snapshots)."""
+        fresh = ThreatAggregates(self.per_second.slots, self.per_minute.slots)
+        for t in sorted(threats, key=lambda t: t.get('created_at') or ''):
+            fresh.record_threat(t.get('confidence'), t.get('authorized'), ts=_epoch(t.get('created_at')))
+        fresh.add_exposure(exposure(t) for t in threats)
+        fresh.totals['incidents_open'] = sum(1 for i in incidents if i.get('status') == 'open')
+        with self._lock:
+            self.per_second, self.per_minute, self.totals = fresh.per_second, fresh.per_minute, fresh.totals
+
+    def snapshot_totals(self):
+        with self._lock:
+            return dict(self.totals)
+
+
+def exposure(threat):
+    """(zone severity, in restricted zone) a threat contributes: nothing once it is authorized."""
+    zone = threat.get('zone')
+    if not zone or threat.get('authorized'):
+        return 0.0, 0
+    return float(zone['severity']), int(zone['kind'] == 'restricted')
+
+
+def _epoch(iso):
+    try:
+        return datetime.fromisoformat(iso.rstrip('Z')).replace(tzinfo=timezone.utc).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+AGGREGATES = ThreatAggregates()
@@ -8,7 +8,8 @@ Endpoints:
  GET   /api/ai/detections   -> recent detections
  POST  /api/ai/process      -> simulated frame processing (legacy)
  POST  /api/ai/frame        -> real (or simulated fallback) inference on client webcam frame
- GET   /api/ai/status       -> model statistics
+ GET   /api/ai/status       -> model statistics and model loading state
+ GET   /api/ai/ready        -> 200 once the model has loaded (or is not going to), 503 while loading
  POST  /api/ai/configure    -> adjust runtime parameters
  POST  /api/ai/reset        -> clear history
 
@@ -16,13 +17,17 @@ Environment toggle:
     ENABLE_YOLO=1  (attempt to load ultralytics YOLOv8 model)
 
 Notes:
+ - cv2 is imported on first use and ultralytics only when ENABLE_YOLO is set; the model is
+   loaded on a background thread started by start_model_loading(), so the API answers while
+   YOLO is still loading (a reload requested meanwhile gets 409)
  - Uses lightweight yolov8n.pt by default for speed
  - Falls back gracefully to simulated detections if model unavailable or errors occur
+ - Simulated values come from replay.RNG, and ids from replay.new_id (seeded while recording or
+   replaying), so recorded sessions replay identically
  - Bounding boxes returned in percentage coordinates for easy overlay
 """
 
 from flask import Blueprint, jsonify, request
-import random
 import time
 from datetime import datetime
 import uuid
@@ -33,17 +38,49 @@ import threading
 import numpy as np
 
 # KAVACH system imports
-from .threats import THREATS, WHITELIST
-
-
-try:  # Optional heavy deps
-        from ultralytics import YOLO  # type: ignore
-        import cv2  # type: ignore
-        YOLO_AVAILABLE = True
-except Exception:  # pragma: no cover - environment fallback
-        YOLO_AVAILABLE = False
-        YOLO = None  # type: ignore
-        cv2 = None  # type: ignore
+from .threats import THREATS, WHITELIST, add_threat
+from .metrics import span, timed
+from .frame_cache import FrameCache, content_key, dhash
+from .replay import RECORDER, RNG, new_id
+from . import shared_state
+
+# Optional heavy deps, imported on first use: cv2 (frame decoding) by _opencv(), ultralytics
+# only by _ultralytics() when ENABLE_YOLO asks for the model
+YOLO_AVAILABLE = None  # unknown until first import attempt
+YOLO = None  # type: ignore
+cv2 = None  # type: ignore
+CV2_AVAILABLE = None
+_import_lock = threading.Lock()
+
+
+def _opencv():
+    """Import cv2 on first use; returns the module or None."""
+    global CV2_AVAILABLE, cv2
+    if CV2_AVAILABLE is None:
+        with _import_lock:
+            if CV2_AVAILABLE is None:
+                try:
+                    import cv2 as _cv2  # type: ignore
+                    cv2 = _cv2
+                    CV2_AVAILABLE = True
+                except Exception:  # pragma: no cover - environment fallback
+                    CV2_AVAILABLE = False
+    return cv2
+
+
+def _ultralytics():
+    """Import ultralytics (and with it torch) on first use; returns the YOLO class or None."""
+    global YOLO_AVAILABLE, YOLO
+    if YOLO_AVAILABLE is None:
+        with _import_lock:
+            if YOLO_AVAILABLE is None:
+                try:
+                    from ultralytics import YOLO as _YOLO  # type: ignore
+                    YOLO = _YOLO
+                    YOLO_AVAILABLE = True
+                except Exception:  # pragma: no cover - environment fallback
+                    YOLO_AVAILABLE = False
+    return YOLO
 
 ai_bp = Blueprint('ai', __name__, url_prefix='/api/ai')
 
@@ -60,32 +97,84 @@ runtime_config = {
     'last_model_error': None,
     'threat_fusion_enabled': True,
     'fusion_confidence_threshold': 0.75, # Min confidence to create a threat
+    'frame_cache_enabled': os.getenv('FRAME_CACHE', '1') not in ('0', 'false', 'False'),
 }
 
+# Duplicate / near-duplicate frames return the previous detections (see frame_cache.py)
+FRAME_CACHE = FrameCache(
+    maxsize=int(os.getenv('FRAME_CACHE_SIZE', 256)),
+    ttl_s=float(os.getenv('FRAME_CACHE_TTL_S', 2.0)),
+    perceptual=os.getenv('FRAME_CACHE_PERCEPTUAL', '0') in ('1', 'true', 'True'),
+)
+
 _yolo_model = None
 _model_lock = threading.Lock()
 
+# pending -> loading -> ready | failed | disabled (simulated detections)
+MODEL_STATE = {'state': 'pending', 'started_at': None, 'finished_at': None, 'load_seconds': None}
+_loader_thread = None
+
+def _set_model_state(state):
+    MODEL_STATE['state'] = state
+    if state == 'loading':
+        MODEL_STATE['started_at'] = time.time()
+        MODEL_STATE['finished_at'] = MODEL_STATE['load_seconds'] = None
+    elif state in ('ready', 'failed', 'disabled'):
+        MODEL_STATE['finished_at'] = time.time()
+        if MODEL_STATE['started_at'] is not None:
+            MODEL_STATE['load_seconds'] = round(MODEL_STATE['finished_at'] - MODEL_STATE['started_at'], 3)
+
 def _load_model_if_enabled():
     """Attempt to load YOLOv8 model once (thread-safe)."""
     global _yolo_model, yolo_status
-    if not YOLO_AVAILABLE:
-        runtime_config['last_model_error'] = 'ultralytics or opencv not installed'
-        return
     if not os.getenv('ENABLE_YOLO', '0') in ('1', 'true', 'True'):
         runtime_config['last_model_error'] = 'ENABLE_YOLO env not set'
+        _set_model_state('disabled')
+        _opencv()  # still warm cv2 for frame decoding, off the request path
         return
     with _model_lock:
         if _yolo_model is None:
+            _set_model_state('loading')
+            yolo_cls = _ultralytics()
+            if yolo_cls is None or _opencv() is None:
+                runtime_config['last_model_error'] = 'ultralytics or opencv not installed'
+                _set_model_state('failed')
+                return
             try:
                 yolo_status = 'loading'
-                _yolo_model = YOLO(runtime_config['model_variant'])
+                _yolo_model = yolo_cls(runtime_config['model_variant'])
                 runtime_config['inference_enabled'] = True
                 yolo_status = 'active'
+                FRAME_CACHE.clear()  # drop simulated results cached while loading
+                _set_model_state('ready')
             except Exception as e:  # pragma: no cover
                 runtime_config['last_model_error'] = str(e)
                 yolo_status = 'error'
                 runtime_config['inference_enabled'] = False
+                _set_model_state('failed')
+
+def start_model_loading():
+    """Load the model (if enabled) on a background thread; returns immediately."""
+    global _loader_thread
+    if _loader_thread is not None and _loader_thread.is_alive():
+        return _loader_thread
+    _loader_thread = threading.Thread(target=_load_model_if_enabled, name='yolo-loader', daemon=True)
+    _loader_thread.start()
+    return _loader_thread
+
+def model_ready():
+    return MODEL_STATE['state'] in ('ready', 'failed', 'disabled')
+
+def record_detections(detections):
+    """Append to detection_history (last 1000 kept) and share with other workers."""
+    if not detections:
+        return
+    detection_history.extend(detections)
+    if len(detection_history) > 1000:
+        detection_history[:] = detection_history[-1000:]
+    shared_state.publish('detections', detections)
 
+@timed('ai.fusion')
 def _fuse_detection_into_threat(detection):
     """If a high-confidence drone is detected, create a threat in the main system."""
     if not runtime_config['threat_fusion_enabled']:
@@ -102,21 +191,21 @@ def _fuse_detection_into_threat(detection):
                 return # Already fused
 
         # Create a new threat
-        new_threat_id = str(uuid.uuid4())
-        remote_id = f"AI-GEN-{str(uuid.uuid4())[:4]}"
+        new_threat_id = new_id()
+        remote_id = f"AI-GEN-{new_id()[:4]}"
         threat = {
             'id': new_threat_id,
             'class': 'ai_detected_drone',
             'confidence': detection['confidence'],
             # Placeholder location - could be improved with triangulation
-            'location': {'lat': 28.50 + random.uniform(-0.005, 0.005), 'lon': 77.60 + random.uniform(-0.005, 0.005)},
+            'location': {'lat': 28.50 + RNG.uniform(-0.005, 0.005), 'lon': 77.60 + RNG.uniform(-0.005, 0.005)},
             'status': 'detected',
             'created_at': datetime.utcnow().isoformat()+'Z',
             'remote_id': remote_id,
             'authorized': remote_id in WHITELIST,
             'source_detection_id': detection.get('id') # Link back to the AI detection
         }
-        THREATS[new_threat_id] = threat
+        add_threat(threat)
 
 
 def _run_inference(image_bgr: np.ndarray):
@@ -127,13 +216,13 @@ def _run_inference(image_bgr: np.ndarray):
     global yolo_status
     if not runtime_config['inference_enabled'] or _yolo_model is None:
         # Fallback simulated single detection occasionally
-        if random.random() < 0.4:
+        if RNG.random() < 0.4:
             return []
-        cls = random.choice(['drone', 'bird'])
+        cls = RNG.choice(['drone', 'bird'])
         detection = {
-            'id': str(uuid.uuid4()),
+            'id': new_id(),
             'class': cls,
-            'confidence': round(random.uniform(0.6, 0.95), 2),
+            'confidence': round(RNG.uniform(0.6, 0.95), 2),
             'bbox': {'x': 30, 'y': 25, 'width': 35, 'height': 30},
             'timestamp': datetime.now().isoformat(),
             'threat_level': THREAT_LEVELS.get(cls, 0.5),
@@ -143,7 +232,8 @@ def _run_inference(image_bgr: np.ndarray):
         return [detection]
     try:
         yolo_status = 'processing'
-        results = _yolo_model(image_bgr, verbose=False, conf=runtime_config['confidence_threshold'])[0]
+        with span('ai.model'):
+            results = _yolo_model(image_bgr, verbose=False, conf=runtime_config['confidence_threshold'])[0]
         detections = []
         h, w = image_bgr.shape[:2]
         for box in results.boxes:
@@ -162,7 +252,7 @@ def _run_inference(image_bgr: np.ndarray):
             bw = max(1.0, x2 - x1)
             bh = max(1.0, y2 - y1)
             det = {
-                'id': str(uuid.uuid4()),
+                'id': new_id(),
                 'class': mapped,
                 'raw_class': name,
                 'confidence': round(conf, 3),
@@ -219,6 +309,39 @@ def get_detections():
         'timestamp': datetime.now().isoformat()
     })
 
+def simulate_camera_detections(camera_url):
+    """Simulated YOLOv8 pass over one camera frame: 0-3 detections, fused and recorded."""
+    num_detections = RNG.choices([0, 1, 2, 3], weights=[40, 30, 20, 10])[0]
+    new_detections = []
+
+    for i in range(num_detections):
+        detection_class = RNG.choices(
+            list(DETECTION_CLASSES), 
+            weights=[10, 8, 3, 2, 15, 20, 25, 17]  # Weighted probabilities
+        )[0]
+        
+        detection = {
+            'id': new_id(),
+            'class': detection_class,
+            'confidence': min(0.99, max(0.3, RNG.gauss(0.75, 0.15))),
+            'bbox': {
+                'x': RNG.randint(10, 80),
+                'y': RNG.randint(10, 70),
+                'width': RNG.randint(20, 100),
+                'height': RNG.randint(15, 80)
+            },
+            'timestamp': datetime.now().isoformat(),
+            'threat_level': THREAT_LEVELS.get(detection_class, 0.5),
+            'camera_source': camera_url
+        }
+        
+        new_detections.append(detection)
+        _fuse_detection_into_threat(detection)
+    
+    # Keep only last 1000 detections in memory
+    record_detections(new_detections)
+    return new_detections
+
 @ai_bp.route('/process', methods=['POST'])
 def process_camera_frame():
     """Process camera frame through YOLOv8 model"""
@@ -228,6 +351,7 @@ def process_camera_frame():
         data = request.get_json() or {}
         camera_url = data.get('camera_url', 'http://192.168.137.189/mjpeg/1')
         timestamp = data.get('timestamp', time.time() * 1000)
+        RECORDER.record('process', {'camera_url': camera_url})
         
         # Set status to processing
         yolo_status = 'processing'
@@ -236,37 +360,7 @@ def process_camera_frame():
         time.sleep(0.1)
         
         # Generate simulated detections (in real implementation, this would be YOLOv8)
-        num_detections = random.choices([0, 1, 2, 3], weights=[40, 30, 20, 10])[0]
-        new_detections = []
-        
-        for i in range(num_detections):
-            detection_class = random.choices(
-                list(DETECTION_CLASSES), 
-                weights=[10, 8, 3, 2, 15, 20, 25, 17]  # Weighted probabilities
-            )[0]
-            
-            detection = {
-                'id': str(uuid.uuid4()),
-                'class': detection_class,
-                'confidence': min(0.99, max(0.3, random.gauss(0.75, 0.15))),
-                'bbox': {
-                    'x': random.randint(10, 80),
-                    'y': random.randint(10, 70),
-                    'width': random.randint(20, 100),
-                    'height': random.randint(15, 80)
-                },
-                'timestamp': datetime.now().isoformat(),
-                'threat_level': THREAT_LEVELS.get(detection_class, 0.5),
-                'camera_source': camera_url
-            }
-            
-            new_detections.append(detection)
-            detection_history.append(detection)
-            _fuse_detection_into_threat(detection)
-        
-        # Keep only last 1000 detections in memory
-        if len(detection_history) > 1000:
-            detection_history = detection_history[-1000:]
+        new_detections = simulate_camera_detections(camera_url)
         
         # Reset status to active
         yolo_status = 'active'
@@ -330,8 +424,10 @@ def get_ai_status():
             'confidence_threshold': runtime_config['confidence_threshold'],
             'classes_detected': len(DETECTION_CLASSES),
             'inference_enabled': runtime_config['inference_enabled'],
-            'last_model_error': runtime_config['last_model_error']
+            'last_model_error': runtime_config['last_model_error'],
+            'loading': dict(MODEL_STATE),
         },
+        'frame_cache': dict(FRAME_CACHE.snapshot(), enabled=runtime_config['frame_cache_enabled']),
         'camera_info': {
             'source': 'ESP32-CAM',
             'url': 'http://192.168.137.189/mjpeg/1',
@@ -340,13 +436,75 @@ def get_ai_status():
         }
     })
 
+@ai_bp.route('/ready', methods=['GET'])
+def ai_ready():
+    """Readiness probe: 503 until model loading has finished (ready, failed or disabled)."""
+    body = {'ready': model_ready(), 'model': dict(MODEL_STATE),
+            'inference_enabled': runtime_config['inference_enabled']}
+    if not body['ready']:
+        resp = jsonify(body)
+        resp.status_code = 503
+        resp.headers['Retry-After'] = '1'
+        return resp
+    return jsonify(body)
+
+def analyze_frame(img_b64, now=None):
+    """Cache lookup, decode and inference for one base64 frame; returns (detections, cached).
+
+    ``now`` is the frame-cache clock (replay passes the recorded time). Raises ValueError
+    when the payload is not a decodable image.
+    """
+    t0 = time.perf_counter()
+    use_cache = runtime_config['frame_cache_enabled']
+    key = content_key(img_b64) if use_cache else None
+    detections = FRAME_CACHE.get(key, now) if use_cache else None
+    if detections is not None:
+        return detections, 'exact'
+    try:
+        with span('frame.b64decode'):
+            raw = base64.b64decode(img_b64)
+    except Exception:
+        raise ValueError('invalid base64')
+    cv2 = _opencv()
+    phash = None
+    if use_cache:
+        if FRAME_CACHE.perceptual and cv2 is not None:
+            with span('frame.phash'):
+                phash = dhash(raw, cv2)
+        if phash is not None:
+            detections = FRAME_CACHE.get_similar(phash, now)
+        else:
+            FRAME_CACHE.miss()
+        if detections is not None:
+            return detections, 'perceptual'
+    if cv2 is not None:
+        with span('frame.decode'):
+            np_arr = np.frombuffer(raw, np.uint8)
+            frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError('could not decode image')
+        # Resize for speed (keep aspect)
+        h, w = frame.shape[:2]
+        if w > 960:
+            scale = 960 / w
+            with span('frame.resize'):
+                frame = cv2.resize(frame, (960, int(h*scale)))
+    else:
+        frame = np.zeros((480,640,3), dtype=np.uint8)
+    with span('frame.inference'):
+        detections = _run_inference(frame)
+    if use_cache:
+        FRAME_CACHE.put(key, detections, time.perf_counter() - t0, phash, now)
+    # Append to history (cache hits are the same observation and are not re-added)
+    record_detections(detections)
+    return detections, None
+
 @ai_bp.route('/frame', methods=['POST'])
 def process_uploaded_frame():
     """Accept a base64 webcam frame from browser, run YOLO if available, return detections.
 
     Expected JSON: { image_base64: 'data:image/jpeg;base64,...' | '...rawbase64...', client_timestamp: <ms> }
     """
-    global detection_history
     try:
         payload = request.get_json() or {}
         img_b64 = payload.get('image_base64')
@@ -356,49 +514,45 @@ def process_uploaded_frame():
         # Strip data URL header if present
         if ',' in img_b64:
             img_b64 = img_b64.split(',',1)[1]
+        RECORDER.record('frame', img_b64)
         try:
-            raw = base64.b64decode(img_b64)
-        except Exception:
-            return jsonify({'status':'error','message':'invalid base64'}), 400
-        if cv2 is not None:
-            np_arr = np.frombuffer(raw, np.uint8)
-            frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-            if frame is None:
-                return jsonify({'status':'error','message':'could not decode image'}), 400
-            # Resize for speed (keep aspect)
-            h, w = frame.shape[:2]
-            if w > 960:
-                scale = 960 / w
-                frame = cv2.resize(frame, (960, int(h*scale)))
-        else:
-            frame = np.zeros((480,640,3), dtype=np.uint8)
-        detections = _run_inference(frame)
-        # Append to history
-        detection_history.extend(detections)
-        if len(detection_history) > 1000:
-            detection_history[:] = detection_history[-1000:]
-        return jsonify({
-            'status': 'success',
-            'detections': detections,
-            'inference': {
-                'model_active': runtime_config['inference_enabled'],
-                'yolo_status': yolo_status,
-                'frame_received_ms': client_ts,
-                'server_time_ms': int(time.time()*1000)
-            }
-        })
+            detections, cached = analyze_frame(img_b64)
+        except ValueError as e:
+            return jsonify({'status':'error','message':str(e)}), 400
+        return _frame_response(detections, client_ts, cached=cached)
     except Exception as e:  # pragma: no cover
         return jsonify({'status':'error','message':str(e)}), 500
 
+def _frame_response(detections, client_ts, cached=None):
+    return jsonify({
+        'status': 'success',
+        'detections': detections,
+        'inference': {
+            'model_active': runtime_config['inference_enabled'],
+            'yolo_status': yolo_status,
+            'frame_received_ms': client_ts,
+            'server_time_ms': int(time.time()*1000),
+            'cached': cached,
+        }
+    })
+
+def _reload_conflict():
+    return jsonify({
+        'status': 'error',
+        'message': 'Model is loading; retry the reload once /api/ai/ready returns 200',
+        'model_loading': dict(MODEL_STATE),
+    }), 409
+
 @ai_bp.route('/configure', methods=['POST'])
 def configure_ai_model():
     """Configure AI model parameters"""
-    global yolo_status
+    global yolo_status, _yolo_model
     
     try:
         data = request.get_json() or {}
         confidence_threshold = data.get('confidence_threshold', runtime_config['confidence_threshold'])
         enable_tracking = data.get('enable_tracking', True)
+        frame_cache = data.get('frame_cache') or {}
         model_status = data.get('status', 'active')
         reload_model = data.get('reload', False)
         
@@ -415,15 +569,39 @@ def configure_ai_model():
                 'message': 'Invalid status. Must be active, offline, or maintenance'
             }), 400
         
+        if not isinstance(frame_cache, dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'frame_cache must be an object'
+            }), 400
+
+        # a reload never waits behind a load in progress: the caller retries after /api/ai/ready
+        if reload_model and _model_lock.locked():
+            return _reload_conflict()
+
         yolo_status = model_status
         runtime_config['confidence_threshold'] = confidence_threshold
         runtime_config['enable_tracking'] = enable_tracking
+        if 'enabled' in frame_cache:
+            runtime_config['frame_cache_enabled'] = bool(frame_cache['enabled'])
+        if 'ttl_s' in frame_cache:
+            FRAME_CACHE.ttl_s = max(0.0, float(frame_cache['ttl_s']))
+        if 'perceptual' in frame_cache:
+            FRAME_CACHE.perceptual = bool(frame_cache['perceptual'])
+        if 'max_distance' in frame_cache:
+            FRAME_CACHE.max_distance = int(frame_cache['max_distance'])
+        FRAME_CACHE.clear()  # cached results were produced under the previous settings
         if reload_model:
             # Force reload attempt
-            with _model_lock:
-                global _yolo_model
+            if not _model_lock.acquire(blocking=False):
+                return _reload_conflict()
+            try:
                 _yolo_model = None
-            _load_model_if_enabled()
+                runtime_config['inference_enabled'] = False
+                _set_model_state('pending')
+            finally:
+                _model_lock.release()
+            start_model_loading()
         
         return jsonify({
             'status': 'success',
@@ -434,6 +612,8 @@ def configure_ai_model():
                 'model_status': yolo_status,
                 'inference_enabled': runtime_config['inference_enabled'],
                 'last_model_error': runtime_config['last_model_error'],
+                'model_loading': dict(MODEL_STATE),  # reload runs in the background; poll /api/ai/ready
+                'frame_cache': FRAME_CACHE.snapshot(),
                 'updated_at': datetime.now().isoformat()
             }
         })
@@ -451,6 +631,8 @@ def reset_ai_system():
     
     try:
         detection_history.clear()
+        shared_state.publish('detections_clear', None)
+        FRAME_CACHE.clear()
         yolo_status = 'active'
         
         return jsonify({
@@ -493,8 +675,5 @@ def init_demo_data():
     
     detection_history.extend(demo_detections)
 
-# Initialize model on startup
-_load_model_if_enabled()
-
 # Initialize demo data when module loads
 init_demo_data()
\ No newline at end of file
@@ -1,24 +1,165 @@
 from flask import Blueprint, jsonify, request
 import uuid
 
+from .replay import RECORDER
+from .whitelist import WhitelistRules, apply_change, normalize_change
+from .zones import ZONES, normalize_zone
+from . import shared_state
+
 airspace_bp = Blueprint('airspace', __name__)
 
-WHITELIST = set()  # remote IDs allowed
+WHITELIST = WhitelistRules()  # remote IDs allowed: exact IDs, prefixes and operator ranges (whitelist.py)
+
+MAX_BULK_RULES = 500000
+MAX_ZONES = 5000
+MAX_CLASSIFY_POINTS = 200000
+
+
+def change_whitelist(mode, change):
+    """Apply a rule change, share it with other workers and reclassify the threats it can affect.
+
+    Returns (effective change, reclassified threats).
+    """
+    from .threats import reclassify
+    effective = apply_change(WHITELIST, mode, change)
+    shared_state.publish(f'whitelist_{mode}', effective)
+    return effective, reclassify(None if mode == 'replace' else effective)
+
+
+def change_zones(mode, zones):
+    """Add / replace normalized zones (or remove zone ids), share the new set with other workers
+    and reclassify every threat against it.
+
+    Returns the threats whose zone changed.
+    """
+    from .threats import rezone
+    if mode == 'add':
+        ZONES.add(zones)
+    elif mode == 'replace':
+        ZONES.replace(zones)
+    elif mode == 'remove':
+        if not any([ZONES.remove(zone_id) for zone_id in zones]):
+            return []
+    else:
+        raise ValueError(f'unknown mode {mode!r}')
+    shared_state.publish('zones', ZONES.to_list())
+    return rezone()
+
 
 @airspace_bp.route('/airspace/whitelist', methods=['GET'])
 def get_whitelist():
-    return jsonify(sorted(list(WHITELIST)))
+    return jsonify(sorted(WHITELIST.exact))
 
 @airspace_bp.route('/airspace/whitelist', methods=['POST'])
 def add_whitelist():
-    data = request.json or {}
+    data = request.get_json(silent=True) or {}
     rid = data.get('remote_id') or f'RID-{str(uuid.uuid4())[:8]}'
-    WHITELIST.add(rid)
-    return jsonify({'added': rid, 'total': len(WHITELIST)}), 201
+    try:
+        change = normalize_change([rid])
+    except ValueError as e:
+        return jsonify({'error': 'invalid_body', 'detail': str(e)}), 400
+    RECORDER.record('whitelist_add', change)
+    _, changed = change_whitelist('add', change)
+    return jsonify({'added': rid, 'total': len(WHITELIST), 'reclassified': len(changed)}), 201
 
 @airspace_bp.route('/airspace/whitelist/<rid>', methods=['DELETE'])
 def remove_whitelist(rid):
-    if rid in WHITELIST:
-        WHITELIST.remove(rid)
-        return jsonify({'removed': rid, 'total': len(WHITELIST)})
+    if rid in WHITELIST.exact:
+        change = normalize_change([rid])
+        RECORDER.record('whitelist_remove', change)
+        _, changed = change_whitelist('remove', change)
+        return jsonify({'removed': rid, 'total': len(WHITELIST), 'reclassified': len(changed)})
     return jsonify({'error':'not_found'}), 404
+
+@airspace_bp.route('/airspace/whitelist/rules', methods=['GET'])
+def get_rules():
+    """Rule counts, prefixes and ranges (?exact=1 also lists the exact IDs)."""
+    rules = WHITELIST.to_change()
+    if request.args.get('exact') not in ('1', 'true'):
+        rules.pop('exact')
+    return jsonify({**rules, 'summary': WHITELIST.summary()})
+
+@airspace_bp.route('/airspace/whitelist/rules', methods=['POST'])
+def bulk_rules():
+    """Bulk add / remove / replace rules.
+
+    JSON body: {"exact": [...], "prefix": [...], "ranges": [{"from", "to", "operator"}]};
+    text/plain body: one remote ID per line (registered-drone exports). ?mode=add|remove|replace
+    (default add).
+    """
+    mode = request.args.get('mode', 'add')
+    if mode not in ('add', 'remove', 'replace'):
+        return jsonify({'error': 'invalid_mode', 'detail': 'mode must be add, remove or replace'}), 400
+    try:
+        if request.mimetype == 'text/plain':
+            lines = request.get_data(as_text=True).splitlines()
+            change = normalize_change([line.strip() for line in lines if line.strip()])
+        else:
+            change = normalize_change(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': 'invalid_body', 'detail': str(e)}), 400
+    size = sum(len(v) for v in change.values())
+    if size > MAX_BULK_RULES:
+        return jsonify({'error': 'too_many_rules', 'detail': f'max {MAX_BULK_RULES} per request'}), 413
+    RECORDER.record(f'whitelist_{mode}', change)
+    effective, changed = change_whitelist(mode, change)
+    return jsonify({
+        'mode': mode,
+        'applied': {k: len(v) for k, v in effective.items()},
+        'reclassified': len(changed),
+        'summary': WHITELIST.summary(),
+    })
+
+@airspace_bp.route('/airspace/whitelist/match/<rid>', methods=['GET'])
+def match(rid):
+    return jsonify({'remote_id': rid, 'authorized': rid in WHITELIST, 'rule': WHITELIST.explain(rid)})
+
+@airspace_bp.route('/airspace/zones', methods=['GET'])
+def get_zones():
+    return jsonify({'zones': ZONES.to_list(), 'summary': ZONES.summary()})
+
+@airspace_bp.route('/airspace/zones', methods=['POST'])
+def post_zones():
+    """Add zones (one zone object or {"zones": [...]}); ?mode=replace swaps in the whole set.
+
+    Zones with an existing id replace that zone. Every threat is reclassified afterwards.
+    """
+    mode = request.args.get('mode', 'add')
+    if mode not in ('add', 'replace'):
+        return jsonify({'error': 'invalid_mode', 'detail': 'mode must be add or replace'}), 400
+    data = request.get_json(silent=True)
+    docs = data.get('zones') if isinstance(data, dict) and 'zones' in data else [data]
+    if not isinstance(docs, list):
+        return jsonify({'error': 'invalid_body', 'detail': 'zones must be an array'}), 400
+    if len(docs) > MAX_ZONES:
+        return jsonify({'error': 'too_many_zones', 'detail': f'max {MAX_ZONES} per request'}), 413
+    try:
+        zones = [normalize_zone(d) for d in docs]
+    except ValueError as e:
+        return jsonify({'error': 'invalid_zone', 'detail': str(e)}), 400
+    RECORDER.record('zones', {'mode': mode, 'zones': zones})
+    changed = change_zones(mode, zones)
+    return jsonify({'mode': mode, 'zones': zones, 'reclassified': len(changed), 'summary': ZONES.summary()}), 201
+
+@airspace_bp.route('/airspace/zones/<zone_id>', methods=['DELETE'])
+def delete_zone(zone_id):
+    if not any(z['id'] == zone_id for z in ZONES.to_list()):
+        return jsonify({'error': 'not_found'}), 404
+    RECORDER.record('zones', {'mode': 'remove', 'zones': [zone_id]})
+    changed = change_zones('remove', [zone_id])
+    return jsonify({'removed': zone_id, 'reclassified': len(changed), 'summary': ZONES.summary()})
+
+@airspace_bp.route('/airspace/zones/classify', methods=['POST'])
+def classify_points():
+    """Classify points: {"points": [[lat, lon], ...]} -> one zone label (or null) per point."""
+    data = request.get_json(silent=True)
+    points = data.get('points') if isinstance(data, dict) else None
+    if not isinstance(points, list):
+        return jsonify({'error': 'invalid_body', 'detail': 'expected {"points": [[lat, lon], ...]}'}), 400
+    if len(points) > MAX_CLASSIFY_POINTS:
+        return jsonify({'error': 'too_many_points', 'detail': f'max {MAX_CLASSIFY_POINTS} per request'}), 413
+    try:
+        lat, lon = zip(*((float(p[0]), float(p[1])) for p in points)) if points else ((), ())
+    except (TypeError, ValueError, IndexError, KeyError):
+        return jsonify({'error': 'invalid_body', 'detail': 'points must be [lat, lon] pairs'}), 400
+    return jsonify({'zones': ZONES.classify_many(lat, lon)})
@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify
-import time, jwt, os
+from flask import Blueprint, g, request, jsonify
+from collections import OrderedDict
+import hashlib, math, threading, time, jwt, os
+
+from .credentials import LoginBusy, RateLimiter, UserStore
 
 auth_bp = Blueprint('auth', __name__)
 JWT_SECRET = os.environ.get('JWT_SECRET', 'dev_secret_change_me')
 JWT_ISSUER = 'tejas-platform'
 
-# Dummy user store for MVP
+# Enforcement is opt-in until the dashboard sends bearer tokens (AUTH_REQUIRED=1).
+AUTH_CONFIG = {
+    'required': os.environ.get('AUTH_REQUIRED', '0') in ('1', 'true', 'True'),
+}
+
+# Demo accounts, hashed into USERS on first login (plaintext is dropped from the store once hashed)
 dummy_users = {
     'operator': {'password': 'op123', 'roles': ['operator']},
     'supervisor': {'password': 'sup123', 'roles': ['operator','supervisor']},
@@ -13,6 +21,21 @@ dummy_users = {
     'mladmin': {'password': 'ml123', 'roles': ['ml_admin']},
 }
 
+USERS = UserStore(
+    n=int(os.environ.get('AUTH_KDF_N', 2**14)),
+    workers=int(os.environ.get('AUTH_KDF_WORKERS', 2)),
+    max_pending=int(os.environ.get('AUTH_KDF_MAX_PENDING', 16)),
+)
+for _name, _user in dummy_users.items():
+    USERS.add(_name, _user['password'], _user['roles'], defer=True)
+del _name, _user
+
+# Token buckets: 30/min per client IP (burst 10), then 5 attempts/min per (username, client IP)
+# (burst 5). The username bucket is per IP so guessing from one address cannot lock the account
+# out for everyone else.
+LOGIN_LIMIT_USER = RateLimiter(rate_per_s=5/60, burst=5)
+LOGIN_LIMIT_IP = RateLimiter(rate_per_s=30/60, burst=10)
+
 def issue_token(username, roles):
     now = int(time.time())
     payload = {
@@ -26,10 +49,140 @@ def issue_token(username, roles):
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.json or {}
+    data = request.get_json(silent=True) or {}
     u = data.get('username'); p = data.get('password')
-    user = dummy_users.get(u)
-    if not user or user['password'] != p:
+    ip = request.remote_addr or '-'
+    retry = LOGIN_LIMIT_IP.acquire(ip) or LOGIN_LIMIT_USER.acquire(f'{u}\x00{ip}')
+    if retry:
+        resp = jsonify({'error': 'rate_limited'})
+        resp.headers['Retry-After'] = str(math.ceil(retry))
+        return resp, 429
+    try:
+        roles = USERS.authenticate(u, p)
+    except LoginBusy:
+        resp = jsonify({'error': 'login_busy'})
+        resp.headers['Retry-After'] = '1'
+        return resp, 503
+    if roles is None:
         return jsonify({'error': 'invalid_credentials'}), 401
-    token = issue_token(u, user['roles'])
+    token = issue_token(u, roles)
     return jsonify({'access_token': token, 'token_type': 'bearer', 'expires_in': 3600})
+
+
+class TokenCache:
+    """Bounded LRU of verified token claims keyed by SHA-256 of the raw token.
+
+    A hit skips the HMAC check and claim parsing; entries are dropped once their
+    ``exp`` passes, so a cached token never outlives its own expiry.
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, now):
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims['exp'] <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, key, claims):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+TOKEN_CACHE = TokenCache(int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 2048)))
+
+
+class AuthError(Exception):
+    def __init__(self, code, status=401):
+        super().__init__(code)
+        self.code = code
+        self.status = status
+
+
+def verify_token(token, use_cache=True):
+    """Return decoded claims for a valid token, raising AuthError otherwise."""
+    now = time.time()
+    key = hashlib.sha256(token.encode()).digest()
+    if use_cache:
+        claims = TOKEN_CACHE.get(key, now)
+        if claims is not None:
+            return claims
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=['HS256'], issuer=JWT_ISSUER,
+                            options={'require': ['exp', 'sub']})
+    except jwt.ExpiredSignatureError:
+        raise AuthError('token_expired')
+    except jwt.InvalidTokenError:
+        raise AuthError('invalid_token')
+    if use_cache:
+        TOKEN_CACHE.put(key, claims)
+    return claims
+
+
+def _bearer_token():
+    header = request.headers.get('Authorization', '')
+    if header[:7].lower() == 'bearer ':
+        return header[7:].strip() or None
+    return None
+
+
+def protect(blueprint, read_roles, write_roles, overrides=None):
+    """Require a bearer token on every route of ``blueprint``.
+
+    GET/HEAD need one of ``read_roles``; other methods need one of ``write_roles``.
+    ``overrides`` maps an endpoint name (e.g. 'incidents.close_incident') to its own roles.
+    Decoded claims are exposed as ``flask.g.user``.
+    """
+    read_roles, write_roles = frozenset(read_roles), frozenset(write_roles)
+    overrides = {k: frozenset(v) for k, v in (overrides or {}).items()}
+
+    @blueprint.before_request
+    def _enforce_roles():
+        if request.method == 'OPTIONS':  # CORS preflight carries no credentials
+            return None
+        g.user = None
+        token = _bearer_token()
+        if token is None:
+            if AUTH_CONFIG['required']:
+                return jsonify({'error': 'missing_token'}), 401
+            return None
+        try:
+            claims = verify_token(token)
+        except AuthError as e:
+            if AUTH_CONFIG['required']:
+                return jsonify({'error': e.code}), e.status
+            return None
+        g.user = claims
+        if not AUTH_CONFIG['required']:
+            return None
+        allowed = overrides.get(request.endpoint)
+        if allowed is None:
+            allowed = read_roles if request.method in ('GET', 'HEAD') else write_roles
+        if allowed.isdisjoint(claims.get('roles', ())):
+            return jsonify({'error': 'forbidden', 'detail': f"requires one of: {', '.join(sorted(allowed))}"}), 403
+        return None
+
+    return blueprint
@@ -0,0 +1,212 @@
+"""Command processing pipeline.
+
+Commands are accepted from request threads into a bounded queue and applied
+strictly in submission order by a single worker thread. Each handler returns
+its result, the ledger events it will produce and a ``commit`` callable; the
+worker drains whatever is queued (up to ``batch_size``), writes all resulting
+events with one ``append_events`` call and only then runs the commits in order,
+so a failed ledger write leaves no state change behind.
+
+Idempotency keys map repeat submissions (e.g. an operator double-click) onto
+the command that was already accepted instead of enqueueing a duplicate. A key
+is bound to a fingerprint of the request; reusing it for a different request
+raises IdempotencyConflict.
+
+With several worker processes, ``keys`` holds the keys somewhere all of them see
+(claim / release) and ``guard`` wraps every applied batch; commands.py passes the
+state server's key table and command lease (shared_state.py), so commands from all
+workers are deduplicated and applied one batch at a time, in lease order.
+"""
+
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+import queue
+import threading
+import uuid
+
+from .ledger import append_events
+
+TERMINAL_STATES = ('applied', 'failed')
+
+
+class QueueFull(Exception):
+    """Raised when the pipeline cannot accept more commands."""
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with a different request."""
+
+    def __init__(self, command_id):
+        super().__init__(command_id)
+        self.command_id = command_id
+
+
+class CommandPipeline:
+    def __init__(self, max_pending=256, batch_size=32, max_tracked=4096, keys=None, guard=nullcontext):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._handlers = {}
+        self._keys = keys       # claim(key, value) -> value already holding the key | None; release(key, value)
+        self._guard = guard     # context manager entered around each applied batch
+        self._records = OrderedDict()       # command_id -> status record (bounded)
+        self._idempotency = OrderedDict()   # idempotency key -> (command_id, fingerprint) (bounded)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._worker = None
+        self.batch_size = batch_size
+        self.max_tracked = max_tracked
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'applied': 0, 'failed': 0, 'ledger_batches': 0}
+
+    def register(self, command, handler):
+        """Register ``handler(command_id, params) -> (result, [(event_type, payload), ...], commit)``.
+
+        The handler must not change any state itself; ``commit()`` does, after the ledger write.
+        """
+        self._handlers[command] = handler
+
+    def submit(self, command, params=None, idempotency_key=None, fingerprint=None):
+        """Queue a command, returning ``(record, created)``.
+
+        Raises QueueFull when saturated, IdempotencyConflict when ``idempotency_key`` was
+        used with a different ``fingerprint``.
+        """
+        if command not in self._handlers:
+            raise KeyError(command)
+        self._ensure_worker()
+        with self._lock:
+            if idempotency_key and idempotency_key in self._idempotency:
+                command_id, held = self._idempotency[idempotency_key]
+                existing = self._records.get(command_id)
+                if existing is not None:
+                    if held != fingerprint:
+                        raise IdempotencyConflict(command_id)
+                    self.stats['deduplicated'] += 1
+                    return dict(existing), False
+            record = {
+                'id': str(uuid.uuid4()),
+                'command': command,
+                'status': 'queued',
+                'idempotency_key': idempotency_key,
+                'submitted_at': datetime.utcnow().isoformat()+'Z',
+                'applied_at': None,
+                'result': None,
+                'error': None,
+            }
+            claim = (record['id'], fingerprint)
+            if idempotency_key and self._keys is not None:
+                owner = self._keys.claim(idempotency_key, claim)
+                if owner is not None:
+                    if owner[1] != fingerprint:
+                        raise IdempotencyConflict(owner[0])
+                    # accepted by another worker; its status is readable here once applied
+                    self.stats['deduplicated'] += 1
+                    return dict(record, id=owner[0], submitted_at=None), False
+            try:
+                self._queue.put_nowait((record['id'], command, params or {}))
+            except queue.Full:
+                if idempotency_key and self._keys is not None:
+                    self._keys.release(idempotency_key, claim)
+                self.stats['rejected'] += 1
+                raise QueueFull()
+            self._records[record['id']] = record
+            if idempotency_key:
+                self._idempotency[idempotency_key] = claim
+            self._trim()
+            self.stats['submitted'] += 1
+            return dict(record), True
+
+    def get(self, command_id):
+        with self._lock:
+            record = self._records.get(command_id)
+            return dict(record) if record else None
+
+    def wait(self, command_id, timeout=None, since_status=None):
+        """Block until the command leaves ``since_status`` (or reaches a terminal state)."""
+        with self._changed:
+            def ready():
+                record = self._records.get(command_id)
+                if record is None:
+                    return True
+                if since_status is not None:
+                    return record['status'] != since_status
+                return record['status'] in TERMINAL_STATES
+            self._changed.wait_for(ready, timeout)
+            record = self._records.get(command_id)
+            return dict(record) if record else None
+
+    def drain(self, timeout=None):
+        """Block until every queued command has been applied."""
+        self._ensure_worker()
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _trim(self):
+        while len(self._records) > self.max_tracked:
+            oldest = next(iter(self._records.values()))
+            if oldest['status'] not in TERMINAL_STATES:
+                break
+            self._records.popitem(last=False)
+        while len(self._idempotency) > self.max_tracked:
+            self._idempotency.popitem(last=False)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='command-pipeline', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply_batch(batch)
+
+    def _apply_batch(self, batch):
+        events = []
+        outcomes = []
+        planned = []
+        try:
+            with self._guard():
+                for command_id, command, params in batch:
+                    try:
+                        result, produced, commit = self._handlers[command](command_id, params)
+                        events.extend(produced)
+                        planned.append((command_id, result, commit))
+                    except Exception as e:
+                        outcomes.append((command_id, 'failed', None, str(e)))
+                if events:
+                    try:
+                        append_events(events)
+                    except Exception as e:
+                        outcomes += [(cid, 'failed', None, f'ledger_write_failed: {e}') for cid, _, _ in planned]
+                        planned = events = []
+                for command_id, result, commit in planned:
+                    try:
+                        commit()
+                        outcomes.append((command_id, 'applied', result, None))
+                    except Exception as e:
+                        outcomes.append((command_id, 'failed', None, f'commit_failed: {e}'))
+        except Exception as e:
+            if not outcomes:  # the guard refused the batch; nothing was applied
+                outcomes = [(command_id, 'failed', None, f'command_guard_failed: {e}') for command_id, _, _ in batch]
+        applied_at = datetime.utcnow().isoformat()+'Z'
+        with self._changed:
+            if events:
+                self.stats['ledger_batches'] += 1
+            for command_id, status, result, error in outcomes:
+                record = self._records.get(command_id)
+                if record is not None:
+                    record.update({'status': status, 'result': result, 'error': error, 'applied_at': applied_at})
+                self.stats[status] += 1
+                self._queue.task_done()
+            self._changed.notify_all()
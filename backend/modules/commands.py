@@ -1,9 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from datetime import datetime
-import uuid
+import hashlib, json, math, os, time, uuid
 
-from .ledger import append_event
+from .command_queue import CommandPipeline, IdempotencyConflict, QueueFull, TERMINAL_STATES
+from .aggregates import AGGREGATES
 from .incidents import INCIDENTS  # for auto incident creation
+from .threats import THREATS
+from .store import persist, persist_append
+from .replay import RECORDER
+from .zones import ZONES
+from .tracks import TRACKS, METERS_PER_DEG
+from . import shared_state
 
 commands_bp = Blueprint('commands', __name__)
 
@@ -18,53 +25,91 @@ DRONE_STATE = {
     'origin_location': {'lat': 28.5000, 'lon': 77.6000},
     'target_location': None,
     'route_started_at': None,
-    'base_location': {'lat': 28.5000, 'lon': 77.6000}
+    'base_location': {'lat': 28.5000, 'lon': 77.6000},
+    'zone': None,
+    'speed_mps': float(os.environ.get('KAVACH_INTERCEPTOR_SPEED_MPS', 25)),
+    'intercept': None
 }
 
-def _append_command(command, extra=None):
+def _command_entry(command_id, command, extra=None):
+    """A COMMAND_LOG entry and its ledger events; nothing is recorded until the command commits."""
     entry = {
-        'id': str(uuid.uuid4()),
+        'id': command_id,
         'command': command,
         'timestamp': datetime.utcnow().isoformat()+'Z',
         'extra': extra or {},
         'result': 'accepted'
     }
-    COMMAND_LOG.append(entry)
     ledger_payload = {'timestamp': entry['timestamp'], 'command': command, 'command_id': entry['id'], **(extra or {})}
-    append_event('command_'+command, ledger_payload)
-    return entry
+    return entry, [('command_'+command, ledger_payload)]
+
+def _commit(entry, drone_updates, incident=None):
+    """Callable applying a command once its ledger events are written: DRONE_STATE, COMMAND_LOG, incident."""
+    def commit():
+        DRONE_STATE.update(drone_updates)
+        COMMAND_LOG.append(entry)
+        persist_append('commands', entry)
+        persist('drone_state', DRONE_STATE)
+        if incident is not None:
+            INCIDENTS[incident['id']] = incident
+            persist('incidents', incident)
+            AGGREGATES.incident_opened()
+    return commit
+
+# position-only changes computed on reads are persisted at most this often
+DRONE_PERSIST_INTERVAL_S = 1.0
+_drone_persisted_at = 0.0
 
 def _update_drone_position():
-    """Simulate drone movement linearly over a fixed travel time between origin and target."""
+    """Simulate drone movement in a straight line at ``speed_mps`` between origin and target,
+    then classify the new position against the airspace zones.
+
+    A status or zone change is persisted immediately, a position change every
+    DRONE_PERSIST_INTERVAL_S at most."""
+    global _drone_persisted_at
+    before = (DRONE_STATE['status'], DRONE_STATE['location'], DRONE_STATE['zone'])
+    _move_drone()
+    now = time.monotonic()
+    if (DRONE_STATE['status'], DRONE_STATE['zone']) != (before[0], before[2]) or \
+            (DRONE_STATE['location'] != before[1] and now - _drone_persisted_at >= DRONE_PERSIST_INTERVAL_S):
+        _drone_persisted_at = now
+        persist('drone_state', DRONE_STATE)
+
+def _move_drone():
     if DRONE_STATE.get('route_started_at') and DRONE_STATE.get('target_location'):
         try:
             start_ts = datetime.fromisoformat(DRONE_STATE['route_started_at'].rstrip('Z'))
         except Exception:
             return
-        travel_time = 60  # seconds to reach target
-        elapsed = (datetime.utcnow() - start_ts).total_seconds()
-        frac = min(1.0, max(0.0, elapsed / travel_time))
         o = DRONE_STATE['origin_location'] or DRONE_STATE['location']
         t = DRONE_STATE['target_location']
+        travel_time = max(1.0, _distance_m(o, t) / DRONE_STATE['speed_mps'])  # seconds to reach target
+        elapsed = (datetime.utcnow() - start_ts).total_seconds()
+        frac = min(1.0, max(0.0, elapsed / travel_time))
         DRONE_STATE['location'] = {
             'lat': o['lat'] + (t['lat'] - o['lat']) * frac,
             'lon': o['lon'] + (t['lon'] - o['lon']) * frac
         }
         if frac >= 1.0 and DRONE_STATE['status'] == 'en_route':
             DRONE_STATE['status'] = 'on_station'
+    loc = DRONE_STATE['location']
+    DRONE_STATE['zone'] = ZONES.classify(loc['lat'], loc['lon'])
 
-@commands_bp.route('/dispatch', methods=['POST'])
-def dispatch():
-    data = request.json or {}
-    threat_id = data.get('threat_id')
-    coords = data.get('coordinates') or DRONE_STATE['location']
-    DRONE_STATE['origin_location'] = DRONE_STATE['location']
-    DRONE_STATE['target_location'] = coords
-    DRONE_STATE['route_started_at'] = datetime.utcnow().isoformat()+'Z'
-    DRONE_STATE['status'] = 'en_route'
-    DRONE_STATE['current_threat_id'] = threat_id
-    DRONE_STATE['last_command_at'] = datetime.utcnow().isoformat()+'Z'
-    entry = _append_command('dispatch_drone', {'threat_id': threat_id, 'coordinates': coords})
+def _distance_m(a, b):
+    kx = METERS_PER_DEG * math.cos(math.radians(a['lat']))
+    return math.hypot((b['lon'] - a['lon']) * kx, (b['lat'] - a['lat']) * METERS_PER_DEG)
+
+def _predict_intercept(threat_id):
+    """Intercept solution for a threat's track from the drone's current position (None without a live track)."""
+    if not threat_id:
+        return None
+    loc = DRONE_STATE['location']
+    return TRACKS.predict(threat_id, loc['lat'], loc['lon'], DRONE_STATE['speed_mps'])
+
+def _apply_dispatch(command_id, params):
+    threat_id = params.get('threat_id')
+    coords = params.get('coordinates') or DRONE_STATE['location']
+    entry, events = _command_entry(command_id, 'dispatch_drone', {'threat_id': threat_id, 'coordinates': coords})
     # Auto incident creation
     inc_id = str(uuid.uuid4())
     incident = {
@@ -74,28 +119,145 @@ def dispatch():
         'status': 'open',
         'created_at': entry['timestamp']
     }
-    INCIDENTS[inc_id] = incident
-    append_event('incident_opened', {'timestamp': entry['timestamp'], 'incident_id': inc_id, 'threat_id': threat_id})
-    return jsonify(entry), 202
+    events.append(('incident_opened', {'timestamp': entry['timestamp'], 'incident_id': inc_id, 'threat_id': threat_id}))
+    return entry, events, _commit(entry, {
+        'intercept': params.get('intercept'),
+        'origin_location': DRONE_STATE['location'],
+        'target_location': coords,
+        'route_started_at': entry['timestamp'],
+        'status': 'en_route',
+        'current_threat_id': threat_id,
+        'last_command_at': entry['timestamp'],
+    }, incident)
+
+def _apply_return(command_id, params):
+    entry, events = _command_entry(command_id, 'return_to_base')
+    return entry, events, _commit(entry, {
+        'origin_location': DRONE_STATE['location'],
+        'target_location': DRONE_STATE['base_location'],
+        'route_started_at': entry['timestamp'],
+        'status': 'returning',
+        'current_threat_id': None,
+        'intercept': None,
+        'last_command_at': entry['timestamp'],
+    })
+
+def _apply_abort(command_id, params):
+    entry, events = _command_entry(command_id, 'abort_interception')
+    return entry, events, _commit(entry, {
+        'status': 'idle',
+        'current_threat_id': None,
+        'intercept': None,
+        'last_command_at': entry['timestamp'],
+    })
+
+# with a state server, keys and apply order are shared by every worker (see shared_state.py)
+PIPELINE = CommandPipeline(max_pending=int(os.environ.get('COMMAND_QUEUE_SIZE', 256)),
+                           keys=shared_state.CommandKeys(), guard=shared_state.command_lease)
+PIPELINE.register('dispatch_drone', _apply_dispatch)
+PIPELINE.register('return_to_base', _apply_return)
+PIPELINE.register('abort_interception', _apply_abort)
+
+def _record_from_log(command_id):
+    """Status for a command applied by another worker process (only its COMMAND_LOG entry is shared)."""
+    for entry in reversed(COMMAND_LOG):
+        if entry['id'] == command_id:
+            return {'id': entry['id'], 'command': entry['command'], 'status': 'applied',
+                    'applied_at': entry['timestamp'], 'result': entry, 'error': None}
+    return None
+
+def _fingerprint(command, requested):
+    """Hash of the command and the parameters the client sent, bound to an idempotency key."""
+    body = json.dumps([command, requested], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def _submit(command, params=None, requested=None):
+    """Queue a command; Idempotency-Key header (or body field) collapses repeat submissions.
+
+    ``requested`` is what the client asked for (default ``params``): a key reused for a
+    different request is refused with 422.
+    """
+    data = request.get_json(silent=True) or {}
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    fingerprint = _fingerprint(command, params if requested is None else requested) if key else None
+    try:
+        record, created = PIPELINE.submit(command, params, idempotency_key=key, fingerprint=fingerprint)
+    except QueueFull:
+        resp = jsonify({'error': 'command_queue_full', 'detail': f'{PIPELINE.pending()} commands pending'})
+        resp.headers['Retry-After'] = '1'
+        return resp, 503
+    except IdempotencyConflict as e:
+        return jsonify({'error': 'idempotency_key_reused',
+                        'detail': f'key already used for a different request (command {e.command_id})'}), 422
+    if created:
+        RECORDER.record('command', {'command': command, 'params': params})
+    elif PIPELINE.get(record['id']) is None:
+        record = _record_from_log(record['id']) or record  # accepted by another worker
+    record['status_url'] = f"/api/commands/{record['id']}"
+    resp = jsonify(record)
+    resp.headers['Location'] = record['status_url']
+    return resp, 202 if created else 200
+
+@commands_bp.route('/dispatch', methods=['POST'])
+def dispatch():
+    """Without ``coordinates`` the drone flies to the threat's predicted intercept point
+    (its last known location when it has no live track or cannot be caught)."""
+    data = request.get_json(silent=True) or {}
+    threat_id, coords = data.get('threat_id'), data.get('coordinates')
+    requested = {'threat_id': threat_id, 'coordinates': coords}
+    params = dict(requested)
+    if coords is None and threat_id:
+        # resolved here rather than when applied, so the recorded command replays to the same point
+        _update_drone_position()
+        intercept = _predict_intercept(threat_id)
+        if intercept is not None:
+            params['intercept'] = intercept
+        if intercept is not None and intercept['reachable']:
+            params['coordinates'] = intercept['point']
+        elif threat_id in THREATS:
+            params['coordinates'] = THREATS[threat_id].get('location')
+    return _submit('dispatch_drone', params, requested)
 
 @commands_bp.route('/return', methods=['POST'])
 def return_to_base():
-    DRONE_STATE['origin_location'] = DRONE_STATE['location']
-    DRONE_STATE['target_location'] = DRONE_STATE['base_location']
-    DRONE_STATE['route_started_at'] = datetime.utcnow().isoformat()+'Z'
-    DRONE_STATE['status'] = 'returning'
-    DRONE_STATE['current_threat_id'] = None
-    DRONE_STATE['last_command_at'] = datetime.utcnow().isoformat()+'Z'
-    entry = _append_command('return_to_base')
-    return jsonify(entry), 202
+    return _submit('return_to_base')
 
 @commands_bp.route('/abort', methods=['POST'])
 def abort():
-    DRONE_STATE['status'] = 'idle'
-    DRONE_STATE['current_threat_id'] = None
-    DRONE_STATE['last_command_at'] = datetime.utcnow().isoformat()+'Z'
-    entry = _append_command('abort_interception')
-    return jsonify(entry), 202
+    return _submit('abort_interception')
+
+@commands_bp.route('/<command_id>', methods=['GET'])
+def command_status(command_id):
+    """Poll a submitted command; ?wait=<seconds> long-polls until it is applied."""
+    try:
+        wait = min(float(request.args.get('wait', 0) or 0), 30.0)
+    except ValueError:
+        return jsonify({'error': 'invalid_params', 'detail': 'wait must be a number of seconds'}), 400
+    record = PIPELINE.wait(command_id, timeout=wait) if wait > 0 else PIPELINE.get(command_id)
+    if not record and shared_state.SHARED is not None:
+        record = _record_from_log(command_id)
+    if not record:
+        return jsonify({'error': 'not_found'}), 404
+    return jsonify(record)
+
+@commands_bp.route('/<command_id>/stream', methods=['GET'])
+def command_stream(command_id):
+    """Server-sent events: one event per status change until the command is applied or failed."""
+    record = PIPELINE.get(command_id)
+    if not record:
+        return jsonify({'error': 'not_found'}), 404
+
+    def events(record):
+        deadline = time.time() + 30
+        while True:
+            yield f"event: status\ndata: {json.dumps(record)}\n\n"
+            if record['status'] in TERMINAL_STATES or time.time() >= deadline:
+                return
+            record = PIPELINE.wait(command_id, timeout=max(0.0, deadline - time.time()), since_status=record['status'])
+            if record is None:
+                return
+
+    return Response(stream_with_context(events(record)), mimetype='text/event-stream')
 
 @commands_bp.route('/log', methods=['GET'])
 def command_log():
@@ -103,5 +265,26 @@ def command_log():
 
 @commands_bp.route('/drone', methods=['GET'])
 def drone():
+    """Drone state; while assigned to a threat, ``intercept`` is re-predicted from the latest track."""
     _update_drone_position()
+    if DRONE_STATE.get('current_threat_id') and DRONE_STATE['status'] in ('en_route', 'on_station'):
+        DRONE_STATE['intercept'] = _predict_intercept(DRONE_STATE['current_threat_id']) or DRONE_STATE.get('intercept')
     return jsonify(DRONE_STATE)
+
+@commands_bp.route('/drone/intercepts', methods=['GET'])
+def drone_intercepts():
+    """Predicted intercept points from the drone's position for every active track, soonest first.
+
+    ?limit=<n> (default 50), ?speed=<m/s> to override the drone's speed.
+    """
+    _update_drone_position()
+    try:
+        limit = int(request.args.get('limit', 50))
+        speed = float(request.args.get('speed', DRONE_STATE['speed_mps']))
+    except ValueError:
+        return jsonify({'error': 'invalid_params', 'detail': 'limit and speed must be numbers'}), 400
+    if speed <= 0:
+        return jsonify({'error': 'invalid_params', 'detail': 'speed must be positive'}), 400
+    loc = DRONE_STATE['location']
+    tracks, solutions = TRACKS.predict_all(loc['lat'], loc['lon'], speed, limit=max(0, limit))
+    return jsonify({'interceptor': {'location': loc, 'speed_mps': speed}, 'tracks': tracks, 'intercepts': solutions})
@@ -0,0 +1,118 @@
+"""Credential store and login throttling.
+
+Passwords are stored as scrypt hashes (``hashlib.scrypt``) with a tunable cost.
+Hashing runs on a small bounded thread pool: scrypt releases the GIL, and capping
+both the pool and the number of waiting logins means a flood of /login requests
+cannot take every server thread or core away from the rest of the API.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import base64, hashlib, hmac, os, threading, time
+
+
+class LoginBusy(Exception):
+    """Raised when too many password checks are already in flight."""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+class _DeferredHash:
+    """A password hashed on first use, so seeding accounts at startup costs no scrypt time."""
+
+    def __init__(self, store, password):
+        self._store = store
+        self._password = password
+        self._encoded = None
+        self._lock = threading.Lock()
+
+    def result(self):
+        with self._lock:
+            if self._encoded is None:
+                self._encoded = self._store.hash_password(self._password)
+                self._password = None
+            return self._encoded
+
+
+class UserStore:
+    def __init__(self, n=2**14, r=8, p=1, workers=2, max_pending=16):
+        self.n, self.r, self.p = n, r, p
+        self._users = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kdf')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Unknown users are checked against this so response time doesn't reveal which names exist
+        self._dummy_hash = _DeferredHash(self, os.urandom(16).hex())
+
+    def hash_password(self, password, salt=None):
+        salt = salt or os.urandom(16)
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=self.n, r=self.r, p=self.p,
+                                maxmem=256 * self.n * self.r, dklen=32)
+        return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    @staticmethod
+    def _check(password, encoded):
+        if isinstance(encoded, _DeferredHash):
+            encoded = encoded.result()
+        _, n, r, p, salt, expected = encoded.split('$')
+        n, r, p = int(n), int(r), int(p)
+        digest = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt), n=n, r=r, p=p,
+                                maxmem=256 * n * r, dklen=32)
+        return hmac.compare_digest(digest, base64.b64decode(expected))
+
+    def add(self, username, password, roles, defer=False):
+        encoded = _DeferredHash(self, password) if defer else self.hash_password(password)
+        self._users[username] = {'password_hash': encoded, 'roles': list(roles)}
+
+    def authenticate(self, username, password, timeout=10):
+        """Return the user's roles on success, None on bad credentials; raises LoginBusy when saturated."""
+        if not isinstance(username, str) or not isinstance(password, str):
+            return None
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        user = self._users.get(username)
+        encoded = user['password_hash'] if user else self._dummy_hash
+        try:
+            future = self._pool.submit(self._check, password, encoded)
+        except BaseException:
+            self._slots.release()
+            raise
+        # the slot is held until the hash finishes, not just while this request waits for it,
+        # so requests that time out cannot pile more work onto the pool
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            ok = future.result(timeout)
+        except FutureTimeout:
+            raise LoginBusy()
+        return list(user['roles']) if ok and user else None
+
+
+class RateLimiter:
+    """Token buckets keyed by an arbitrary string (username, client IP, ...)."""
+
+    def __init__(self, rate_per_s, burst, max_keys=10000):
+        self.rate = rate_per_s
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def acquire(self, key, now=None):
+        """Consume one token; return 0 when allowed, otherwise seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / self.rate
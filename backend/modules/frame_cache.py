@@ -0,0 +1,111 @@
+"""Detection cache for /api/ai/frame.
+
+Browsers and low-fps cameras resend the same JPEG many times. Two lookups run before
+decode + inference:
+ - exact:      BLAKE2b of the base64 payload (no base64 or JPEG decode needed)
+ - perceptual: optional 64-bit dHash of a reduced-size grayscale decode (cv2
+               IMREAD_REDUCED_GRAYSCALE_8 lets the JPEG decoder skip most of the work);
+               a cached frame within ``max_distance`` bits counts as a near-duplicate
+
+Entries are kept in a bounded LRU and expire after ``ttl_s`` so a static scene is
+re-inferred periodically. Each entry remembers what the miss cost, which is
+added to ``saved_seconds`` on every hit.
+"""
+
+from collections import OrderedDict
+import hashlib, threading, time
+
+import numpy as np
+
+
+def content_key(data):
+    return hashlib.blake2b(data if isinstance(data, bytes) else data.encode(), digest_size=16).digest()
+
+
+def dhash(raw, cv2):
+    """64-bit difference hash of an encoded image, or None if it can't be decoded."""
+    small = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    tiny = cv2.resize(small, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (tiny[:, 1:] > tiny[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class FrameCache:
+    def __init__(self, maxsize=256, ttl_s=2.0, perceptual=False, max_distance=4):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._entries = OrderedDict()   # key -> (expires_at, phash, detections, cost_s)
+        self._lock = threading.Lock()
+        self.stats = {'lookups': 0, 'hits': 0, 'perceptual_hits': 0, 'misses': 0,
+                      'expired': 0, 'evictions': 0, 'saved_seconds': 0.0}
+
+    def _hit(self, key, entry, perceptual):
+        self._entries.move_to_end(key)
+        self.stats['perceptual_hits' if perceptual else 'hits'] += 1
+        self.stats['saved_seconds'] += entry[3]
+        return entry[2]
+
+    def get(self, key, now=None):
+        """Cached detections for an exact payload key, or None."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.stats['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    return self._hit(key, entry, False)
+                del self._entries[key]
+                self.stats['expired'] += 1
+            return None
+
+    def get_similar(self, phash, now=None):
+        """Cached detections for the closest unexpired frame within max_distance bits, or None."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            best_key, best_dist = None, self.max_distance + 1
+            for key, entry in self._entries.items():
+                if entry[1] is None or entry[0] <= now:
+                    continue
+                dist = (entry[1] ^ phash).bit_count()
+                if dist < best_dist:
+                    best_key, best_dist = key, dist
+            if best_key is None:
+                self.stats['misses'] += 1
+                return None
+            return self._hit(best_key, self._entries[best_key], True)
+
+    def miss(self):
+        with self._lock:
+            self.stats['misses'] += 1
+
+    def put(self, key, detections, cost_s, phash=None, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl_s, phash, detections, cost_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            s = dict(self.stats)
+            size = len(self._entries)
+        served = s['hits'] + s['perceptual_hits']
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl_s': self.ttl_s,
+            'perceptual': self.perceptual,
+            'hit_rate': round(served / s['lookups'], 4) if s['lookups'] else 0.0,
+            **s,
+            'saved_seconds': round(s['saved_seconds'], 4),
+        }
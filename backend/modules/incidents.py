@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 import uuid
 
+from .aggregates import AGGREGATES
+from .store import persist
+
 incidents_bp = Blueprint('incidents', __name__)
 
 INCIDENTS = {}
@@ -29,6 +32,8 @@ def create_incident():
         'created_at': datetime.utcnow().isoformat()+'Z'
     }
     INCIDENTS[iid] = inc
+    persist('incidents', inc)
+    AGGREGATES.incident_opened()
     return jsonify(inc), 201
 
 @incidents_bp.route('/<iid>/close', methods=['POST'])
@@ -36,6 +41,9 @@ def close_incident(iid):
     inc = INCIDENTS.get(iid)
     if not inc:
         return jsonify({'error':'not_found'}), 404
+    if inc['status'] == 'open':
+        AGGREGATES.incident_closed()
     inc['status'] = 'closed'
     inc['closed_at'] = datetime.utcnow().isoformat()+'Z'
+    persist('incidents', inc)
     return jsonify(inc)
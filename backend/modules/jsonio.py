@@ -0,0 +1,85 @@
+"""orjson-backed JSON encoding for responses, request bodies and internal NDJSON writers.
+
+Native types serialize without pre-formatting:
+ - datetime / date / time: RFC 3339; naive datetimes are taken as UTC and get a 'Z' suffix,
+   matching the ``datetime.utcnow().isoformat()+'Z'`` strings used by existing records
+ - NumPy arrays and scalars (float32 confidences, int64 counts, ...)
+ - UUID, dataclasses, Decimal, set/frozenset
+
+Anything orjson rejects (e.g. ints wider than 64 bits) falls back to the stdlib encoder.
+Ledger hashing keeps its own canonical stdlib encoding and does not go through here.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+from datetime import datetime
+from decimal import Decimal
+import json
+
+import orjson
+
+from .metrics import span
+
+BASE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):  # NumPy values orjson does not take natively (non-contiguous, float16, ...)
+        return obj.tolist()
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _stdlib_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat() + 'Z' if obj.tzinfo is None else obj.isoformat()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return _default(obj)
+
+
+def dumps(obj, sort_keys=False, indent=False):
+    """Serialize to UTF-8 bytes."""
+    option = BASE_OPTIONS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    try:
+        return orjson.dumps(obj, default=_default, option=option)
+    except orjson.JSONEncodeError:
+        return json.dumps(obj, default=_stdlib_default, sort_keys=sort_keys, indent=2 if indent else None,
+                          separators=None if indent else (',', ':'), ensure_ascii=False).encode()
+
+
+def loads(data):
+    return orjson.loads(data)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider on orjson; encoding time is recorded as the json.dumps span.
+
+    Keys are emitted in insertion order (sort_keys=False) unlike Flask's default, which
+    sorts every object on every response.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        with span('json.dumps'):
+            return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                         indent=bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = not self.compact if self.compact is not None else self._app.debug
+        with span('json.dumps'):
+            body = dumps(obj, sort_keys=self.sort_keys, indent=indent)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -1,10 +1,15 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import hashlib, json, uuid
+import hashlib, json, threading, uuid
+
+from .metrics import span
+from .replay import RECORDER
+from . import shared_state
 
 ledger_bp = Blueprint('ledger', __name__)
 
 LEDGER = []  # in-memory linear chain for MVP
+_ledger_lock = threading.Lock()  # serializes chain extension across request + worker threads
 
 def canonical(obj):
     return json.dumps(obj, sort_keys=True, separators=(',',':'))
@@ -12,22 +17,44 @@ def canonical(obj):
 def compute_event_hash(payload):
     return hashlib.sha256(canonical(payload).encode()).hexdigest()
 
-def append_event(event_type, payload):
-    prev_chain_hash = LEDGER[-1]['chain_hash'] if LEDGER else '0'*64
+def _build_entry(event_type, payload, prev_chain_hash, entry_id):
     event_hash = compute_event_hash(payload)
     chain_input = f"{prev_chain_hash}|{event_hash}|{payload.get('timestamp')}|0"
     chain_hash = hashlib.sha256(chain_input.encode()).hexdigest()
-    entry = {
-        'id': len(LEDGER)+1,
+    return {
+        'id': entry_id,
         'event_type': event_type,
         'payload': payload,
         'event_hash': event_hash,
         'prev_chain_hash': prev_chain_hash,
         'chain_hash': chain_hash
     }
-    LEDGER.append(entry)
+
+def append_event(event_type, payload):
+    if shared_state.SHARED is not None:  # multi-worker: the state server extends the chain
+        with span('ledger.append'):
+            return shared_state.SHARED.ledger_append([(event_type, payload)])[0]
+    with span('ledger.append'), _ledger_lock:
+        prev_chain_hash = LEDGER[-1]['chain_hash'] if LEDGER else '0'*64
+        entry = _build_entry(event_type, payload, prev_chain_hash, len(LEDGER)+1)
+        LEDGER.append(entry)
     return entry
 
+def append_events(events):
+    """Append a batch of (event_type, payload) pairs under a single lock acquisition."""
+    if shared_state.SHARED is not None:
+        with span('ledger.append_batch'):
+            return shared_state.SHARED.ledger_append(events)
+    with span('ledger.append_batch'), _ledger_lock:
+        prev_chain_hash = LEDGER[-1]['chain_hash'] if LEDGER else '0'*64
+        entries = []
+        for event_type, payload in events:
+            entry = _build_entry(event_type, payload, prev_chain_hash, len(LEDGER)+len(entries)+1)
+            entries.append(entry)
+            prev_chain_hash = entry['chain_hash']
+        LEDGER.extend(entries)
+    return entries
+
 @ledger_bp.route('/append', methods=['POST'])
 def api_append():
     data = request.json or {}
@@ -35,6 +62,7 @@ def api_append():
     payload = data.get('payload', {})
     if 'timestamp' not in payload:
         payload['timestamp'] = datetime.utcnow().isoformat()+'Z'
+    RECORDER.record('ledger', {'event_type': event_type, 'payload': payload})
     entry = append_event(event_type, payload)
     return jsonify(entry), 201
 
@@ -46,14 +74,15 @@ def latest():
 def verify():
     failures = []
     last = '0'*64
-    for e in LEDGER:
-        recomputed_event_hash = compute_event_hash(e['payload'])
-        chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
-        expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
-        if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
-            failures.append(e['id'])
-            break
-        last = e['chain_hash']
+    with span('ledger.verify'):
+        for e in LEDGER:
+            recomputed_event_hash = compute_event_hash(e['payload'])
+            chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
+            expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
+            if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
+                failures.append(e['id'])
+                break
+            last = e['chain_hash']
     return jsonify({'valid': len(failures)==0, 'failures': failures, 'length': len(LEDGER)})
 
 @ledger_bp.route('/summary', methods=['GET'])
@@ -63,25 +92,27 @@ def summary():
     # quick verify subset only
     last = '0'*64 if len(LEDGER)==len(recent) else LEDGER[-(window+1)]['chain_hash'] if len(LEDGER)>window else '0'*64
     subset_valid = True
-    for e in recent:
-        recomputed_event_hash = compute_event_hash(e['payload'])
-        chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
-        expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
-        if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
-            subset_valid = False
-            break
-        last = e['chain_hash']
+    with span('ledger.verify_window'):
+        for e in recent:
+            recomputed_event_hash = compute_event_hash(e['payload'])
+            chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
+            expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
+            if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
+                subset_valid = False
+                break
+            last = e['chain_hash']
     # also quick full-chain status (without listing failures) for UI badge
     last = '0'*64
     full_valid = True
-    for e in LEDGER:
-        recomputed_event_hash = compute_event_hash(e['payload'])
-        chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
-        expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
-        if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
-            full_valid = False
-            break
-        last = e['chain_hash']
+    with span('ledger.verify'):
+        for e in LEDGER:
+            recomputed_event_hash = compute_event_hash(e['payload'])
+            chain_input = f"{last}|{recomputed_event_hash}|{e['payload'].get('timestamp')}|0"
+            expected_chain = hashlib.sha256(chain_input.encode()).hexdigest()
+            if expected_chain != e['chain_hash'] or recomputed_event_hash != e['event_hash']:
+                full_valid = False
+                break
+            last = e['chain_hash']
     return jsonify({
         'length': len(LEDGER),
         'window': window,
@@ -0,0 +1,230 @@
+"""Latency instrumentation: histograms, named spans, Prometheus exposition and a sampling profiler.
+
+Hot-path cost is one ``perf_counter`` pair and a ``deque.append`` (atomic under the GIL,
+no lock taken). Pending observations are folded into bucket counts when a scrape
+happens or when the backlog passes ``FOLD_AT``, whichever comes first.
+
+Endpoints (registered under /api):
+ GET  /api/metrics            -> Prometheus text format
+ GET  /api/metrics/profile    -> collapsed stacks from the sampling profiler (flamegraph input)
+ POST /api/metrics/profiler   -> { enabled: bool, interval_ms: int } start/stop sampling
+"""
+
+from flask import Blueprint, Response, g, jsonify, request
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import sys, threading, time
+
+metrics_bp = Blueprint('metrics', __name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FOLD_AT = 4096
+
+
+class _Series:
+    __slots__ = ('bounds', 'counts', 'sum', 'count', 'pending', 'fold_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.pending = deque()
+        self.fold_lock = threading.Lock()
+
+    def observe(self, value):
+        self.pending.append(value)
+        if len(self.pending) > FOLD_AT and self.fold_lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self.fold_lock.release()
+
+    def _fold(self):
+        pending, counts, bounds = self.pending, self.counts, self.bounds
+        while True:
+            try:
+                v = pending.popleft()
+            except IndexError:
+                break
+            counts[bisect_left(bounds, v)] += 1
+            self.sum += v
+            self.count += 1
+
+    def snapshot(self):
+        with self.fold_lock:
+            self._fold()
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, _Series(self.bounds))
+        return series
+
+    def observe(self, value, *labels):
+        self.labels(*labels).observe(value)
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for values, series in sorted(self._series.items()):
+            counts, total, count = series.snapshot()
+            base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values))
+            sep = ',' if base else ''
+            cumulative = 0
+            for bound, c in zip(self.bounds, counts):
+                cumulative += c
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('kavach_http_request_duration_seconds',
+                            'HTTP request latency by endpoint', ('endpoint', 'method', 'status'))
+SPAN_SECONDS = Histogram('kavach_span_duration_seconds', 'Duration of named pipeline stages', ('span',))
+HISTOGRAMS = [REQUEST_SECONDS, SPAN_SECONDS]
+
+
+@contextmanager
+def span(name):
+    """Time a block into kavach_span_duration_seconds{span=name}."""
+    series = SPAN_SECONDS.labels(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        series.observe(time.perf_counter() - t0)
+
+
+def timed(name):
+    """Decorator form of span()."""
+    def wrap(fn):
+        series = SPAN_SECONDS.labels(name)
+
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                series.observe(time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+def instrument_app(app):
+    """Record every request (all blueprints) into kavach_http_request_duration_seconds."""
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        t0 = g.pop('_metrics_t0', None)
+        if t0 is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - t0,
+                                    request.endpoint or 'unmatched', request.method, response.status_code)
+        return response
+
+    return app
+
+
+class SamplingProfiler:
+    """Periodically samples every thread's stack into collapsed-stack counts."""
+
+    def __init__(self):
+        self.interval = 0.01
+        self.samples = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=10):
+        self.interval = max(1, int(interval_ms)) / 1000.0
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                with self._lock:
+                    self.samples[key] = self.samples.get(key, 0) + 1
+
+    def collapsed(self, reset=False):
+        with self._lock:
+            items = sorted(self.samples.items(), key=lambda kv: -kv[1])
+            if reset:
+                self.samples = {}
+        return '\n'.join(f'{stack} {count}' for stack, count in items) + '\n'
+
+
+PROFILER = SamplingProfiler()
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    lines = []
+    for h in HISTOGRAMS:
+        lines.extend(h.expose())
+    lines.append('# HELP kavach_profiler_running Whether the sampling profiler is active')
+    lines.append('# TYPE kavach_profiler_running gauge')
+    lines.append(f'kavach_profiler_running {int(PROFILER.running)}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/metrics/profiler', methods=['POST'])
+def configure_profiler():
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled'):
+        PROFILER.start(data.get('interval_ms', 10))
+    else:
+        PROFILER.stop()
+    return jsonify({'running': PROFILER.running, 'interval_ms': int(PROFILER.interval * 1000)})
+
+
+@metrics_bp.route('/metrics/profile', methods=['GET'])
+def profile_dump():
+    reset = request.args.get('reset', '0') in ('1', 'true', 'True')
+    return Response(PROFILER.collapsed(reset=reset), mimetype='text/plain')
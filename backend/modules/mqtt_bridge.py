@@ -0,0 +1,358 @@
+"""MQTT sensor ingestion bridge.
+
+Field sensors publish to:
+ kavach/sensors/<sensor_id>/detections  -> compact binary records (or JSON, see decode_detections)
+ kavach/sensors/<sensor_id>/telemetry   -> JSON health document, latest kept per sensor
+
+The MQTT network thread only enqueues raw (topic, payload) pairs into a bounded queue.
+A consumer thread drains it in micro-batches (up to ``batch_size`` messages or ``linger_ms``),
+decodes every record with one ``np.frombuffer`` per message and inserts the batch into
+detection_history (ai.record_detections) and THREATS with a single ``add_threats`` call.
+
+When the consumer falls behind, ``policy`` decides what happens to new messages:
+ - block:       the network thread waits, so TCP flow control pushes back on the broker
+ - drop_newest: the incoming message is discarded
+ - drop_oldest: the oldest queued message is discarded to make room
+
+Enabled with MQTT_BROKER_URL=mqtt://host:1883 (paho-mqtt). LocalBroker is an in-process
+stand-in with the same client surface, used by benchmarks/bench_mqtt.py.
+
+Endpoints:
+ GET /api/mqtt/status -> bridge counters, queue depth and latest telemetry per sensor
+"""
+
+from flask import Blueprint, jsonify
+from datetime import datetime
+from urllib.parse import urlsplit
+import json, logging, os, queue, threading, time, uuid
+
+import numpy as np
+
+from .replay import RECORDER
+
+mqtt_bp = Blueprint('mqtt', __name__)
+log = logging.getLogger(__name__)
+
+TOPIC_DETECTIONS = 'kavach/sensors/+/detections'
+TOPIC_TELEMETRY = 'kavach/sensors/+/telemetry'
+
+COMPACT_VERSION = 2
+COMPACT_CLASSES = ['unknown', 'drone', 'consumer_quadcopter', 'prosumer_quadcopter', 'jammer_sweep', 'bird']
+REMOTE_ID_BYTES = 32
+# 46 bytes per record: version, class id, confidence, lat, lon, remote id (ASCII, NUL padded)
+COMPACT_DTYPE = np.dtype([('version', 'u1'), ('cls', 'u1'), ('confidence', '<f4'),
+                          ('lat', '<f4'), ('lon', '<f4'), ('remote_id', f'S{REMOTE_ID_BYTES}')])
+THREAT_CLASSES = {'drone', 'consumer_quadcopter', 'prosumer_quadcopter', 'jammer_sweep'}
+POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+
+def _remote_id(value):
+    rid = value or ''
+    if not isinstance(rid, str):
+        raise ValueError('remote_id must be a string')
+    if len(rid.encode()) > REMOTE_ID_BYTES:
+        raise ValueError(f'remote_id {rid[:40]!r} is longer than {REMOTE_ID_BYTES} bytes')
+    return rid
+
+
+def encode_detections(records):
+    """Pack [{class, confidence, lat, lon, remote_id?}, ...] into the compact wire format.
+
+    Raises ValueError for a remote ID longer than REMOTE_ID_BYTES rather than cutting it.
+    """
+    arr = np.zeros(len(records), dtype=COMPACT_DTYPE)
+    index = {c: i for i, c in enumerate(COMPACT_CLASSES)}
+    for i, r in enumerate(records):
+        arr[i] = (COMPACT_VERSION, index.get(r.get('class'), 0), r.get('confidence', 0),
+                  r.get('lat', 0), r.get('lon', 0), _remote_id(r.get('remote_id')).encode())
+    return arr.tobytes()
+
+
+def _json_detection(doc):
+    cls = doc.get('class')
+    return (cls if cls in COMPACT_CLASSES else 'unknown', float(doc.get('confidence', 0)),
+            float(doc.get('lat', 0)), float(doc.get('lon', 0)), _remote_id(doc.get('remote_id')))
+
+
+def decode_detections(payload):
+    """Return [(class, confidence, lat, lon, remote_id), ...] from a compact or JSON payload.
+
+    JSON documents are read field by field (full precision, no remote ID packing); a record
+    with an oversize remote ID rejects the whole message.
+    """
+    if payload[:1] in (b'{', b'['):
+        docs = json.loads(payload)
+        return [_json_detection(d) for d in (docs if isinstance(docs, list) else [docs])]
+    if len(payload) % COMPACT_DTYPE.itemsize:
+        raise ValueError(f'payload length {len(payload)} is not a multiple of {COMPACT_DTYPE.itemsize}')
+    arr = np.frombuffer(payload, dtype=COMPACT_DTYPE)
+    if len(arr) and (arr['version'] != COMPACT_VERSION).any():
+        raise ValueError('unsupported compact payload version')
+    classes = [COMPACT_CLASSES[c] if c < len(COMPACT_CLASSES) else 'unknown' for c in arr['cls'].tolist()]
+    rids = [r.decode(errors='replace') for r in arr['remote_id'].tolist()]
+    return list(zip(classes, arr['confidence'].tolist(), arr['lat'].tolist(), arr['lon'].tolist(), rids))
+
+
+def _sensor_id(topic):
+    parts = topic.split('/')
+    return parts[2] if len(parts) > 3 else 'unknown'
+
+
+class MQTTBridge:
+    def __init__(self, client, max_pending=10000, batch_size=500, linger_ms=20, policy='drop_oldest'):
+        if policy not in POLICIES:
+            raise ValueError(f'policy must be one of {POLICIES}')
+        self.client = client
+        self.policy = policy
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._consumer = None
+        self.telemetry = {}
+        self.stats = {'received': 0, 'dropped': 0, 'decode_errors': 0, 'batches': 0, 'batch_errors': 0,
+                      'detections': 0, 'threats_created': 0, 'telemetry': 0}
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+
+    # -- network thread -------------------------------------------------
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        client.subscribe([(TOPIC_DETECTIONS, 0), (TOPIC_TELEMETRY, 0)])
+
+    def _on_message(self, client, userdata, msg):
+        self.stats['received'] += 1
+        item = (msg.topic, bytes(msg.payload), time.time())
+        if self.policy == 'block':
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == 'drop_newest':
+                self.stats['dropped'] += 1
+                return
+            try:
+                self._queue.get_nowait()
+                self.stats['dropped'] += 1
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.stats['dropped'] += 1
+
+    # -- consumer thread ------------------------------------------------
+    def start(self):
+        self._stop.clear()
+        self._consumer = threading.Thread(target=self._run, name='mqtt-consumer', daemon=True)
+        self._consumer.start()
+        self.client.loop_start()
+        return self
+
+    def stop(self, drain=True):
+        self.client.loop_stop()
+        if drain:
+            self.drain()
+        self._stop.set()
+        if self._consumer is not None:
+            self._consumer.join(timeout=2)
+
+    def drain(self, timeout=10):
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.005)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception:
+                # one bad batch (a failing store listener, a bug) must not stop ingestion
+                self.stats['batch_errors'] += 1
+                log.exception('mqtt bridge: dropped a batch of %d messages', len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _process(self, batch):
+        from .ai import record_detections, runtime_config
+        from .threats import WHITELIST, add_threats
+
+        detections, threats = [], []
+        threshold = runtime_config['fusion_confidence_threshold']
+        now = datetime.utcnow().isoformat()+'Z'
+        local_now = datetime.now().isoformat()
+        for topic, payload, received_at in batch:
+            if topic.endswith('/telemetry'):
+                try:
+                    doc = json.loads(payload)
+                except ValueError:
+                    doc = None
+                if not isinstance(doc, dict):
+                    self.stats['decode_errors'] += 1
+                    continue
+                doc['received_at'] = received_at
+                self.telemetry[_sensor_id(topic)] = doc
+                self.stats['telemetry'] += 1
+                continue
+            try:
+                records = decode_detections(payload)
+            except (ValueError, TypeError, AttributeError):
+                self.stats['decode_errors'] += 1
+                continue
+            sensor = _sensor_id(topic)
+            for cls, conf, lat, lon, rid in records:
+                conf = round(conf, 3)
+                detections.append({
+                    'id': str(uuid.uuid4()),
+                    'class': cls,
+                    'confidence': conf,
+                    'timestamp': local_now,
+                    'camera_source': f'mqtt:{sensor}',
+                    'location': {'lat': lat, 'lon': lon},
+                })
+                if cls in THREAT_CLASSES and conf >= threshold:
+                    remote_id = rid or f'RID-{str(uuid.uuid4())[:6]}'
+                    threats.append({
+                        'id': str(uuid.uuid4()),
+                        'class': cls,
+                        'confidence': conf,
+                        'location': {'lat': lat, 'lon': lon},
+                        'status': 'detected',
+                        'created_at': now,
+                        'remote_id': remote_id,
+                        'authorized': remote_id in WHITELIST,
+                        'source': f'mqtt:{sensor}',
+                    })
+        RECORDER.record('detections', detections)
+        record_detections(detections)
+        if threats:
+            RECORDER.record('threats', threats)
+            add_threats(threats)
+        self.stats['batches'] += 1
+        self.stats['detections'] += len(detections)
+        self.stats['threats_created'] += len(threats)
+
+
+class _LocalMessage:
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def topic_matches(pattern, topic):
+    p, t = pattern.split('/'), topic.split('/')
+    for i, part in enumerate(p):
+        if part == '#':
+            return True
+        if i >= len(t) or (part != '+' and part != t[i]):
+            return False
+    return len(p) == len(t)
+
+
+class LocalBroker:
+    """In-process MQTT stand-in: publish() delivers synchronously on the publisher's thread."""
+
+    def __init__(self):
+        self._subs = []
+        self._lock = threading.Lock()
+
+    def client(self):
+        return LocalClient(self)
+
+    def publish(self, topic, payload):
+        with self._lock:
+            subs = list(self._subs)
+        for pattern, client in subs:
+            if topic_matches(pattern, topic) and client.on_message and client.running:
+                client.on_message(client, None, _LocalMessage(topic, payload))
+
+
+class LocalClient:
+    """Subset of paho.mqtt.client.Client used by MQTTBridge."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_connect = None
+        self.on_message = None
+        self.running = False
+
+    def connect(self, host=None, port=None, keepalive=60):
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topics, qos=0):
+        if isinstance(topics, str):
+            topics = [(topics, qos)]
+        with self.broker._lock:
+            self.broker._subs.extend((pattern, self) for pattern, _ in topics)
+
+    def publish(self, topic, payload, qos=0):
+        self.broker.publish(topic, payload)
+
+    def loop_start(self):
+        self.running = True
+
+    def loop_stop(self):
+        self.running = False
+
+    def disconnect(self):
+        self.running = False
+
+
+BRIDGE = None
+
+
+def start_bridge_from_env():
+    """Connect to MQTT_BROKER_URL with paho-mqtt if configured; returns the bridge or None."""
+    global BRIDGE
+    url = os.environ.get('MQTT_BROKER_URL')
+    if not url or BRIDGE is not None:
+        return BRIDGE
+    try:
+        import paho.mqtt.client as mqtt  # type: ignore
+    except Exception:  # pragma: no cover - optional dependency
+        return None
+    parts = urlsplit(url)
+    client = mqtt.Client(client_id=f'kavach-{uuid.uuid4().hex[:8]}')
+    if parts.username:
+        client.username_pw_set(parts.username, parts.password)
+    BRIDGE = MQTTBridge(
+        client,
+        max_pending=int(os.environ.get('MQTT_MAX_PENDING', 10000)),
+        batch_size=int(os.environ.get('MQTT_BATCH_SIZE', 500)),
+        linger_ms=int(os.environ.get('MQTT_LINGER_MS', 20)),
+        policy=os.environ.get('MQTT_DROP_POLICY', 'drop_oldest'),
+    )
+    client.connect_async(parts.hostname, parts.port or 1883)
+    BRIDGE.start()
+    return BRIDGE
+
+
+@mqtt_bp.route('/status', methods=['GET'])
+def status():
+    if BRIDGE is None:
+        return jsonify({'enabled': False})
+    return jsonify({
+        'enabled': True,
+        'policy': BRIDGE.policy,
+        'pending': BRIDGE.pending(),
+        'stats': dict(BRIDGE.stats),
+        'telemetry': BRIDGE.telemetry,
+    })
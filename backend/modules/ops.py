@@ -1,11 +1,14 @@
-from flask import Blueprint, jsonify
-from datetime import datetime, timedelta
-import io, json, random, base64, zipfile
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from datetime import datetime
 
-from .ledger import LEDGER, compute_event_hash
+from .aggregates import AGGREGATES
+from .evidence import parse_bound, stream_bundle
+from .ledger import LEDGER
 from .threats import THREATS
 from .incidents import INCIDENTS
 from .commands import DRONE_STATE, COMMAND_LOG
+from .replay import RNG
+from . import shared_state
 
 ops_bp = Blueprint('ops', __name__)
 
@@ -17,9 +20,8 @@ def ops_mode():
     ECO: no threats in last 10m
     NORMAL: otherwise
     """
-    now = datetime.utcnow()
-    recent = [t for t in THREATS.values() if (now - datetime.fromisoformat(t['created_at'].rstrip('Z')))< timedelta(minutes=10)]
-    high = any(t['confidence'] >= 0.85 and (now - datetime.fromisoformat(t['created_at'].rstrip('Z'))) < timedelta(minutes=5) for t in THREATS.values())
+    recent = AGGREGATES.window(600)['count']
+    high = AGGREGATES.window(300)['max_confidence'] >= 0.85
     if high:
         mode = 'HIGH_ALERT'
     elif not recent:
@@ -28,14 +30,15 @@ def ops_mode():
         mode = 'NORMAL'
     # simulated savings: eco saves 40%, normal 15%, high alert -10% (surge)
     savings = 0.4 if mode=='ECO' else 0.15 if mode=='NORMAL' else -0.10
-    return jsonify({'mode': mode, 'simulated_energy_delta': savings, 'threats_recent_10m': len(recent)})
+    return jsonify({'mode': mode, 'simulated_energy_delta': savings, 'threats_recent_10m': recent})
 
 
 @ops_bp.route('/ros/summary', methods=['GET'])
 def ros_summary():
     """Return a simulated Return on Security (ROS) summary based on current threats & incidents."""
-    threat_count = len(THREATS)
-    incidents_open = len([i for i in INCIDENTS.values() if i['status']=='open'])
+    totals = AGGREGATES.snapshot_totals()
+    threat_count = totals['threats']
+    incidents_open = totals['incidents_open']
     # simplistic model: avoided_cost = base * (threat_count + incidents_open*2)
     base_unit = 12500  # arbitrary unit cost per significant event
     avoided = base_unit * (threat_count + incidents_open*2)
@@ -51,42 +54,86 @@ def ros_summary():
 
 @ops_bp.route('/risk/score', methods=['GET'])
 def risk_score():
-    # Combine: number of unauthorized threats, max confidence, open incidents
-    unauthorized = [t for t in THREATS.values() if not t.get('authorized')]
-    max_conf = max([t['confidence'] for t in THREATS.values()], default=0)
-    open_inc = len([i for i in INCIDENTS.values() if i['status']=='open'])
+    # Combine: number of unauthorized threats, max confidence, open incidents, zone exposure
+    totals = AGGREGATES.snapshot_totals()
+    unauthorized = totals['unauthorized']
+    max_conf = totals['max_confidence']
+    open_inc = totals['incidents_open']
+    zone_severity = totals['zone_severity']
     # heuristic scoring
     score = 0
-    score += min(60, len(unauthorized) * 12)
+    score += min(60, unauthorized * 12)
     score += int(max_conf * 25)
     score += min(15, open_inc * 5)
+    score += min(20, int(zone_severity * 10))
     score = min(100, score)
     return jsonify({
         'score': score,
         'components': {
-            'unauthorized_count': len(unauthorized),
+            'unauthorized_count': unauthorized,
             'max_confidence': max_conf,
-            'open_incidents': open_inc
+            'open_incidents': open_inc,
+            'zone_severity': round(zone_severity, 3),
+            'unauthorized_in_restricted': totals['unauthorized_in_restricted']
         }
     })
 
 
+@ops_bp.route('/ops/timeseries', methods=['GET'])
+def ops_timeseries():
+    """Threat counts per bucket for dashboard charts.
+
+    ?resolution=minute (default, up to 24h) or second (up to 10m); ?window=<seconds>, clamped to that range.
+    """
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in ('minute', 'second'):
+        return jsonify({'error': 'invalid_resolution'}), 400
+    limit = 86400 if resolution == 'minute' else 600
+    try:
+        window = int(request.args.get('window', limit))
+    except ValueError:
+        return jsonify({'error': 'invalid_params', 'detail': 'window must be a whole number of seconds'}), 400
+    if window <= 0:
+        return jsonify({'error': 'invalid_params', 'detail': 'window must be positive'}), 400
+    window = min(window, limit)
+    return jsonify({
+        'resolution': resolution,
+        'window_s': window,
+        'buckets': AGGREGATES.series(window, resolution)
+    })
+
+
+def _snapshot(items):
+    """Iterate a list by index up to its current length (appends during export are excluded)."""
+    for i in range(len(items)):
+        yield items[i]
+
+
 @ops_bp.route('/evidence/bundle', methods=['GET'])
 def evidence_bundle():
-    """Produce a downloadable evidence bundle (zip -> base64) for demo purposes."""
-    bundle = {
-        'generated_at': datetime.utcnow().isoformat()+'Z',
-        'ledger_tail': LEDGER[-50:],
-        'threats_snapshot': list(THREATS.values())[-25:],
-        'incidents': list(INCIDENTS.values()),
-        'drone_state': DRONE_STATE,
-        'command_log_tail': COMMAND_LOG[-25:],
-    }
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr('evidence.json', json.dumps(bundle, indent=2))
-    b64 = base64.b64encode(mem.getvalue()).decode()
-    return jsonify({'filename': 'project_kavach_evidence_bundle.zip', 'base64': b64, 'size_bytes': len(mem.getvalue())})
+    """Stream a forensic evidence bundle as application/zip.
+
+    Optional ``from`` / ``to`` ISO-8601 query params restrict ledger, threat, incident and
+    command records to a time range; without them the full history is exported.
+    """
+    try:
+        start = parse_bound(request.args.get('from'))
+        end = parse_bound(request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'error': 'invalid_range', 'detail': f'from/to must be ISO-8601 timestamps: {e}'}), 400
+    if start is not None and end is not None and start > end:
+        return jsonify({'error': 'invalid_range', 'detail': 'from is after to'}), 400
+    sections = [
+        ('ledger.ndjson', _snapshot(LEDGER), lambda e: e['payload'].get('timestamp')),
+        ('threats.ndjson', list(THREATS.values()), lambda t: t.get('created_at')),
+        ('incidents.ndjson', list(INCIDENTS.values()), lambda i: i.get('created_at')),
+        ('commands.ndjson', _snapshot(COMMAND_LOG), lambda c: c.get('timestamp')),
+    ]
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    resp = Response(stream_with_context(stream_bundle(sections, start, end, extra={'drone_state.json': dict(DRONE_STATE)})),
+                    mimetype='application/zip')
+    resp.headers['Content-Disposition'] = f'attachment; filename="project_kavach_evidence_{stamp}.zip"'
+    return resp
 
 
 @ops_bp.route('/ledger/corrupt', methods=['POST'])
@@ -94,11 +141,12 @@ def corrupt_ledger():
     """Intentionally corrupt one random ledger entry's chain_hash for demo verification failure."""
     if len(LEDGER) < 3:
         return jsonify({'error': 'not_enough_events'}), 400
-    target = random.choice(LEDGER[1:-1])  # avoid first & last for easier demo
+    target = RNG.choice(LEDGER[1:-1])  # avoid first & last for easier demo
     original = target['chain_hash']
     # flip a couple of characters deterministically
     mutated = list(original)
     mutated[5] = '0' if mutated[5] != '0' else 'f'
     mutated[17] = 'a' if mutated[17] != 'a' else '1'
     target['chain_hash'] = ''.join(mutated)
+    shared_state.publish('ledger_patch', [(target['id'], {'chain_hash': target['chain_hash']})])
     return jsonify({'corrupted_entry_id': target['id'], 'new_chain_hash': target['chain_hash']})
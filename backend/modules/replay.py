@@ -0,0 +1,454 @@
+"""Record and replay of pipeline inputs.
+
+Everything random in the pipeline (simulated detections, fusion location jitter, threat
+seeding, generated ids) draws from ``RNG``, a seedable ``random.Random``. Starting a
+recording reseeds it, and replay reseeds it with the same seed. A replay of a capture
+therefore creates the same detections, threats and ledger events as the live run it
+came from (given single-threaded traffic) and as every other replay of it. Outside a
+recording or replay ``new_id`` returns plain ``uuid4()`` ids: a seeded Mersenne Twister's
+output can be predicted from the ids it has already issued.
+
+The recorder captures the inputs at the API boundary. Outputs derived from those inputs
+(fusion threats, command results, ledger entries) are not captured:
+
+    frame            base64 JPEG posted to /api/ai/frame
+    process          camera tick on /api/ai/process
+    detections       detections decoded by the MQTT bridge
+    threats          threat docs from /api/threats, bulk ingest, sensors, MQTT
+    threat_seed      /api/threats/seed (regenerated from RNG on replay)
+    command          accepted dispatch / return / abort commands
+    ledger           events posted to /api/ledger/append
+    whitelist_add / whitelist_remove / whitelist_replace   rule changes (whitelist.py)
+    zones            zone changes on /api/airspace/zones (zones.py)
+    positions        threat position fixes on /api/threats/positions (tracks.py)
+
+A capture is one gzip stream of records: ``<B kind><d seconds since start><I length>``
+then the payload (orjson, or the raw base64 text for frames). gzip brings base64 frames
+back to about their binary size, and a frame identical to one of the last FRAME_REFS
+distinct frames is stored as a ``frame_ref`` to it instead of again.
+
+Replay feeds the records through the same functions the routes use. ``speed=1`` keeps
+the recorded timing, ``speed=0`` runs as fast as possible. The frame cache is given the
+recorded clock, so its hits do not depend on replay speed. Replays started from the API
+run in a child process with persistence, shared state and MQTT disabled, so they never
+touch the serving process's collections, aggregates or store.
+
+    python -m modules.replay run captures/session.kvr [--speed 0] [--seed N] [--json]
+    python -m modules.replay info captures/session.kvr
+"""
+
+from flask import Blueprint, jsonify, request
+from collections import OrderedDict
+from datetime import datetime
+import argparse, gzip, hashlib, os, random, struct, subprocess, sys, threading, time, uuid
+
+from .frame_cache import content_key
+from .jsonio import dumps, loads
+
+replay_bp = Blueprint('replay', __name__)
+
+CAPTURE_DIR = os.environ.get('KAVACH_CAPTURE_DIR', 'captures')
+CAPTURE_VERSION = 1
+KINDS = ('header', 'frame', 'process', 'detections', 'threats', 'threat_seed', 'command', 'ledger',
+         'whitelist_add', 'whitelist_remove', 'frame_ref', 'whitelist_replace', 'zones', 'positions')
+FRAME_REFS = 1024
+_KIND_CODES = {k: i for i, k in enumerate(KINDS)}
+_RECORD = struct.Struct('<BdI')
+
+# Shared by every simulated / generated value in the pipeline (see module docstring)
+RNG = random.Random()
+_seeded = False   # ids come from RNG only while recording / replaying
+
+
+def seed_rng(seed=None):
+    """Reseed RNG and draw ids from it; returns the seed used (a fresh one when ``seed`` is None)."""
+    global _seeded
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    RNG.seed(seed)
+    _seeded = True
+    return seed
+
+
+def release_rng():
+    """Back to uuid4 ids and an unseeded RNG once a recording or replay ends."""
+    global _seeded
+    _seeded = False
+    RNG.seed()
+
+
+def new_id():
+    """uuid4-format id: drawn from RNG while seeded, so replays create the same ids; uuid4() otherwise."""
+    if _seeded:
+        return str(uuid.UUID(int=RNG.getrandbits(128), version=4))
+    return str(uuid.uuid4())
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._started = None
+        self.path = None
+        self.seed = None
+        self.counts = {}
+        self._frames = OrderedDict()   # content key -> distinct frame number (last FRAME_REFS)
+
+    @property
+    def active(self):
+        return self._file is not None
+
+    def start(self, path, seed=None):
+        with self._lock:
+            if self._file is not None:
+                raise RuntimeError(f'already recording to {self.path}')
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # level 1: recording sits on the request path
+            self._file = gzip.open(path, 'wb', compresslevel=1)
+            self.path = path
+            self.seed = seed_rng(seed)
+            self.counts = {}
+            self._frames.clear()
+            self._started = time.monotonic()
+            self._write('header', {'version': CAPTURE_VERSION, 'seed': self.seed,
+                                   'started_at': datetime.utcnow().isoformat()+'Z'})
+        return self.status()
+
+    def stop(self):
+        with self._lock:
+            if self._file is None:
+                return None
+            self._file.close()
+            self._file = None
+            release_rng()
+        return self.status()
+
+    def record(self, kind, payload):
+        """Append one input event; a no-op unless recording."""
+        if self._file is None:
+            return
+        with self._lock:
+            if self._file is not None:
+                self._write(kind, payload)
+
+    def _write(self, kind, payload):
+        if kind == 'frame':
+            key = content_key(payload)
+            if key in self._frames:
+                kind, data = 'frame_ref', dumps(self._frames[key])
+            else:
+                self._frames[key] = self.counts.get('frame', 0)
+                if len(self._frames) > FRAME_REFS:
+                    self._frames.popitem(last=False)
+                data = payload.encode()
+        else:
+            data = dumps(payload)
+        self._file.write(_RECORD.pack(_KIND_CODES[kind], time.monotonic() - self._started, len(data)))
+        self._file.write(data)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def status(self):
+        return {'recording': self.active, 'path': self.path, 'seed': self.seed,
+                'events': sum(self.counts.values()), 'counts': dict(self.counts),
+                'bytes': os.path.getsize(self.path) if self.path and os.path.exists(self.path) else 0}
+
+
+RECORDER = Recorder()
+
+
+def read_capture(path):
+    """Yield (kind, seconds, payload) records; the first is the header. frame_refs come back as frames."""
+    frames = OrderedDict()   # distinct frame number -> base64, mirrors Recorder._frames
+    distinct = 0
+    with gzip.open(path, 'rb') as f:
+        while True:
+            head = f.read(_RECORD.size)
+            if not head:
+                return
+            if len(head) < _RECORD.size:
+                raise ValueError(f'{path}: truncated record header')
+            code, t, length = _RECORD.unpack(head)
+            data = f.read(length)
+            if len(data) < length:
+                raise ValueError(f'{path}: truncated record')
+            kind = KINDS[code]
+            if kind == 'frame':
+                payload = data.decode()
+                frames[distinct] = payload
+                distinct += 1
+                if len(frames) > FRAME_REFS:
+                    frames.popitem(last=False)
+            elif kind == 'frame_ref':
+                kind, payload = 'frame', frames[loads(data)]
+            else:
+                payload = loads(data)
+            yield kind, t, payload
+
+
+class Replayer:
+    """Feeds a capture back through the pipeline. ``speed`` 1.0 = recorded timing, 0 = unthrottled."""
+
+    def __init__(self, path, speed=0.0, seed=None):
+        self.path = path
+        self.speed = speed
+        self.seed = seed
+        self.state = 'pending'
+        self.error = None
+        self.stats = {'events': 0, 'by_kind': {}, 'seconds_by_kind': {}, 'max_lag_s': 0.0,
+                      'elapsed_s': None, 'events_per_s': None}
+        self._last_command = None
+
+    def run(self):
+        from .ai import FRAME_CACHE, detection_history
+        from .commands import COMMAND_LOG
+        from .ledger import LEDGER
+        from .threats import THREATS
+        self.state = 'running'
+        # compared by identity: a recorded doc replayed under an id that already exists is a new object
+        threats_before = dict(THREATS)
+        ledger_before, commands_before = len(LEDGER), len(COMMAND_LOG)
+        detections_before = list(detection_history)   # held so their id()s are not reused
+        seen_detections = {id(d) for d in detections_before}
+        records = read_capture(self.path)
+        try:
+            kind, _, header = next(records)
+            if kind != 'header' or header.get('version') != CAPTURE_VERSION:
+                raise ValueError(f'{self.path}: not a version {CAPTURE_VERSION} capture')
+            self.seed = seed_rng(header.get('seed') if self.seed is None else self.seed)
+            FRAME_CACHE.clear()
+            handlers = self._handlers()
+            clock_base = time.monotonic()   # recorded t=0 on the frame-cache clock
+            t0 = time.perf_counter()
+            for kind, t, payload in records:
+                if self.speed > 0:
+                    lag = time.perf_counter() - t0 - t / self.speed
+                    if lag < 0:
+                        time.sleep(-lag)
+                    elif lag > self.stats['max_lag_s']:
+                        self.stats['max_lag_s'] = round(lag, 4)
+                k0 = time.perf_counter()
+                handlers[kind](payload, clock_base + t)
+                spent = self.stats['seconds_by_kind']
+                spent[kind] = spent.get(kind, 0.0) + time.perf_counter() - k0
+                self.stats['by_kind'][kind] = self.stats['by_kind'].get(kind, 0) + 1
+                self.stats['events'] += 1
+            if self._last_command is not None:
+                from .commands import PIPELINE
+                PIPELINE.drain(timeout=30)
+            elapsed = time.perf_counter() - t0
+            self.stats['elapsed_s'] = round(elapsed, 4)
+            self.stats['events_per_s'] = round(self.stats['events'] / elapsed, 1) if elapsed else None
+            self.stats['seconds_by_kind'] = {k: round(v, 4) for k, v in self.stats['seconds_by_kind'].items()}
+            created = [t for tid, t in THREATS.items() if threats_before.get(tid) is not t]
+            self.stats['threats_created'] = len(created)
+            self.stats['ledger_appended'] = len(LEDGER) - ledger_before
+            self.stats['digest'] = outcome_digest(
+                created, [d for d in detection_history if id(d) not in seen_detections],
+                COMMAND_LOG[commands_before:])
+            self.state = 'done'
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            raise
+        finally:
+            records.close()
+            release_rng()
+        return self.status()
+
+    def _handlers(self):
+        from . import ai
+        from .airspace import change_whitelist, change_zones
+        from .commands import PIPELINE
+        from .ledger import append_event
+        from .threats import add_threats, generate_seed_threats, update_positions
+        from .whitelist import normalize_change
+
+        def frame(b64, now):
+            try:
+                ai.analyze_frame(b64, now=now)
+            except ValueError:
+                pass  # rejected live with a 400 as well
+
+        def command(doc, now):
+            self._last_command = PIPELINE.submit(doc['command'], doc.get('params'))[0]['id']
+
+        def whitelist(mode):
+            return lambda change, now: change_whitelist(mode, normalize_change(change))
+
+        return {
+            'frame': frame,
+            'process': lambda doc, now: ai.simulate_camera_detections(doc['camera_url']),
+            'detections': lambda docs, now: ai.record_detections(docs),
+            'threats': lambda docs, now: add_threats(docs),
+            'threat_seed': lambda doc, now: generate_seed_threats(doc['count']),
+            'command': command,
+            'ledger': lambda doc, now: append_event(doc['event_type'], doc['payload']),
+            'whitelist_add': whitelist('add'),
+            'whitelist_remove': whitelist('remove'),
+            'whitelist_replace': whitelist('replace'),
+            'zones': lambda doc, now: change_zones(doc['mode'], doc['zones']),
+            'positions': lambda fixes, now: update_positions([tuple(f) for f in fixes]),
+        }
+
+    def status(self):
+        return {'state': self.state, 'path': self.path, 'speed': self.speed, 'seed': self.seed,
+                'error': self.error, **self.stats}
+
+
+def outcome_digest(threats, detections, commands):
+    """Digest of what the pipeline produced (timestamps and command ids excluded), for comparing runs."""
+    h = hashlib.sha256()
+    for t in threats:
+        h.update(dumps([t['id'], t['class'], t['confidence'], t['location'], t['remote_id'], t['authorized'], t.get('zone')]))
+    for d in detections:
+        h.update(dumps([d['id'], d['class'], d['confidence'], d.get('bbox')]))
+    for c in commands:
+        h.update(dumps([c['command'], c.get('extra')]))
+    return h.hexdigest()
+
+
+def capture_path(name):
+    """Captures live in CAPTURE_DIR; only a bare file name is accepted from the API."""
+    if not name or os.path.basename(name) != name or name.startswith('.'):
+        raise ValueError('name must be a plain file name')
+    return os.path.join(CAPTURE_DIR, name)
+
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ISOLATED_ENV = ('KAVACH_DB_URL', 'KAVACH_STATE_SERVER', 'MQTT_BROKER_URL')
+
+
+class ReplayProcess:
+    """A replay run by ``python -m modules.replay run`` in a child process (isolated state)."""
+
+    def __init__(self, path, speed=0.0, seed=None):
+        self.path = os.path.abspath(path)
+        self.speed = speed
+        self.seed = seed
+        self.state = 'pending'
+        self.error = None
+        self.stats = {}
+
+    def run(self):
+        cmd = [sys.executable, '-m', 'modules.replay', 'run', self.path, '--speed', str(self.speed), '--json']
+        if self.seed is not None:
+            cmd += ['--seed', str(self.seed)]
+        env = {k: v for k, v in os.environ.items() if k not in _ISOLATED_ENV}
+        self.state = 'running'
+        out = subprocess.run(cmd, cwd=_BACKEND_DIR, env=env, capture_output=True, text=True)
+        lines = out.stdout.strip().splitlines()
+        if out.returncode != 0 or not lines:
+            self.state = 'failed'
+            self.error = (out.stderr.strip().splitlines() or [f'exit status {out.returncode}'])[-1]
+            return self.status()
+        summary = loads(lines[-1])
+        self.state, self.error, self.seed = summary.pop('state'), summary.pop('error'), summary.pop('seed')
+        for key in ('path', 'speed'):
+            summary.pop(key, None)
+        self.stats = summary
+        return self.status()
+
+    def status(self):
+        return {'state': self.state, 'path': self.path, 'speed': self.speed, 'seed': self.seed,
+                'error': self.error, **self.stats}
+
+
+_REPLAY = None
+_replay_lock = threading.Lock()
+
+
+@replay_bp.route('/status', methods=['GET'])
+def status():
+    return jsonify({'recorder': RECORDER.status(), 'replay': _REPLAY.status() if _REPLAY else None})
+
+
+@replay_bp.route('/record/start', methods=['POST'])
+def record_start():
+    data = request.get_json(silent=True) or {}
+    name = data.get('name') or f"capture-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.kvr"
+    try:
+        path = capture_path(name)
+        seed = None if data.get('seed') is None else int(data['seed'])
+    except ValueError as e:
+        return jsonify({'error': 'invalid_input', 'detail': str(e)}), 400
+    try:
+        return jsonify(RECORDER.start(path, seed)), 201
+    except RuntimeError as e:
+        return jsonify({'error': 'already_recording', 'detail': str(e)}), 409
+
+
+@replay_bp.route('/record/stop', methods=['POST'])
+def record_stop():
+    result = RECORDER.stop()
+    if result is None:
+        return jsonify({'error': 'not_recording'}), 409
+    return jsonify(result)
+
+
+@replay_bp.route('/run', methods=['POST'])
+def run():
+    """Start a replay in a background child process; poll /api/replay/status."""
+    global _REPLAY
+    data = request.get_json(silent=True) or {}
+    try:
+        path = capture_path(data.get('name'))
+        speed = float(data.get('speed', 1.0))
+        seed = None if data.get('seed') is None else int(data['seed'])
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'invalid_input', 'detail': str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({'error': 'not_found'}), 404
+    with _replay_lock:
+        if _REPLAY is not None and _REPLAY.state == 'running':
+            return jsonify({'error': 'replay_running', 'detail': _REPLAY.path}), 409
+        if RECORDER.active:
+            return jsonify({'error': 'recording', 'detail': 'stop the recording before replaying'}), 409
+        _REPLAY = ReplayProcess(path, speed=max(0.0, speed), seed=seed)
+        replayer = _REPLAY
+        replayer.state = 'running'
+
+    def target():
+        try:
+            replayer.run()
+        except Exception as e:
+            replayer.state, replayer.error = 'failed', str(e)
+    threading.Thread(target=target, name='replay', daemon=True).start()
+    return jsonify(replayer.status()), 202
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KAVACH capture replay')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    run_p = sub.add_parser('run', help='replay a capture into a fresh in-process pipeline')
+    run_p.add_argument('path')
+    run_p.add_argument('--speed', type=float, default=0.0, help='1 = recorded timing, 0 = as fast as possible')
+    run_p.add_argument('--seed', type=int, default=None, help='override the seed stored in the capture')
+    run_p.add_argument('--json', action='store_true', help='print the summary as one JSON line')
+    info_p = sub.add_parser('info', help='print the header and per-kind event counts')
+    info_p.add_argument('path')
+    args = parser.parse_args()
+
+    if args.cmd == 'info':
+        counts, size, duration, header = {}, 0, 0.0, None
+        for kind, t, payload in read_capture(args.path):
+            if kind == 'header':
+                header = payload
+                continue
+            counts[kind] = counts.get(kind, 0) + 1
+            duration = t
+        print(dumps({'header': header, 'duration_s': round(duration, 3), 'counts': counts,
+                     'bytes': os.path.getsize(args.path)}, indent=True).decode())
+        return
+
+    from . import ai
+    ai._load_model_if_enabled()  # replay with the live inference path when ENABLE_YOLO=1
+    summary = Replayer(args.path, speed=args.speed, seed=args.seed).run()
+    if args.json:
+        sys.stdout.write(dumps(summary).decode() + '\n')
+    else:
+        print(dumps(summary, indent=True).decode())
+
+
+if __name__ == '__main__':
+    # run as modules.replay: the pipeline imports that module, and its RNG is the one to seed
+    from . import replay
+    replay.main()
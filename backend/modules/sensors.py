@@ -0,0 +1,298 @@
+"""RF / acoustic spectral processing and multi-sensor fusion.
+
+Works on batches of fixed-length windows so every stage is a single NumPy call:
+ - RF:       Hann-windowed FFT of complex baseband IQ -> power spectrum (dB). Each rf_profile
+             is scored on mean in-band SNR (against its snr_db_range), in-band occupancy and
+             emptiness of a guard band either side (separates 20 MHz links from 40 MHz sweeps).
+ - Acoustic: STFT (strided frames, rfft) -> mean magnitude spectrum. harmonic_peaks are
+             checked at a grid of RPM scale factors spanning blade_rpm; the best-matching
+             scale's mean peak prominence above the median floor is the class score.
+ - Fusion:   per class noisy-OR of sensor scores (each weighted) plus vision detections
+             mapped onto the same classes, giving one threat confidence per window.
+
+Profiles come from data/synthetic/generator_config.yaml (see modules.synthetic).
+
+Endpoints:
+ GET  /api/sensors/profiles  -> classes and the frequency grids in use
+ POST /api/sensors/analyze   -> score submitted IQ / audio (+ optional vision) and fuse into a threat
+"""
+
+from flask import Blueprint, jsonify, request
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import base64, threading, uuid
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from .metrics import span
+from .replay import RECORDER
+from .threats import Location
+
+sensors_bp = Blueprint('sensors', __name__)
+
+SENSOR_WEIGHTS = {'rf': 0.9, 'acoustic': 0.8, 'vision': 1.0}
+# ai.py detection classes -> config classes they are evidence for
+VISION_CLASS_MAP = {
+    'drone': ('consumer_quadcopter', 'prosumer_quadcopter'),
+    'quadcopter': ('consumer_quadcopter', 'prosumer_quadcopter'),
+    'ai_detected_drone': ('consumer_quadcopter', 'prosumer_quadcopter'),
+    'bird': ('bird',),
+}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class SpectralEngine:
+    def __init__(self, config=None, rf_sample_rate=160e6, rf_center_mhz=2450.0, rf_nfft=1024,
+                 audio_rate=8000, stft_nperseg=1024, stft_hop=512, rpm_steps=9):
+        from .synthetic import SensorProfiles, load_config
+        self.profiles = SensorProfiles(config or load_config())
+        self.classes = self.profiles.classes
+        self.rf_nfft = rf_nfft
+        self.rf_sample_rate = rf_sample_rate
+        self.rf_center_mhz = rf_center_mhz
+        self.audio_rate = audio_rate
+        self.stft_nperseg = stft_nperseg
+        self.stft_hop = stft_hop
+        self._prepare_rf()
+        self._prepare_acoustic(rpm_steps)
+
+    def _prepare_rf(self):
+        p = self.profiles
+        self.rf_window = np.hanning(self.rf_nfft).astype(np.float32)
+        offsets = np.fft.fftshift(np.fft.fftfreq(self.rf_nfft, 1 / self.rf_sample_rate)) / 1e6
+        self.rf_freqs_mhz = self.rf_center_mhz + offsets
+        dist = np.abs(self.rf_freqs_mhz[None, :] - np.nan_to_num(p.rf_center)[:, None])
+        half = (p.rf_bw / 2)[:, None]
+        has_rf = np.isfinite(p.rf_center)[:, None]
+        self.rf_in = ((dist <= half) & has_rf).astype(np.float32)
+        self.rf_guard = ((dist > half) & (dist <= 2 * half) & has_rf).astype(np.float32)
+        self.rf_in_n = np.maximum(self.rf_in.sum(axis=1), 1)
+        self.rf_guard_n = np.maximum(self.rf_guard.sum(axis=1), 1)
+        self.rf_snr_lo = p.rf_snr[:, 0]
+        self.has_rf = has_rf[:, 0]
+
+    def _prepare_acoustic(self, rpm_steps):
+        p = self.profiles
+        self.audio_window = np.hanning(self.stft_nperseg).astype(np.float32)
+        self.audio_freqs = np.fft.rfftfreq(self.stft_nperseg, 1 / self.audio_rate)
+        mid = p.rpm.mean(axis=1)
+        lo = np.divide(p.rpm[:, 0], mid, out=np.ones(len(mid)), where=mid > 0)
+        hi = np.divide(p.rpm[:, 1], mid, out=np.ones(len(mid)), where=mid > 0)
+        scales = lo[:, None] + (hi - lo)[:, None] * np.linspace(0, 1, rpm_steps)[None, :]  # C x S
+        peaks = scales[:, :, None] * np.nan_to_num(p.harmonics)[:, None, :]          # C x S x H
+        bin_hz = self.audio_freqs[1]
+        self.harm_idx = np.clip(np.rint(peaks / bin_hz).astype(int), 0, len(self.audio_freqs) - 1)
+        self.harm_valid = np.isfinite(p.harmonics) & (p.harmonics < self.audio_rate / 2)  # C x H
+        self.harm_n = np.maximum(self.harm_valid.sum(axis=1), 1)
+        self.has_acoustic = self.harm_valid.any(axis=1)
+
+    def rf_scores(self, iq):
+        """iq: (B, rf_nfft) complex baseband windows -> (B, C) scores in [0, 1]."""
+        iq = np.asarray(iq)
+        with span('sensors.rf_fft'):
+            spec = np.fft.fftshift(np.fft.fft(iq[:, :self.rf_nfft] * self.rf_window, axis=1), axes=1)
+            p_db = 10 * np.log10(np.abs(spec) ** 2 + 1e-12)
+        with span('sensors.rf_match'):
+            floor = np.median(p_db, axis=1, keepdims=True)
+            above = (p_db > floor + 6).astype(np.float32)
+            occ_in = above @ self.rf_in.T / self.rf_in_n
+            occ_guard = above @ self.rf_guard.T / self.rf_guard_n
+            in_db = (p_db - floor) @ self.rf_in.T / self.rf_in_n
+            scores = _sigmoid((in_db - self.rf_snr_lo) / 2) * occ_in * (1 - occ_guard)
+        return scores * self.has_rf
+
+    def acoustic_scores(self, audio):
+        """audio: (B, N >= stft_nperseg) real windows -> (B, C) scores in [0, 1]."""
+        audio = np.asarray(audio, dtype=np.float32)
+        with span('sensors.stft'):
+            frames = np.lib.stride_tricks.sliding_window_view(audio, self.stft_nperseg, axis=1)[:, ::self.stft_hop]
+            mag = np.abs(np.fft.rfft(frames * self.audio_window, axis=2)).mean(axis=1)
+        with span('sensors.harmonic_match'):
+            log_mag = np.log(mag + 1e-9)
+            # tolerate +/- one bin of quantisation around each expected peak
+            local = np.maximum(log_mag, np.maximum(np.roll(log_mag, 1, axis=1), np.roll(log_mag, -1, axis=1)))
+            floor = np.median(log_mag, axis=1)[:, None, None, None]
+            prominence = local[:, self.harm_idx] - floor                     # B x C x S x H
+            prominence = np.where(self.harm_valid[None, :, None, :], prominence, 0).sum(axis=3)
+            best = prominence.max(axis=2) / self.harm_n                       # B x C
+            scores = _sigmoid((best - 2.0) * 2)
+        return scores * self.has_acoustic
+
+    def vision_scores(self, detections, batch=1):
+        """Map ai.py-style detections ({class, confidence}) onto the engine classes -> (batch, C)."""
+        scores = np.zeros((batch, len(self.classes)))
+        index = {c: i for i, c in enumerate(self.classes)}
+        for det in detections or []:
+            for cls in VISION_CLASS_MAP.get(str(det.get('class', '')).lower(), ()):
+                if cls in index:
+                    scores[:, index[cls]] = np.maximum(scores[:, index[cls]], float(det.get('confidence', 0)))
+        return scores
+
+    def fuse(self, rf=None, acoustic=None, vision=None):
+        """Noisy-OR across whichever sensor score matrices are present -> (B, C)."""
+        miss = None
+        for name, scores in (('rf', rf), ('acoustic', acoustic), ('vision', vision)):
+            if scores is None:
+                continue
+            term = 1 - SENSOR_WEIGHTS[name] * np.clip(scores, 0, 1)
+            miss = term if miss is None else miss * term
+        if miss is None:
+            raise ValueError('no sensor input')
+        return 1 - miss
+
+    def summarize(self, fused):
+        best = fused.argmax(axis=1)
+        return [{'class': self.classes[b], 'confidence': round(float(row[b]), 4),
+                 'scores': {c: round(float(v), 4) for c, v in zip(self.classes, row)}}
+                for b, row in zip(best, fused)]
+
+
+# capture parameters accepted from clients; every distinct set builds (and caches) an engine
+RF_SAMPLE_RATE_HZ = (1e6, 1e9)
+RF_CENTER_MHZ = (30.0, 7000.0)
+AUDIO_RATES = (8000, 11025, 16000, 22050, 32000, 44100, 48000)
+MAX_ENGINES = 8
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+
+
+def get_engine(**params):
+    """Shared engine per parameter set (profiles and masks are precomputed once).
+
+    The MAX_ENGINES most recently used engines are kept.
+    """
+    key = tuple(sorted(params.items()))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = SpectralEngine(**params)
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+        else:
+            _engines.move_to_end(key)
+    return engine
+
+
+class RfIn(BaseModel):
+    iq_b64: str
+    sample_rate_hz: float = Field(160e6, ge=RF_SAMPLE_RATE_HZ[0], le=RF_SAMPLE_RATE_HZ[1])
+    center_mhz: float = Field(2450.0, ge=RF_CENTER_MHZ[0], le=RF_CENTER_MHZ[1])
+
+
+class AudioIn(BaseModel):
+    pcm_b64: str
+    sample_rate_hz: int = 8000
+
+    @field_validator('sample_rate_hz', mode='before')
+    @classmethod
+    def _supported(cls, rate):
+        if isinstance(rate, bool) or rate not in AUDIO_RATES:
+            raise ValueError(f'must be one of {AUDIO_RATES}')
+        return rate
+
+
+class VisionIn(BaseModel):
+    """One ai.py-style detection."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    cls: str = Field(alias='class')
+    confidence: float = Field(ge=0, le=1)
+
+
+class AnalyzeIn(BaseModel):
+    rf: Optional[RfIn] = None
+    audio: Optional[AudioIn] = None
+    vision: List[VisionIn] = []
+    location: Location = Location(lat=28.50, lon=77.60)
+    remote_id: Optional[str] = None
+    create_threat: bool = True
+
+
+def _engine_params(data):
+    """Engine parameters from a validated AnalyzeIn."""
+    params = {}
+    if data.rf is not None:
+        params['rf_sample_rate'] = data.rf.sample_rate_hz
+        params['rf_center_mhz'] = data.rf.center_mhz
+    if data.audio is not None:
+        params['audio_rate'] = data.audio.sample_rate_hz
+    return params
+
+
+def _decode(b64, dtype):
+    return np.frombuffer(base64.b64decode(b64), dtype=dtype)
+
+
+@sensors_bp.route('/profiles', methods=['GET'])
+def profiles():
+    engine = get_engine()
+    return jsonify({
+        'classes': engine.classes,
+        'rf': {'sample_rate_hz': engine.rf_sample_rate, 'center_mhz': engine.rf_center_mhz, 'nfft': engine.rf_nfft},
+        'audio': {'sample_rate_hz': engine.audio_rate, 'nperseg': engine.stft_nperseg, 'hop': engine.stft_hop},
+        'weights': SENSOR_WEIGHTS,
+    })
+
+
+@sensors_bp.route('/analyze', methods=['POST'])
+def analyze():
+    """Score one observation and optionally raise a threat.
+
+    Expected JSON:
+      rf:     { iq_b64: complex64 LE samples, sample_rate_hz?, center_mhz? }
+      audio:  { pcm_b64: float32 LE samples, sample_rate_hz? }
+      vision: [ { class, confidence }, ... ]
+      location?, remote_id?, create_threat? (default true)
+    Long captures are split into windows and the per-window scores averaged.
+    """
+    from .ai import runtime_config
+    from .threats import WHITELIST, add_threat
+
+    try:
+        data = AnalyzeIn.model_validate(request.get_json(silent=True) or {})
+    except ValidationError as e:
+        return jsonify({'error': 'invalid_input', 'detail': e.errors(include_url=False, include_input=False, include_context=False)}), 400
+    engine = get_engine(**_engine_params(data))
+    try:
+        rf = acoustic = vision = None
+        if data.rf is not None:
+            iq = _decode(data.rf.iq_b64, '<c8')
+            n = len(iq) // engine.rf_nfft
+            if n == 0:
+                return jsonify({'error': 'rf_too_short', 'detail': f'need >= {engine.rf_nfft} samples'}), 400
+            rf = engine.rf_scores(iq[:n * engine.rf_nfft].reshape(n, -1)).mean(axis=0, keepdims=True)
+        if data.audio is not None:
+            pcm = _decode(data.audio.pcm_b64, '<f4')
+            if len(pcm) < engine.stft_nperseg:
+                return jsonify({'error': 'audio_too_short', 'detail': f'need >= {engine.stft_nperseg} samples'}), 400
+            acoustic = engine.acoustic_scores(pcm[None, :])
+        if data.vision:
+            vision = engine.vision_scores([v.model_dump(by_alias=True) for v in data.vision])
+        fused = engine.fuse(rf, acoustic, vision)
+    except ValueError as e:  # bad base64 / sample alignment, no sensor input
+        return jsonify({'error': 'invalid_input', 'detail': str(e)}), 400
+
+    result = engine.summarize(fused)[0]
+    threat = None
+    if data.create_threat and result['class'] != 'bird' \
+            and result['confidence'] >= runtime_config['fusion_confidence_threshold']:
+        remote_id = data.remote_id or f'RID-{str(uuid.uuid4())[:6]}'
+        threat = add_threat({
+            'id': str(uuid.uuid4()),
+            'class': result['class'],
+            'confidence': result['confidence'],
+            'location': {'lat': data.location.lat, 'lon': data.location.lon},
+            'status': 'detected',
+            'created_at': datetime.utcnow().isoformat()+'Z',
+            'remote_id': remote_id,
+            'authorized': remote_id in WHITELIST,
+            'source': 'sensor_fusion',
+        })
+        RECORDER.record('threats', [threat])
+    return jsonify({'fused': result, 'threat': threat})
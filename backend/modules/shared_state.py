@@ -0,0 +1,486 @@
+"""Shared state for N worker processes on one node.
+
+A small state server (a ``multiprocessing`` manager, local socket + authkey) owns an
+ordered log of writes and the materialized state. Each worker keeps its module globals
+(THREATS, INCIDENTS, COMMAND_LOG, DRONE_STATE, WHITELIST, ZONES, detection_history, LEDGER) as
+a replica:
+
+ - writes are applied locally as before and published to the server, which assigns
+   them a sequence number (persist*/LISTENERS in store.py, plus whitelist/detections)
+ - before each request the worker compares the log head, published by the server in
+   an 8-byte shared-memory segment, with the last sequence it applied; only when it is
+   behind does it fetch the missing ops (or a full snapshot if it fell off the log)
+ - ledger entries are built on the server under its lock, so the hash chain is extended
+   by one writer no matter how many workers append
+ - track position fixes (tracks.py) are relayed as ops only, not kept in snapshots;
+   a worker that falls back to a snapshot misses the fixes in between
+ - commands: idempotency keys live in the server's key table, and a worker applies a
+   command batch only while holding the server's command lease (after catching up), so
+   commands accepted by any worker are applied one at a time against the latest drone
+   state. A lease left by a crashed worker expires after COMMAND_LEASE_TTL_S
+
+Enable with KAVACH_STATE_SERVER=/path/to.sock (or a loopback host:port) and KAVACH_STATE_AUTHKEY, after
+starting the server:  KAVACH_STATE_AUTHKEY=<secret> python -m modules.shared_state --listen /tmp/kavach-state.sock
+Manager connections carry pickles, so the server and the workers refuse to start without an
+authkey, TCP addresses must be loopback, and the unix socket is created mode 0600.
+"""
+
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from multiprocessing import resource_tracker, shared_memory, util
+from multiprocessing.managers import BaseManager
+import argparse, ipaddress, os, struct, threading, time, uuid
+
+from .whitelist import WhitelistRules, apply_change
+
+MAX_DETECTIONS = 1000
+MAX_COMMAND_KEYS = 4096
+COMMAND_LEASE_WAIT_S = 10.0
+COMMAND_LEASE_TTL_S = 30.0
+
+
+def _empty_state():
+    return {'threats': {}, 'incidents': {}, 'commands': [], 'drone_state': None,
+            'whitelist': WhitelistRules(), 'zones': [], 'detections': [], 'ledger': []}
+
+
+class StateServer:
+    """Authoritative op log + materialized state; lives in the state server process."""
+
+    def __init__(self, log_size=20000):
+        self._lock = threading.Lock()
+        self._log = deque(maxlen=log_size)   # (seq, origin, kind, payload)
+        self._seq = 0
+        self._state = _empty_state()
+        self._head = shared_memory.SharedMemory(create=True, size=8)
+        struct.pack_into('<Q', self._head.buf, 0, 0)
+        self._command_keys = OrderedDict()       # idempotency key -> value from claim_key (bounded)
+        self._lease = threading.Condition()      # command lease; not self._lock, so waiting never blocks writes
+        self._lease_owner = None                 # (origin, monotonic expiry)
+
+    def head_name(self):
+        return self._head.name
+
+    def head(self):
+        return self._seq
+
+    def _append(self, origin, kind, payload):
+        self._seq += 1
+        self._log.append((self._seq, origin, kind, payload))
+        apply_op(self._state, kind, payload)
+
+    def _publish_head(self):
+        struct.pack_into('<Q', self._head.buf, 0, self._seq)
+
+    def publish(self, origin, ops):
+        with self._lock:
+            for kind, payload in ops:
+                self._append(origin, kind, payload)
+            self._publish_head()
+            return self._seq
+
+    def ledger_append(self, origin, events):
+        """Chain (event_type, payload) pairs onto the shared ledger; returns the new entries."""
+        from .ledger import _build_entry
+        with self._lock:
+            ledger = self._state['ledger']
+            prev = ledger[-1]['chain_hash'] if ledger else '0' * 64
+            entries = []
+            for event_type, payload in events:
+                entry = _build_entry(event_type, payload, prev, len(ledger) + len(entries) + 1)
+                entries.append(entry)
+                prev = entry['chain_hash']
+            self._append(origin, 'ledger', entries)
+            self._publish_head()
+            return entries
+
+    def since(self, seq):
+        """('ops', [(seq, origin, kind, payload)...], head) or ('snapshot', state, head)."""
+        with self._lock:
+            if seq == self._seq:
+                return 'ops', [], self._seq
+            if self._log and seq >= self._log[0][0] - 1:
+                return 'ops', [op for op in self._log if op[0] > seq], self._seq
+            # copy the containers: the reply is pickled after the lock is released
+            state = {k: (v.copy() if hasattr(v, 'copy') else v) for k, v in self._state.items()}
+            return 'snapshot', state, self._seq
+
+    def claim_key(self, key, value):
+        """Hold an idempotency key for ``value``; returns the value already holding it, or None."""
+        with self._lock:
+            held = self._command_keys.get(key)
+            if held is None:
+                self._command_keys[key] = value
+                while len(self._command_keys) > MAX_COMMAND_KEYS:
+                    self._command_keys.popitem(last=False)
+            return held
+
+    def release_key(self, key, value):
+        with self._lock:
+            if self._command_keys.get(key) == value:
+                del self._command_keys[key]
+
+    def acquire_commands(self, origin, timeout=COMMAND_LEASE_WAIT_S, ttl=COMMAND_LEASE_TTL_S):
+        """Wait up to ``timeout`` for the command lease; returns whether ``origin`` now holds it."""
+        deadline = time.monotonic() + timeout
+        with self._lease:
+            while True:
+                now = time.monotonic()
+                owner = self._lease_owner
+                if owner is None or owner[1] <= now:
+                    self._lease_owner = (origin, now + ttl)
+                    return True
+                if now >= deadline:
+                    return False
+                self._lease.wait(min(deadline, owner[1]) - now)
+
+    def release_commands(self, origin):
+        with self._lease:
+            if self._lease_owner is not None and self._lease_owner[0] == origin:
+                self._lease_owner = None
+                self._lease.notify()
+
+    def seed(self, origin, state):
+        """Install a worker's startup state if nothing has been written yet; returns whether it was used."""
+        with self._lock:
+            if self._seq:
+                return False
+            self._state = state
+            self._seq = 1
+            self._log.clear()
+            self._publish_head()
+            return True
+
+    def close(self):
+        self._head.close()
+        self._head.unlink()
+
+
+def apply_op(state, kind, payload):
+    """Apply one op to a plain state dict (server side and snapshots)."""
+    if kind == 'threats' or kind == 'incidents':
+        state[kind].update((d['id'], d) for d in payload)
+    elif kind == 'commands':
+        state['commands'].extend(payload)
+    elif kind == 'drone_state':
+        if not _stale_drone_state(state['drone_state'], payload[-1]):
+            state['drone_state'] = payload[-1]
+    elif kind.startswith('whitelist_'):
+        apply_change(state['whitelist'], kind[len('whitelist_'):], payload)
+    elif kind == 'zones':
+        state['zones'] = payload
+    elif kind == 'detections':
+        state['detections'].extend(payload)
+        del state['detections'][:-MAX_DETECTIONS]
+    elif kind == 'detections_clear':
+        state['detections'].clear()
+    elif kind == 'ledger':
+        state['ledger'].extend(payload)
+    elif kind == 'ledger_patch':
+        for entry_id, fields in payload:
+            state['ledger'][entry_id - 1].update(fields)
+
+
+def _stale_drone_state(current, doc):
+    """A drone state written before the latest command was applied: a position update from a
+    worker that had not caught up yet, which must not undo the command."""
+    return bool(current) and (doc.get('last_command_at') or '') < (current.get('last_command_at') or '')
+
+
+_SERVER = None
+
+
+def _get_server():
+    return _SERVER
+
+
+class StateManager(BaseManager):
+    pass
+
+
+StateManager.register('state', callable=_get_server)
+
+
+def parse_address(text):
+    """A unix socket path, or host:port on a loopback interface; raises ValueError.
+
+    Manager connections exchange pickles, so anyone who can connect with the authkey can
+    run code in the server: it is never exposed beyond this host.
+    """
+    if ':' in text and not text.startswith('/'):
+        host, port = text.rsplit(':', 1)
+        host = host.strip('[]')
+        try:
+            loopback = host == 'localhost' or ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f'state server TCP address must be on loopback, got {host!r}; use a unix socket path')
+        return host, int(port)
+    return text
+
+
+def _check_authkey(authkey):
+    if not authkey:
+        raise ValueError('KAVACH_STATE_AUTHKEY must be set to a secret shared by the state server and its workers')
+    return authkey.encode()
+
+
+def start_server(address, authkey, log_size=20000):
+    """Start the state server in a child process; returns the running manager.
+
+    A unix socket is made accessible to its owner only.
+    """
+    address = parse_address(address)
+    manager = StateManager(address=address, authkey=_check_authkey(authkey))
+    manager.start(initializer=_init_server, initargs=(log_size,))
+    if isinstance(address, str):
+        os.chmod(address, 0o600)
+    return manager
+
+
+def _init_server(log_size):
+    global _SERVER
+    _SERVER = StateServer(log_size)
+    util.Finalize(_SERVER, _SERVER.close, exitpriority=10)  # unlink the head segment on shutdown
+
+
+class SharedState:
+    """Worker-side client: publishes local writes and keeps the local replicas in sync."""
+
+    def __init__(self, address, authkey):
+        manager = StateManager(address=parse_address(address), authkey=_check_authkey(authkey))
+        manager.connect()
+        self._server = manager.state()
+        self.origin = f'{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.seq = 0
+        self._sync_lock = threading.Lock()
+        self._head = shared_memory.SharedMemory(name=self._server.head_name())
+        # attach only: the server owns (and unlinks) the segment
+        resource_tracker.unregister(self._head._name, 'shared_memory')
+        self.stats = {'published': 0, 'synced_ops': 0, 'snapshots': 0, 'sync_rpcs': 0}
+
+    def head(self):
+        return struct.unpack_from('<Q', self._head.buf, 0)[0]
+
+    def publish(self, kind, payload):
+        self._server.publish(self.origin, [(kind, payload)])
+        self.stats['published'] += 1
+
+    def ledger_append(self, events):
+        entries = self._server.ledger_append(self.origin, list(events))
+        self.sync()
+        return entries
+
+    def sync(self):
+        if self.head() == self.seq:
+            return
+        with self._sync_lock:
+            if self.head() == self.seq:
+                return
+            mode, data, seq = self._server.since(self.seq)
+            self.stats['sync_rpcs'] += 1
+            if mode == 'snapshot':
+                _load_snapshot(data)
+                self.stats['snapshots'] += 1
+            else:
+                for _, origin, kind, payload in data:
+                    _apply_local(kind, payload, own=origin == self.origin)
+                self.stats['synced_ops'] += len(data)
+            self.seq = seq
+
+    def claim_key(self, key, value):
+        return self._server.claim_key(key, value)
+
+    def release_key(self, key, value):
+        self._server.release_key(key, value)
+
+    @contextmanager
+    def command_lease(self):
+        """Hold the command lease, caught up with every command applied before it."""
+        if not self._server.acquire_commands(self.origin):
+            raise TimeoutError(f'command lease busy for {COMMAND_LEASE_WAIT_S:.0f} s')
+        try:
+            self.sync()
+            yield
+        finally:
+            self._server.release_commands(self.origin)
+
+    def seed_or_load(self, state):
+        if self._server.seed(self.origin, state):
+            self.seq = 1
+        else:
+            self.sync()
+
+    def status(self):
+        return {'origin': self.origin, 'seq': self.seq, 'head': self.head(), **self.stats}
+
+
+def _local_collections():
+    from .ai import detection_history
+    from .airspace import WHITELIST
+    from .commands import COMMAND_LOG, DRONE_STATE
+    from .incidents import INCIDENTS
+    from .ledger import LEDGER
+    from .threats import THREATS
+    return THREATS, INCIDENTS, COMMAND_LOG, DRONE_STATE, WHITELIST, detection_history, LEDGER
+
+
+def local_state():
+    from .zones import ZONES
+    threats, incidents, commands, drone, whitelist, detections, ledger = _local_collections()
+    return {'threats': dict(threats), 'incidents': dict(incidents), 'commands': list(commands),
+            'drone_state': dict(drone), 'whitelist': whitelist.copy(), 'zones': ZONES.to_list(),
+            'detections': list(detections), 'ledger': list(ledger)}
+
+
+def _load_snapshot(state):
+    from .aggregates import AGGREGATES
+    from .threats import _threats_lock, reindex
+    from .zones import ZONES
+    threats, incidents, commands, drone, whitelist, detections, ledger = _local_collections()
+    with _threats_lock:
+        threats.clear()
+        threats.update(state['threats'])
+    reindex()
+    incidents.clear()
+    incidents.update(state['incidents'])
+    commands[:] = state['commands']
+    if state['drone_state']:
+        drone.update(state['drone_state'])
+    whitelist.load(state['whitelist'])
+    ZONES.replace(state['zones'])
+    detections[:] = state['detections']
+    ledger[:] = state['ledger']
+    AGGREGATES.rebuild(threats.values(), incidents.values())
+
+
+def _apply_local(kind, payload, own):
+    """Apply a log op to this worker's globals. Own upserts are re-applied so every replica
+    ends on the log's last write; own appends were already applied locally and are skipped."""
+    from .aggregates import AGGREGATES, exposure
+    from .threats import _index, _start_tracks, _threats_lock, _track_fixes
+    threats, incidents, commands, drone, whitelist, detections, ledger = _local_collections()
+    if kind == 'threats':
+        with _threats_lock:
+            new = [t for t in payload if t['id'] not in threats]
+            # reclassified by another worker's whitelist or zone change
+            old = [threats[t['id']] for t in payload if t['id'] in threats]
+            flipped = [t for t in payload if t['id'] in threats and threats[t['id']]['authorized'] != t['authorized']]
+            threats.update((t['id'], t) for t in payload)
+            _index(new)
+        if new:
+            AGGREGATES.record_threats((t['confidence'], t['authorized']) for t in new)
+            AGGREGATES.add_exposure(exposure(t) for t in new)
+            _start_tracks(_track_fixes(new))
+        if flipped:
+            AGGREGATES.reclassify(flipped)
+        if old:
+            AGGREGATES.add_exposure((exposure(t) for t in old), -1)
+            AGGREGATES.add_exposure(exposure(threats[t['id']]) for t in old)
+    elif kind == 'incidents':
+        for inc in payload:
+            before = incidents.get(inc['id'], {}).get('status')
+            incidents[inc['id']] = inc
+            if before != 'open' and inc.get('status') == 'open':
+                AGGREGATES.incident_opened()
+            elif before == 'open' and inc.get('status') != 'open':
+                AGGREGATES.incident_closed()
+    elif kind == 'drone_state':
+        if not _stale_drone_state(drone, payload[-1]):
+            drone.update(payload[-1])
+    elif kind == 'ledger':
+        ledger.extend(payload)
+    elif kind == 'ledger_patch':
+        for entry_id, fields in payload:
+            ledger[entry_id - 1].update(fields)
+    elif own:
+        return
+    elif kind == 'commands':
+        commands.extend(payload)
+    elif kind.startswith('whitelist_'):
+        apply_change(whitelist, kind[len('whitelist_'):], payload)
+    elif kind == 'zones':
+        from .zones import ZONES
+        ZONES.replace(payload)
+    elif kind == 'positions':
+        from .tracks import TRACKS
+        ids, lat, lon, ts = zip(*payload)
+        TRACKS.update_many(ids, lat, lon, ts)
+    elif kind == 'detections':
+        detections.extend(payload)
+        del detections[:-MAX_DETECTIONS]
+    elif kind == 'detections_clear':
+        detections.clear()
+
+
+SHARED = None
+
+
+def publish(kind, payload):
+    if SHARED is not None:
+        SHARED.publish(kind, payload)
+
+
+def sync():
+    if SHARED is not None:
+        SHARED.sync()
+
+
+def command_lease():
+    """CommandPipeline guard: the state server's command lease, or nothing with a single process."""
+    return SHARED.command_lease() if SHARED is not None else nullcontext()
+
+
+class CommandKeys:
+    """CommandPipeline key table: idempotency keys claimed on the state server, when there is one."""
+
+    def claim(self, key, value):
+        return SHARED.claim_key(key, value) if SHARED is not None else None
+
+    def release(self, key, value):
+        if SHARED is not None:
+            SHARED.release_key(key, value)
+
+
+def _on_persist(table, docs):
+    SHARED.publish(table, list(docs))
+
+
+def init_from_env(app=None):
+    """Connect to KAVACH_STATE_SERVER (if set), load or seed shared state and sync before each request."""
+    global SHARED
+    address = os.environ.get('KAVACH_STATE_SERVER')
+    if not address or SHARED is not None:
+        return SHARED
+    from . import store
+    shared = SharedState(address, os.environ.get('KAVACH_STATE_AUTHKEY'))
+    shared.seed_or_load(local_state())
+    SHARED = shared
+    store.LISTENERS.append(_on_persist)
+    if app is not None:
+        app.before_request(sync)
+    return shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KAVACH shared state server')
+    parser.add_argument('--listen', default=os.environ.get('KAVACH_STATE_SERVER', '/tmp/kavach-state.sock'))
+    parser.add_argument('--log-size', type=int, default=20000)
+    args = parser.parse_args()
+    try:
+        manager = start_server(args.listen, os.environ.get('KAVACH_STATE_AUTHKEY'), args.log_size)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f'state server listening on {args.listen}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
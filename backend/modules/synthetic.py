@@ -0,0 +1,260 @@
+"""Synthetic multi-sensor dataset generator (implements data/synthetic/generator_config.yaml).
+
+Each sample carries three feature blocks plus labels:
+ - rf:        power spectrum (dB above noise floor) on a fixed MHz grid spanning all rf_profiles
+ - acoustic:  magnitude spectrum on a fixed Hz grid; harmonic_peaks scaled by a sampled blade RPM
+ - vision:    [size_px, aspect, x_pct, y_pct]; all zero when the class has no vision target
+
+Noise, RF dropout, acoustic environment variants and FGSM-style sign perturbations come
+from the ``synthetic`` section; ``splits`` assigns train/val/test per sample.
+
+Output is written shard by shard as columnar ``.npz`` files (one array per column) with a
+``manifest.json``; shards are generated in parallel processes from ``SeedSequence.spawn``
+children, so a given seed yields identical data regardless of worker count.
+
+    python -m modules.synthetic --out ../data/synthetic/out --samples 2000000 --workers 8
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import argparse, csv, json, os
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(HERE, '..', '..', 'data', 'synthetic', 'generator_config.yaml')
+LABELS_HEADER = os.path.join(HERE, '..', '..', 'data', 'labels', 'threats.csv')
+
+RF_BINS = 64
+ACOUSTIC_BINS = 128
+VISION_FEATURES = ('size_px', 'aspect', 'x_pct', 'y_pct')
+SPLITS = ('train', 'val', 'test')
+BASE_LAT, BASE_LON = 28.50, 77.60
+
+
+def load_config(path=DEFAULT_CONFIG):
+    import yaml  # only needed when reading the config
+    with open(path) as f:
+        return yaml.safe_load(f)
+
+
+class SensorProfiles:
+    """Per-class lookup arrays derived from the config, indexed by class id."""
+
+    def __init__(self, config):
+        rf = {p['class']: p for p in config.get('rf_profiles', [])}
+        ac = {p['class']: p for p in config.get('acoustic_signatures', [])}
+        vi = {p['class']: p for p in config.get('vision_targets', [])}
+        self.classes = list(dict.fromkeys([*rf, *ac, *vi]))
+        n = len(self.classes)
+
+        self.rf_center = np.full(n, np.nan)
+        self.rf_bw = np.ones(n)
+        self.rf_snr = np.zeros((n, 2))
+        for i, c in enumerate(self.classes):
+            if c in rf:
+                self.rf_center[i] = rf[c]['center_freq_mhz']
+                self.rf_bw[i] = rf[c]['bandwidth_mhz']
+                self.rf_snr[i] = rf[c]['snr_db_range']
+        lo = min((p['center_freq_mhz'] - p['bandwidth_mhz'] for p in rf.values()), default=2400)
+        hi = max((p['center_freq_mhz'] + p['bandwidth_mhz'] for p in rf.values()), default=2500)
+        self.rf_freqs = np.linspace(lo, hi, RF_BINS)
+        self.rf_is_sweep = np.array(['sweep' in c for c in self.classes])
+
+        max_h = max((len(p.get('harmonic_peaks', [])) for p in ac.values()), default=0) or 1
+        self.harmonics = np.full((n, max_h), np.nan)
+        self.rpm = np.zeros((n, 2))
+        for i, c in enumerate(self.classes):
+            peaks = ac.get(c, {}).get('harmonic_peaks', [])
+            self.harmonics[i, :len(peaks)] = peaks
+            self.rpm[i] = ac.get(c, {}).get('blade_rpm', [0, 0])
+        top = np.nanmax(self.harmonics) if np.isfinite(self.harmonics).any() else 1000
+        self.acoustic_freqs = np.linspace(0, top * 1.5, ACOUSTIC_BINS)
+
+        self.vision_size = np.zeros((n, 2))
+        for i, c in enumerate(self.classes):
+            if c in vi:
+                self.vision_size[i] = vi[c]['size_px']
+
+
+def generate_batch(profiles, n, rng, synthetic_cfg, split_probs, adversarial_fraction=0.1, first=0):
+    """Return a dict of column arrays for ``n`` samples drawn with ``rng``.
+
+    Labels are exact per-class counts (sample ``first + i`` of the dataset gets class
+    ``(first + i) % classes``) shuffled with ``rng``, so the classes stay balanced across shards.
+    """
+    noise = synthetic_cfg.get('noise', {})
+    sigma = float(noise.get('gaussian_sigma', 0.08))
+    n_cls = len(profiles.classes)
+    label = ((first + np.arange(n)) % n_cls).astype(np.int16)
+    rng.shuffle(label)
+
+    # RF: gaussian band at the class centre (sweepers wander across their bandwidth)
+    center = profiles.rf_center[label]
+    bw = profiles.rf_bw[label]
+    sweep = profiles.rf_is_sweep[label]
+    center = center + np.where(sweep, rng.uniform(-0.5, 0.5, n) * bw, 0.0)
+    snr_lo, snr_hi = profiles.rf_snr[label, 0], profiles.rf_snr[label, 1]
+    snr = snr_lo + (snr_hi - snr_lo) * rng.random(n)
+    width = (bw / 2.355)[:, None]
+    band = np.exp(-0.5 * ((profiles.rf_freqs[None, :] - center[:, None]) / width) ** 2)
+    rf = np.nan_to_num(snr[:, None] * band, nan=0.0)
+    rf += rng.normal(0, sigma * 10, rf.shape)  # noise floor jitter in dB
+    dropout = rng.random(n) < float(noise.get('rf_dropout_prob', 0.0))
+    rf[dropout] = 0.0
+
+    # Acoustic: harmonics scaled by sampled RPM relative to the profile midpoint
+    rpm_lo, rpm_hi = profiles.rpm[label, 0], profiles.rpm[label, 1]
+    rpm = rpm_lo + (rpm_hi - rpm_lo) * rng.random(n)
+    mid = (rpm_lo + rpm_hi) / 2
+    scale = np.divide(rpm, mid, out=np.ones(n), where=mid > 0)
+    peaks = (profiles.harmonics[label] * scale[:, None]).astype(np.float32)  # n x H, NaN where absent
+    freqs = profiles.acoustic_freqs.astype(np.float32)
+    bin_w = freqs[1] - freqs[0]
+    acoustic = np.zeros((n, len(freqs)), dtype=np.float32)
+    for h in range(peaks.shape[1]):  # H is tiny; looping keeps temporaries at n x bins
+        present = np.isfinite(peaks[:, h])
+        acoustic[present] += np.exp(-0.5 * ((freqs[None, :] - peaks[present, h, None]) / bin_w) ** 2)
+    variants = int(noise.get('acoustic_env_variants', 1)) or 1
+    env = rng.integers(0, variants, n)
+    env_level = (1 + env) / variants * sigma  # louder backgrounds for higher variant ids
+    acoustic += np.abs(rng.normal(0, 1, acoustic.shape)) * env_level[:, None]
+
+    # Vision: target size from profile, random aspect / position; invisible classes stay zero
+    s_lo, s_hi = profiles.vision_size[label, 0], profiles.vision_size[label, 1]
+    visible = s_hi > 0
+    vision = np.zeros((n, len(VISION_FEATURES)))
+    vision[:, 0] = s_lo + (s_hi - s_lo) * rng.random(n)
+    vision[:, 1] = rng.uniform(0.6, 1.6, n)
+    vision[:, 2] = rng.uniform(0, 100, n)
+    vision[:, 3] = rng.uniform(0, 100, n)
+    vision[~visible] = 0.0
+
+    # FGSM-style perturbation: eps * sign of a random direction, on a fraction of samples
+    adv_cfg = synthetic_cfg.get('adversarial', {})
+    adversarial = np.zeros(n, dtype=bool)
+    if adv_cfg.get('enabled'):
+        eps = float(adv_cfg.get('fgsm_epsilon', 0.02))
+        adversarial = rng.random(n) < adversarial_fraction
+        k = int(adversarial.sum())
+        if k:
+            rf_scale = np.abs(rf[adversarial]).max(axis=1, keepdims=True) + 1e-9
+            rf[adversarial] += eps * rf_scale * np.sign(rng.standard_normal((k, rf.shape[1])))
+            ac_scale = acoustic[adversarial].max(axis=1, keepdims=True) + 1e-9
+            acoustic[adversarial] += eps * ac_scale * np.sign(rng.standard_normal((k, acoustic.shape[1])))
+
+    split = rng.choice(len(SPLITS), n, p=split_probs).astype(np.int8)
+    return {
+        'label': label,
+        'rf': rf.astype(np.float32),
+        'acoustic': acoustic.astype(np.float32),
+        'vision': vision.astype(np.float32),
+        'rpm': rpm.astype(np.float32),
+        'env_variant': env.astype(np.int8),
+        'rf_dropout': dropout,
+        'adversarial': adversarial,
+        'split': split,
+    }
+
+
+def _split_probs(config):
+    splits = config.get('splits', {})
+    p = np.array([float(splits.get(s, 0)) for s in SPLITS])
+    return p / p.sum() if p.sum() else np.array([1.0, 0.0, 0.0])
+
+
+def _write_labels_csv(path, batch, classes, shard, rng):
+    with open(LABELS_HEADER) as f:
+        header = f.readline().strip().split(',')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        start = datetime(2025, 1, 1) + timedelta(days=shard)
+        lat = BASE_LAT + rng.uniform(-0.01, 0.01, len(batch['label']))
+        lon = BASE_LON + rng.uniform(-0.01, 0.01, len(batch['label']))
+        for i, cls_id in enumerate(batch['label']):
+            cls = classes[cls_id]
+            writer.writerow([
+                f'syn-{shard:05d}-{i:07d}', (start + timedelta(seconds=i)).isoformat() + 'Z', 'synthetic',
+                f'{lat[i]:.6f}', f'{lon[i]:.6f}', 'rf+acoustic+vision', cls,
+                'benign' if cls == 'bird' else 'suspect', SPLITS[batch['split'][i]], '1.0',
+            ])
+
+
+def _generate_shard(args):
+    config, seed_seq, shard, first, n, out_dir, adversarial_fraction, labels_csv = args
+    profiles = SensorProfiles(config)
+    rng = np.random.default_rng(seed_seq)
+    batch = generate_batch(profiles, n, rng, config.get('synthetic', {}), _split_probs(config), adversarial_fraction,
+                           first)
+    name = f'shard-{shard:05d}.npz'
+    np.savez(os.path.join(out_dir, name), **batch)
+    if labels_csv:
+        _write_labels_csv(os.path.join(out_dir, f'labels-{shard:05d}.csv'), batch, profiles.classes, shard, rng)
+    counts = np.bincount(batch['label'], minlength=len(profiles.classes))
+    return {'file': name, 'samples': n, 'class_counts': counts.tolist()}
+
+
+def generate_dataset(out_dir, config=None, samples=None, shard_size=65536, seed=0, workers=None,
+                     adversarial_fraction=0.1, labels_csv=False):
+    """Generate ``samples`` (default samples_per_class * classes) into ``out_dir``; returns the manifest."""
+    config = config or load_config()
+    profiles = SensorProfiles(config)
+    if samples is None:
+        samples = int(config.get('synthetic', {}).get('samples_per_class', 500)) * len(profiles.classes)
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = [shard_size] * (samples // shard_size) + ([samples % shard_size] if samples % shard_size else [])
+    children = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(config, children[i], i, i * shard_size, n, out_dir, adversarial_fraction, labels_csv)
+            for i, n in enumerate(sizes)]
+    if workers == 1 or len(jobs) == 1:
+        shards = [_generate_shard(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_generate_shard, jobs))
+    manifest = {
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'config_version': config.get('version'),
+        'seed': seed,
+        'samples': samples,
+        'classes': profiles.classes,
+        'splits': list(SPLITS),
+        'columns': {
+            'rf': {'shape': [RF_BINS], 'freqs_mhz': profiles.rf_freqs.round(3).tolist()},
+            'acoustic': {'shape': [ACOUSTIC_BINS], 'freqs_hz': profiles.acoustic_freqs.round(3).tolist()},
+            'vision': {'features': list(VISION_FEATURES)},
+        },
+        'shards': shards,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def iter_shards(out_dir):
+    """Yield each shard's column dict in order, one shard in memory at a time."""
+    with open(os.path.join(out_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for shard in manifest['shards']:
+        with np.load(os.path.join(out_dir, shard['file'])) as data:
+            yield {k: data[k] for k in data.files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic RF/acoustic/vision samples')
+    parser.add_argument('--config', default=DEFAULT_CONFIG)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--samples', type=int, help='total samples (default: samples_per_class x classes)')
+    parser.add_argument('--shard-size', type=int, default=65536)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--adversarial-fraction', type=float, default=0.1)
+    parser.add_argument('--labels-csv', action='store_true', help='also write rows in data/labels/threats.csv layout')
+    args = parser.parse_args()
+    manifest = generate_dataset(args.out, load_config(args.config), args.samples, args.shard_size, args.seed,
+                                args.workers, args.adversarial_fraction, args.labels_csv)
+    print(f"{manifest['samples']} samples in {len(manifest['shards'])} shards -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
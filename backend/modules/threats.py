@@ -1,13 +1,306 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import uuid
-import random
+from typing import List, Optional
+from bisect import bisect_left, bisect_right
+import math, threading, time, uuid
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
 from .airspace import WHITELIST
+from .aggregates import AGGREGATES, _epoch, exposure
+from .store import persist_many
+from .jsonio import loads
+from .replay import RECORDER, RNG, new_id
+from .zones import ZONES
+from .tracks import TRACK_TTL_S, TRACKS
+from . import shared_state
 
 threats_bp = Blueprint('threats', __name__)
 
 # In-memory store for rapid MVP iteration
 THREATS = {}
+_threats_lock = threading.Lock()
+
+MAX_BULK_ITEMS = 10000
+MAX_BULK_LINE_BYTES = 64 * 1024  # one NDJSON item; the whole body is capped by MAX_CONTENT_LENGTH (app.py)
+
+# remote_id -> ids of threats carrying it, so a whitelist change only revisits those threats
+_by_remote_id = {}
+_sorted_remote_ids = None  # sorted(_by_remote_id), rebuilt on demand for prefix / range changes
+
+def _index(threats):
+    """Add threats to the remote-ID index (caller holds _threats_lock); only string IDs can match a rule."""
+    global _sorted_remote_ids
+    for t in threats:
+        rid = t.get('remote_id')
+        if not isinstance(rid, str):
+            continue
+        ids = _by_remote_id.get(rid)
+        if ids is None:
+            _by_remote_id[rid] = [t['id']]
+            _sorted_remote_ids = None
+        elif t['id'] not in ids:
+            ids.append(t['id'])
+
+def reindex():
+    """Rebuild the remote-ID index after THREATS was loaded wholesale (DB hydration, state snapshots)."""
+    global _sorted_remote_ids
+    with _threats_lock:
+        _by_remote_id.clear()
+        _sorted_remote_ids = None
+        _index(THREATS.values())
+
+def add_threat(threat):
+    """Classify a threat against the airspace zones, insert it and update the rolling aggregates."""
+    return add_threats((threat,))[0]
+
+def add_threats(threats):
+    """Insert many threats with one vectorized zone pass, one lock acquisition and one aggregates update.
+
+    A doc whose id is already in THREATS replaces it without being counted again: only its
+    change of ``authorized`` / zone exposure reaches the aggregates.
+    """
+    ZONES.annotate(threats)
+    # anything that can reject a doc runs before THREATS changes, so a bad doc cannot
+    # leave the store and the aggregates out of step
+    confidence = {t['id']: float(t.get('confidence') or 0) for t in threats}
+    fixes = _track_fixes(threats)
+    with _threats_lock:
+        new = [t for t in threats if t['id'] not in THREATS]
+        old = [THREATS[t['id']] for t in threats if t['id'] in THREATS]
+        flipped = [t for t in threats if t['id'] in THREATS and THREATS[t['id']]['authorized'] != t['authorized']]
+        THREATS.update((t['id'], t) for t in threats)
+        _index(threats)
+    persist_many('threats', threats)
+    AGGREGATES.record_threats((confidence[t['id']], t['authorized']) for t in new)
+    AGGREGATES.add_exposure(exposure(t) for t in new)
+    if flipped:
+        AGGREGATES.reclassify(flipped)
+    if old:
+        AGGREGATES.add_exposure((exposure(t) for t in old), -1)
+        AGGREGATES.add_exposure(exposure(THREATS[t['id']]) for t in old)
+    new_ids = {t['id'] for t in new}
+    _start_tracks([f for f in fixes if f[0] in new_ids])
+    return threats
+
+def _start_tracks(fixes):
+    if fixes:
+        TRACKS.update_many(*zip(*fixes))
+
+def _track_fixes(threats):
+    """First track fix (id, lat, lon, epoch) per threat: its location as of ``last_seen`` / ``created_at``.
+
+    Threats whose location is not a pair of finite numbers get no track.
+    """
+    epochs, fixes = {}, []
+    for t in threats:
+        loc = t.get('location') or {}
+        try:
+            lat, lon = float(loc.get('lat', 0)), float(loc.get('lon', 0))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            continue
+        iso = t.get('last_seen') or t['created_at']
+        if iso not in epochs:
+            epochs[iso] = _epoch(iso) or time.time()
+        fixes.append((t['id'], lat, lon, epochs[iso]))
+    return fixes
+
+def update_positions(fixes):
+    """Apply (threat id, lat, lon, epoch) position fixes: track history, latest ``location``, zone.
+
+    Fixes for unknown threats, or older than a track's last fix, are skipped. Returns
+    (threats moved, fixes kept).
+    """
+    # timestamps are formatted before any track is written: a fix whose time cannot be
+    # represented is skipped instead of failing the batch halfway through
+    seen = {}
+    for f in fixes:
+        if f[0] in THREATS and f[3] not in seen:
+            try:
+                seen[f[3]] = datetime.utcfromtimestamp(f[3]).isoformat()+'Z'
+            except (OverflowError, OSError, ValueError):
+                seen[f[3]] = None
+    fixes = [f for f in fixes if f[0] in THREATS and seen[f[3]] is not None]
+    if not fixes:
+        return [], []
+    ids, lat, lon, ts = zip(*fixes)
+    kept = TRACKS.update_many(ids, lat, lon, ts)
+    fixes = sorted((f for f, k in zip(fixes, kept.tolist()) if k), key=lambda f: f[3])
+    moved, before = {}, []
+    with _threats_lock:
+        for tid, la, lo, t in fixes:
+            threat = THREATS.get(tid)
+            if threat is None:
+                continue
+            if tid not in moved:
+                before.append(exposure(threat))
+                moved[tid] = threat
+            threat['location'] = {'lat': la, 'lon': lo}
+            threat['last_seen'] = seen[t]
+    moved = list(moved.values())
+    ZONES.annotate(moved)
+    if moved:
+        persist_many('threats', moved)
+        shared_state.publish('positions', fixes)
+        AGGREGATES.add_exposure(before, -1)
+        AGGREGATES.add_exposure(exposure(t) for t in moved)
+    return moved, fixes
+
+def _affected_remote_ids(change):
+    """Indexed remote IDs a whitelist change can affect (all of them when ``change`` is None)."""
+    global _sorted_remote_ids
+    if change is None:
+        return list(_by_remote_id)
+    rids = [r for r in change['exact'] if r in _by_remote_id]
+    if change['prefix'] or change['ranges']:
+        if _sorted_remote_ids is None:
+            _sorted_remote_ids = sorted(_by_remote_id)
+        ordered = _sorted_remote_ids
+        for p in change['prefix']:
+            i = bisect_left(ordered, p)
+            while i < len(ordered) and ordered[i].startswith(p):
+                rids.append(ordered[i])
+                i += 1
+        for r in change['ranges']:
+            rids.extend(ordered[bisect_left(ordered, r['from']):bisect_right(ordered, r['to'])])
+    return rids
+
+def reclassify(change=None):
+    """Recompute ``authorized`` for the threats a whitelist change can affect; returns the threats that flipped."""
+    changed, before = [], []
+    with _threats_lock:
+        for rid in set(_affected_remote_ids(change)):
+            allowed = rid in WHITELIST
+            for tid in _by_remote_id[rid]:
+                t = THREATS.get(tid)
+                if t is not None and t['authorized'] != allowed:
+                    before.append(exposure(t))
+                    t['authorized'] = allowed
+                    changed.append(t)
+    if changed:
+        persist_many('threats', changed)
+        AGGREGATES.reclassify(changed)
+        AGGREGATES.add_exposure(before, -1)
+        AGGREGATES.add_exposure(exposure(t) for t in changed)
+    return changed
+
+def rezone():
+    """Reclassify every threat after the zone set changed (one vectorized pass); returns the threats whose zone changed."""
+    with _threats_lock:
+        threats = list(THREATS.values())
+        if not threats:
+            return []
+        lat = [(t.get('location') or {}).get('lat', 0) for t in threats]
+        lon = [(t.get('location') or {}).get('lon', 0) for t in threats]
+        changed, before = [], []
+        for t, label in zip(threats, ZONES.classify_many(lat, lon)):
+            if t.get('zone') != label:
+                before.append(exposure(t))
+                t['zone'] = label
+                changed.append(t)
+    if changed:
+        persist_many('threats', changed)
+        AGGREGATES.add_exposure(before, -1)
+        AGGREGATES.add_exposure(exposure(t) for t in changed)
+    return changed
+
+
+class Location(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+
+
+class ThreatIn(BaseModel):
+    """One track reported by an external sensor gateway."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    cls: str = Field('unknown', alias='class')
+    confidence: float = Field(0.5, ge=0, le=1)
+    location: Location = Location(lat=0, lon=0)
+    remote_id: Optional[str] = None
+
+
+_THREAT_LIST = TypeAdapter(List[ThreatIn])
+
+
+MAX_FIX_AHEAD_S = 60.0  # clock skew allowed for a sensor timestamp
+
+
+class PositionIn(BaseModel):
+    """One position fix for an existing threat; ``ts`` (epoch seconds) defaults to receipt time.
+
+    ``ts`` must fall within the last TRACK_TTL_S seconds (older fixes would start an already
+    expired track) and at most MAX_FIX_AHEAD_S in the future.
+    """
+    id: str
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    ts: Optional[float] = Field(default=None, allow_inf_nan=False)
+
+    @field_validator('ts')
+    @classmethod
+    def _recent(cls, ts):
+        now = time.time()
+        if ts is not None and not now - TRACK_TTL_S <= ts <= now + MAX_FIX_AHEAD_S:
+            raise ValueError(f'ts must be within {TRACK_TTL_S:.0f} s before and {MAX_FIX_AHEAD_S:.0f} s after now')
+        return ts
+
+
+_POSITION_LIST = TypeAdapter(List[PositionIn])
+
+
+def _read_bulk_items():
+    """Return a list of raw items (or Exception placeholders for unparsable NDJSON lines).
+
+    NDJSON is read in chunks and reading stops once more than MAX_BULK_ITEMS items have
+    arrived; a line over MAX_BULK_LINE_BYTES raises ValueError.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        items = []
+        buf = b''
+        while len(items) <= MAX_BULK_ITEMS:
+            chunk = request.stream.read(65536)
+            lines = (buf + chunk).split(b'\n')
+            buf = lines.pop() if chunk else b''
+            if len(buf) > MAX_BULK_LINE_BYTES or any(len(line) > MAX_BULK_LINE_BYTES for line in lines):
+                raise ValueError(f'NDJSON line longer than {MAX_BULK_LINE_BYTES} bytes')
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    items.append(loads(line))
+                except ValueError as e:
+                    items.append(e)
+            if not chunk:
+                break
+        return items
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('threats')
+    if not isinstance(data, list):
+        raise ValueError('expected a JSON array, {"threats": [...]} or NDJSON body')
+    return data
+
+
+def _validate_batch(items):
+    """Validate all items in one pass; returns ({index: ThreatIn}, {index: errors})."""
+    errors = {i: [{'msg': f'invalid JSON: {item}'}] for i, item in enumerate(items) if isinstance(item, Exception)}
+    pending = [i for i in range(len(items)) if i not in errors]
+    while pending:
+        try:
+            parsed = _THREAT_LIST.validate_python([items[i] for i in pending])
+            return dict(zip(pending, parsed)), errors
+        except ValidationError as e:
+            bad = set()
+            for err in e.errors(include_url=False, include_input=False):
+                pos = pending[err['loc'][0]]
+                bad.add(pos)
+                errors.setdefault(pos, []).append({'loc': list(err['loc'][1:]), 'msg': err['msg']})
+            pending = [i for i in pending if i not in bad]
+    return {}, errors
 
 @threats_bp.route('/', methods=['GET'])
 def list_threats():
@@ -22,41 +315,125 @@ def get_threat(threat_id):
 
 @threats_bp.route('/', methods=['POST'])
 def create_threat():
-    data = request.json or {}
+    try:
+        data = ThreatIn.model_validate(request.get_json(silent=True) or {})
+    except ValidationError as e:
+        return jsonify({'error': 'invalid_body', 'detail': e.errors(include_url=False, include_input=False, include_context=False)}), 400
     tid = str(uuid.uuid4())
-    remote_id = data.get('remote_id') or f'RID-{str(uuid.uuid4())[:6]}'
+    remote_id = data.remote_id or f'RID-{str(uuid.uuid4())[:6]}'
     threat = {
         'id': tid,
-        'class': data.get('class', 'unknown'),
-        'confidence': data.get('confidence', 0.5),
-        'location': data.get('location', {'lat':0,'lon':0}),
+        'class': data.cls,
+        'confidence': data.confidence,
+        'location': {'lat': data.location.lat, 'lon': data.location.lon},
         'status': 'detected',
         'created_at': datetime.utcnow().isoformat()+'Z',
         'remote_id': remote_id,
         'authorized': remote_id in WHITELIST
     }
-    THREATS[tid] = threat
+    add_threat(threat)
+    RECORDER.record('threats', [threat])
     return jsonify(threat), 201
 
-@threats_bp.route('/seed', methods=['POST'])
-def seed():
+def generate_seed_threats(count):
+    """Add ``count`` demo threats around the base, drawn from replay.RNG."""
     classes = ['consumer_quadcopter','prosumer_quadcopter','bird','jammer_sweep']
     generated = []
     base_lat, base_lon = 28.50, 77.60
-    for _ in range(int((request.json or {}).get('count', 6))):
-        tid = str(uuid.uuid4())
-        cls = random.choice(classes)
-        remote_id = f'RID-{str(uuid.uuid4())[:6]}'
+    for _ in range(count):
+        tid = new_id()
+        cls = RNG.choice(classes)
+        remote_id = f'RID-{new_id()[:6]}'
         threat = {
             'id': tid,
             'class': cls,
-            'confidence': round(random.uniform(0.55, 0.97),2),
-            'location': {'lat': base_lat + random.uniform(-0.01,0.01), 'lon': base_lon + random.uniform(-0.01,0.01)},
+            'confidence': round(RNG.uniform(0.55, 0.97),2),
+            'location': {'lat': base_lat + RNG.uniform(-0.01,0.01), 'lon': base_lon + RNG.uniform(-0.01,0.01)},
             'status': 'detected',
             'created_at': datetime.utcnow().isoformat()+'Z',
             'remote_id': remote_id,
             'authorized': remote_id in WHITELIST
         }
-        THREATS[tid] = threat
+        add_threat(threat)
         generated.append(threat)
+    return generated
+
+@threats_bp.route('/seed', methods=['POST'])
+def seed():
+    count = int((request.json or {}).get('count', 6))
+    RECORDER.record('threat_seed', {'count': count})
+    generated = generate_seed_threats(count)
     return jsonify({'generated': generated, 'total': len(THREATS)}), 201
+
+@threats_bp.route('/bulk', methods=['POST'])
+def bulk_ingest():
+    """Ingest many tracks at once: JSON array, {"threats": [...]}, or NDJSON (application/x-ndjson).
+
+    Returns per-item results in submission order; invalid items are rejected individually.
+    """
+    try:
+        items = _read_bulk_items()
+    except ValueError as e:
+        return jsonify({'error': 'invalid_body', 'detail': str(e)}), 400
+    if len(items) > MAX_BULK_ITEMS:
+        return jsonify({'error': 'too_many_items', 'detail': f'max {MAX_BULK_ITEMS} per request'}), 413
+    valid, errors = _validate_batch(items)
+
+    remote_ids = {i: t.remote_id or f'RID-{str(uuid.uuid4())[:6]}' for i, t in valid.items()}
+    authorized = WHITELIST.match_many(remote_ids.values())
+    now = datetime.utcnow().isoformat()+'Z'
+    created = {}
+    for i, t in valid.items():
+        rid = remote_ids[i]
+        created[i] = {
+            'id': str(uuid.uuid4()),
+            'class': t.cls,
+            'confidence': t.confidence,
+            'location': {'lat': t.location.lat, 'lon': t.location.lon},
+            'status': 'detected',
+            'created_at': now,
+            'remote_id': rid,
+            'authorized': rid in authorized
+        }
+    add_threats(list(created.values()))
+    RECORDER.record('threats', list(created.values()))
+
+    results = []
+    for i in range(len(items)):
+        if i in created:
+            results.append({'index': i, 'status': 'created', 'id': created[i]['id'], 'authorized': created[i]['authorized']})
+        else:
+            results.append({'index': i, 'status': 'rejected', 'errors': errors.get(i, [])})
+    return jsonify({'created': len(created), 'rejected': len(items) - len(created), 'results': results}), 200
+
+@threats_bp.route('/positions', methods=['POST'])
+def post_positions():
+    """Position fixes for existing threats: JSON array or {"positions": [...]} of {id, lat, lon, ts?}."""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('positions')
+    if not isinstance(data, list):
+        return jsonify({'error': 'invalid_body', 'detail': 'expected [{"id", "lat", "lon", "ts"?}, ...]'}), 400
+    if len(data) > MAX_BULK_ITEMS:
+        return jsonify({'error': 'too_many_items', 'detail': f'max {MAX_BULK_ITEMS} per request'}), 413
+    try:
+        items = _POSITION_LIST.validate_python(data)
+    except ValidationError as e:
+        return jsonify({'error': 'invalid_body', 'detail': e.errors(include_url=False, include_input=False, include_context=False)}), 400
+    now = time.time()
+    fixes = [(p.id, p.lat, p.lon, now if p.ts is None else p.ts) for p in items]
+    RECORDER.record('positions', fixes)
+    moved, kept = update_positions(fixes)
+    unknown = sum(1 for f in fixes if f[0] not in THREATS)
+    return jsonify({'accepted': len(kept), 'stale': len(fixes) - len(kept) - unknown, 'unknown': unknown,
+                    'threats_moved': len(moved)})
+
+@threats_bp.route('/<threat_id>/track', methods=['GET'])
+def get_track(threat_id):
+    """Position history of a threat and, from the interceptor's position, its predicted intercept."""
+    from .commands import DRONE_STATE
+    if threat_id not in THREATS:
+        return jsonify({'error': 'not_found'}), 404
+    loc = DRONE_STATE['location']
+    return jsonify({'id': threat_id, 'points': TRACKS.history_of(threat_id),
+                    'intercept': TRACKS.predict(threat_id, loc['lat'], loc['lon'], DRONE_STATE['speed_mps'])})
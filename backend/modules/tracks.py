@@ -0,0 +1,251 @@
+"""Threat track history, velocity estimation and intercept-point prediction.
+
+Every threat gets a track: a fixed-size ring of its last HISTORY position fixes, stored as
+rows of preallocated NumPy arrays shared by all tracks (float32 east / north metres and
+seconds relative to the track's first fix, so a track costs ~0.4 KB however long it lives).
+Rows are recycled from tracks idle for TRACK_TTL_S; the arrays double when none is free.
+
+ - update_many: one vectorized write per batch of fixes (fixes older than a track's last
+   one are dropped)
+ - velocities: least-squares line through each track's fixes of the last
+   VELOCITY_WINDOW_S, computed for all tracks at once; the fitted position at the last fix
+   doubles as a smoothed current position
+ - intercepts: for an interceptor at P flying at speed s, the earliest t with
+   |target(now + t) - P| = s * t, i.e. the smallest positive root of
+   (v.v - s^2) t^2 + 2 (d.v) t + d.d = 0, solved for every active track in one pass.
+   A track the interceptor cannot catch within MAX_INTERCEPT_S is reported unreachable,
+   with its predicted current position as the aim point
+Coordinates are local flat-earth (equirectangular) metres, fine at interception ranges.
+"""
+
+import math, threading, time
+
+import numpy as np
+
+HISTORY = 32
+VELOCITY_WINDOW_S = 30.0
+TRACK_TTL_S = 300.0
+MAX_INTERCEPT_S = 900.0
+METERS_PER_DEG = 111320.0
+
+
+class TrackStore:
+    def __init__(self, capacity=1024, history=HISTORY):
+        self._lock = threading.RLock()
+        self.history = history
+        self.rows = {}              # threat id -> row
+        self.ids = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self._alloc(capacity)
+        self.stats = {'fixes': 0, 'stale_fixes': 0, 'recycled': 0}
+
+    def _alloc(self, capacity):
+        h = self.history
+        self.origin = np.zeros((capacity, 3))                    # lat0, lon0, t0 of the first fix
+        self.east = np.zeros((capacity, h), dtype=np.float32)
+        self.north = np.zeros((capacity, h), dtype=np.float32)
+        self.dt = np.zeros((capacity, h), dtype=np.float32)
+        self.count = np.zeros(capacity, dtype=np.int64)         # fixes written (ring position = count % history)
+        self.last = np.full(capacity, -np.inf)                  # epoch of the last fix
+
+    def _grow(self):
+        old = len(self.ids)
+        arrays = (self.origin, self.east, self.north, self.dt, self.count, self.last)
+        self._alloc(old * 2)
+        for new, prev in zip((self.origin, self.east, self.north, self.dt, self.count, self.last), arrays):
+            new[:old] = prev
+        self.last[old:] = -np.inf
+        self.ids.extend([None] * old)
+        self._free.extend(range(old * 2 - 1, old - 1, -1))
+
+    def _row(self, threat_id):
+        row = self.rows.get(threat_id)
+        if row is not None:
+            return row
+        if not self._free:
+            self._grow()
+        row = self._free.pop()
+        self.rows[threat_id] = row
+        self.ids[row] = threat_id
+        self.count[row] = 0
+        self.last[row] = -np.inf
+        return row
+
+    def _recycle(self, now):
+        for row in np.flatnonzero(self.last < now - TRACK_TTL_S).tolist():
+            if self.ids[row] is not None and self.count[row]:
+                del self.rows[self.ids[row]]
+                self.ids[row] = None
+                self._free.append(row)
+                self.stats['recycled'] += 1
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, threat_id):
+        return threat_id in self.rows
+
+    def update_many(self, ids, lat, lon, ts):
+        """Append position fixes (parallel sequences); returns a bool array marking the fixes kept."""
+        if not len(ids):
+            return np.zeros(0, dtype=bool)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ts = np.broadcast_to(np.asarray(ts, dtype=np.float64), lat.shape)
+        with self._lock:
+            unknown = sum(1 for i in ids if i not in self.rows)
+            if unknown > len(self._free):
+                self._recycle(float(ts.max()))
+            rows = np.fromiter((self._row(i) for i in ids), dtype=np.int64, count=len(ids))
+            fresh = self.count[rows] == 0
+            if fresh.any():
+                # first fix of a track becomes its origin (the earliest one if a batch brings several)
+                first = np.lexsort((ts[fresh], rows[fresh]))
+                r, la, lo, t = rows[fresh][first], lat[fresh][first], lon[fresh][first], ts[fresh][first]
+                keep = np.r_[True, r[1:] != r[:-1]]
+                self.origin[r[keep]] = np.column_stack((la[keep], lo[keep], t[keep]))
+            # several fixes for one track in a batch are written in rounds, oldest first
+            order = np.lexsort((ts, rows))
+            rows, lat, lon, ts = rows[order], lat[order], lon[order], ts[order]
+            starts = np.r_[0, np.flatnonzero(rows[1:] != rows[:-1]) + 1]
+            rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+            kept = np.zeros(len(rows), dtype=bool)
+            for r in range(int(rank.max()) + 1):
+                sel = np.flatnonzero(rank == r)
+                rr, la, lo, t = rows[sel], lat[sel], lon[sel], ts[sel]
+                ok = t > self.last[rr]
+                kept[order[sel[ok]]] = True
+                rr, la, lo, t = rr[ok], la[ok], lo[ok], t[ok]
+                o = self.origin[rr]
+                pos = self.count[rr] % self.history
+                self.north[rr, pos] = (la - o[:, 0]) * METERS_PER_DEG
+                self.east[rr, pos] = (lo - o[:, 1]) * METERS_PER_DEG * np.cos(np.radians(o[:, 0]))
+                self.dt[rr, pos] = t - o[:, 2]
+                self.count[rr] += 1
+                self.last[rr] = t
+            self.stats['fixes'] += int(kept.sum())
+            self.stats['stale_fixes'] += len(ids) - int(kept.sum())
+            return kept
+
+    def history_of(self, threat_id):
+        """Fixes of one track, oldest first: [{'t', 'lat', 'lon'}]."""
+        with self._lock:
+            row = self.rows.get(threat_id)
+            if row is None:
+                return []
+            n = int(self.count[row])
+            idx = [i % self.history for i in range(max(0, n - self.history), n)]
+            lat0, lon0, t0 = self.origin[row]
+            kx = METERS_PER_DEG * math.cos(math.radians(lat0))
+            return [{'t': round(t0 + float(self.dt[row, i]), 3),
+                     'lat': lat0 + float(self.north[row, i]) / METERS_PER_DEG,
+                     'lon': lon0 + float(self.east[row, i]) / kx} for i in idx]
+
+    def active_rows(self, now=None):
+        now = time.time() if now is None else now
+        return np.flatnonzero(self.last >= now - TRACK_TTL_S)
+
+    def estimate(self, rows):
+        """Vectorized (lat, lon, t, v_east, v_north) at each track's last fix, velocity in m/s."""
+        rows = np.asarray(rows, dtype=np.int64)
+        n = self.count[rows]
+        t = self.dt[rows].astype(np.float64)
+        x = self.east[rows].astype(np.float64)
+        y = self.north[rows].astype(np.float64)
+        o = self.origin[rows]
+        t_last = self.last[rows] - o[:, 2]
+        slots = np.arange(self.history)
+        w = ((slots[None, :] < n[:, None]) & (t >= t_last[:, None] - VELOCITY_WINDOW_S)).astype(np.float64)
+        sw = w.sum(axis=1)
+        tm = (w * t).sum(axis=1) / sw
+        xm = (w * x).sum(axis=1) / sw
+        ym = (w * y).sum(axis=1) / sw
+        tc = w * (t - tm[:, None])
+        var = (tc * (t - tm[:, None])).sum(axis=1)
+        moving = var > 1e-9
+        safe = np.where(moving, var, 1.0)
+        vx = np.where(moving, (tc * (x - xm[:, None])).sum(axis=1) / safe, 0.0)
+        vy = np.where(moving, (tc * (y - ym[:, None])).sum(axis=1) / safe, 0.0)
+        # fitted position at the last fix (the plain mean when there is a single fix)
+        px = xm + vx * (t_last - tm)
+        py = ym + vy * (t_last - tm)
+        lat = o[:, 0] + py / METERS_PER_DEG
+        lon = o[:, 1] + px / (METERS_PER_DEG * np.cos(np.radians(o[:, 0])))
+        return lat, lon, self.last[rows], vx, vy
+
+    def intercepts(self, rows, lat, lon, speed, now=None):
+        """Vectorized intercept solutions for ``rows`` from an interceptor at (lat, lon) flying ``speed`` m/s.
+
+        Returns a dict of arrays: lat, lon (aim point), time_to_go_s, reachable, plus the
+        track estimate (v_east, v_north, est_lat, est_lon at ``now``).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            tlat, tlon, t_fix, vx, vy = self.estimate(rows)
+        kx = METERS_PER_DEG * math.cos(math.radians(lat))
+        age = np.maximum(0.0, now - t_fix)
+        dx = (tlon - lon) * kx + vx * age
+        dy = (tlat - lat) * METERS_PER_DEG + vy * age
+        a = vx * vx + vy * vy - speed * speed
+        b = 2 * (dx * vx + dy * vy)
+        c = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            disc = b * b - 4 * a * c
+            root = np.sqrt(np.maximum(disc, 0.0))
+            r1 = (-b - root) / (2 * a)
+            r2 = (-b + root) / (2 * a)
+            linear = np.where(b < 0, -c / b, np.inf)  # target exactly as fast as the interceptor
+        r1 = np.where(r1 >= 0, r1, np.inf)
+        r2 = np.where(r2 >= 0, r2, np.inf)
+        tgo = np.where(np.abs(a) < 1e-9, linear, np.where(disc >= 0, np.minimum(r1, r2), np.inf))
+        tgo = np.where(c == 0, 0.0, tgo)
+        reachable = tgo <= MAX_INTERCEPT_S
+        tgo = np.where(reachable, tgo, 0.0)
+        ax, ay = dx + vx * tgo, dy + vy * tgo
+        return {'lat': lat + ay / METERS_PER_DEG, 'lon': lon + ax / kx, 'time_to_go_s': tgo,
+                'reachable': reachable, 'v_east': vx, 'v_north': vy,
+                'est_lat': lat + dy / METERS_PER_DEG, 'est_lon': lon + dx / kx}
+
+    def predict(self, threat_id, lat, lon, speed, now=None):
+        """Intercept solution for one threat (None without a track, or when its last fix is older than TRACK_TTL_S)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self.rows.get(threat_id)
+            if row is None or self.last[row] < now - TRACK_TTL_S:
+                return None
+            out = self.intercepts([row], lat, lon, speed, now)
+        return _solutions([threat_id], out)[0]
+
+    def predict_all(self, lat, lon, speed, now=None, limit=None):
+        """Intercept solutions for every active track, reachable ones soonest first.
+
+        Returns (active track count, the first ``limit`` solutions).
+        """
+        with self._lock:
+            rows = self.active_rows(now)
+            out = self.intercepts(rows, lat, lon, speed, now)
+            ids = [self.ids[r] for r in rows.tolist()]
+        order = np.lexsort((out['time_to_go_s'], ~out['reachable']))[:limit]
+        return len(ids), _solutions([ids[i] for i in order.tolist()], {k: v[order] for k, v in out.items()})
+
+    def clear(self):
+        with self._lock:
+            self.__init__(len(self.ids), self.history)
+
+
+def _solutions(ids, out):
+    """Solution dicts from intercepts() arrays (rounded in bulk)."""
+    cols = [np.round(out[k], d).tolist() for k, d in (('lat', 7), ('lon', 7), ('time_to_go_s', 2), ('est_lat', 7),
+                                                       ('est_lon', 7), ('v_east', 2), ('v_north', 2))]
+    speed = np.round(np.hypot(out['v_east'], out['v_north']), 2).tolist()
+    return [{
+        'threat_id': tid,
+        'reachable': ok,
+        'point': {'lat': la, 'lon': lo},
+        'time_to_go_s': tgo if ok else None,
+        'threat_position': {'lat': ela, 'lon': elo},
+        'threat_velocity': {'east_mps': ve, 'north_mps': vn, 'speed_mps': sp},
+    } for tid, ok, la, lo, tgo, ela, elo, ve, vn, sp in zip(ids, out['reachable'].tolist(), *cols, speed)]
+
+
+TRACKS = TrackStore()
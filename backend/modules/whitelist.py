@@ -0,0 +1,177 @@
+"""Airspace whitelist rules: exact remote IDs, ID prefixes and operator ID ranges.
+
+ - exact:  hash set
+ - prefix: set of prefixes plus the sorted list of distinct prefix lengths; a lookup
+           tries one slice per length (a hashed trie: a handful of set probes, however
+           many prefixes are loaded)
+ - range:  inclusive ``[from, to]`` serial blocks assigned to an operator, compared as
+           strings (so serials should be fixed width); overlapping blocks are merged into
+           a sorted interval index searched with bisect
+
+A change is a dict ``{'exact': [...], 'prefix': [...], 'ranges': [{'from', 'to', 'operator'}]}``.
+The same shape is published to other workers, recorded for replay and used to find the
+threats a change can affect (see threats.reclassify).
+"""
+
+from bisect import bisect_right
+import threading
+
+
+def normalize_change(data):
+    """Validate a change (a bare list means exact IDs); raises ValueError."""
+    if isinstance(data, (list, tuple)):
+        data = {'exact': data}
+    if not isinstance(data, dict):
+        raise ValueError('expected {"exact": [...], "prefix": [...], "ranges": [...]}')
+    exact = data.get('exact') or []
+    prefix = data.get('prefix') or []
+    ranges = data.get('ranges') or []
+    if not all(isinstance(x, list) for x in (exact, prefix, ranges)):
+        raise ValueError('exact, prefix and ranges must be arrays')
+    if not all(isinstance(r, str) and r for r in exact + prefix):
+        raise ValueError('remote IDs and prefixes must be non-empty strings')
+    out = []
+    for r in ranges:
+        if isinstance(r, (list, tuple)) and len(r) in (2, 3):
+            r = dict(zip(('from', 'to', 'operator'), r))
+        if not isinstance(r, dict) or not isinstance(r.get('from'), str) or not isinstance(r.get('to'), str):
+            raise ValueError('ranges must be {"from": str, "to": str, "operator"?: str}')
+        if not r['from'] or r['from'] > r['to']:
+            raise ValueError(f"empty range {r['from']!r}..{r['to']!r}")
+        out.append({'from': r['from'], 'to': r['to'], 'operator': r.get('operator')})
+    return {'exact': list(dict.fromkeys(exact)), 'prefix': list(dict.fromkeys(prefix)), 'ranges': out}
+
+
+class WhitelistRules:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exact = set()
+        self.prefixes = set()
+        self.ranges = {}            # (from, to) -> operator
+        self._lengths = []          # distinct prefix lengths, ascending
+        self._index = ([], [])      # merged (starts, ends), swapped in whole
+
+    def __contains__(self, remote_id):
+        if not isinstance(remote_id, str):
+            return False
+        if remote_id in self.exact:
+            return True
+        if self._lengths:
+            prefixes = self.prefixes
+            for n in self._lengths:
+                if n > len(remote_id):
+                    break
+                if remote_id[:n] in prefixes:
+                    return True
+        starts, ends = self._index
+        if starts:
+            i = bisect_right(starts, remote_id) - 1
+            return i >= 0 and remote_id <= ends[i]
+        return False
+
+    def __len__(self):
+        return len(self.exact) + len(self.prefixes) + len(self.ranges)
+
+    def match_many(self, remote_ids):
+        """The subset of ``remote_ids`` that is authorized."""
+        remote_ids = set(remote_ids)
+        matched = remote_ids & self.exact
+        if self._lengths or self._index[0]:
+            matched.update(r for r in remote_ids - matched if r in self)
+        return matched
+
+    def explain(self, remote_id):
+        """The rule that authorizes ``remote_id``, or None."""
+        if remote_id in self.exact:
+            return {'type': 'exact', 'remote_id': remote_id}
+        for n in self._lengths:
+            if remote_id[:n] in self.prefixes:
+                return {'type': 'prefix', 'prefix': remote_id[:n]}
+        for (lo, hi), operator in sorted(self.ranges.items()):
+            if lo <= remote_id <= hi:
+                return {'type': 'range', 'from': lo, 'to': hi, 'operator': operator}
+        return None
+
+    def add_rules(self, change):
+        """Add a normalized change; returns the part of it that was not already present."""
+        with self._lock:
+            added = {'exact': [r for r in change['exact'] if r not in self.exact],
+                     'prefix': [p for p in change['prefix'] if p not in self.prefixes],
+                     'ranges': [r for r in change['ranges'] if (r['from'], r['to']) not in self.ranges]}
+            self.exact.update(added['exact'])
+            self.prefixes.update(added['prefix'])
+            self.ranges.update(((r['from'], r['to']), r['operator']) for r in added['ranges'])
+            self._reindex(added)
+        return added
+
+    def remove_rules(self, change):
+        """Remove a normalized change; returns the part of it that was present."""
+        with self._lock:
+            removed = {'exact': [r for r in change['exact'] if r in self.exact],
+                       'prefix': [p for p in change['prefix'] if p in self.prefixes],
+                       'ranges': [dict(r, operator=self.ranges[(r['from'], r['to'])])
+                                  for r in change['ranges'] if (r['from'], r['to']) in self.ranges]}
+            self.exact.difference_update(removed['exact'])
+            self.prefixes.difference_update(removed['prefix'])
+            for r in removed['ranges']:
+                del self.ranges[(r['from'], r['to'])]
+            self._reindex(removed)
+        return removed
+
+    def replace_rules(self, change):
+        with self._lock:
+            self.exact = set(change['exact'])
+            self.prefixes = set(change['prefix'])
+            self.ranges = {(r['from'], r['to']): r['operator'] for r in change['ranges']}
+            self._reindex(None)
+        return change
+
+    def _reindex(self, change):
+        if change is None or change['prefix']:
+            self._lengths = sorted({len(p) for p in self.prefixes})
+        if change is None or change['ranges']:
+            starts, ends = [], []
+            for lo, hi in sorted(self.ranges):
+                if starts and lo <= ends[-1]:
+                    ends[-1] = max(ends[-1], hi)
+                else:
+                    starts.append(lo)
+                    ends.append(hi)
+            self._index = (starts, ends)
+
+    def to_change(self):
+        with self._lock:
+            return {'exact': sorted(self.exact), 'prefix': sorted(self.prefixes),
+                    'ranges': [{'from': lo, 'to': hi, 'operator': op} for (lo, hi), op in sorted(self.ranges.items())]}
+
+    def copy(self):
+        other = WhitelistRules()
+        other.replace_rules(self.to_change())
+        return other
+
+    def load(self, other):
+        """Replace this rule set's contents with another's (snapshots keep the WHITELIST object)."""
+        self.replace_rules(other.to_change())
+
+    def summary(self):
+        return {'exact': len(self.exact), 'prefixes': len(self.prefixes), 'ranges': len(self.ranges),
+                'merged_ranges': len(self._index[0]), 'total': len(self)}
+
+    # pickled to/from the shared state server without the lock
+    def __getstate__(self):
+        return self.to_change()
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.replace_rules(state)
+
+
+def apply_change(rules, mode, change):
+    """Apply ``change`` to ``rules`` by mode (add / remove / replace); returns the effective change."""
+    if mode == 'add':
+        return rules.add_rules(change)
+    if mode == 'remove':
+        return rules.remove_rules(change)
+    if mode == 'replace':
+        return rules.replace_rules(change)
+    raise ValueError(f'unknown mode {mode!r}')
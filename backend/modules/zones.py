@@ -0,0 +1,253 @@
+"""Airspace zones: restricted areas, buffers around them and approved corridors.
+
+A zone is a polygon (``[[lat, lon], ...]``, or a circle given as ``center`` + ``radius_m``)
+with a kind and a severity (defaults: restricted 1.0, buffer 0.5, corridor 0.0). A point's
+classification is the most severe restricted / buffer zone containing it, plus whether it
+lies in any corridor. Coordinates are treated as planar lon/lat, which is fine at
+zone scale.
+
+Two lookup paths share one immutable ZoneIndex, rebuilt and swapped in whole when the
+zone set changes:
+ - single points (each new threat, each interceptor position update): a uniform grid over
+   the zone bounding boxes gives the few candidate zones, then an even-odd ray cast
+ - arrays of points (bulk ingest, zone changes, /zones/classify): points are sorted by
+   longitude once; each zone's bounding box selects a contiguous slice with searchsorted,
+   the latitude test trims it, and the even-odd test runs vectorized over the survivors
+   one polygon edge at a time
+"""
+
+import math, threading, uuid
+
+import numpy as np
+
+KINDS = ('restricted', 'buffer', 'corridor')
+DEFAULT_SEVERITY = {'restricted': 1.0, 'buffer': 0.5, 'corridor': 0.0}
+CIRCLE_VERTICES = 32
+GRID_MAX = 32
+METERS_PER_DEG_LAT = 111320.0
+
+
+def _vertices(doc):
+    if doc.get('center') is not None:
+        c, r = doc['center'], float(doc.get('radius_m', 0))
+        if r <= 0:
+            raise ValueError('radius_m must be positive')
+        lat0, lon0 = float(c['lat']), float(c['lon'])
+        dlat = r / METERS_PER_DEG_LAT
+        dlon = dlat / max(1e-6, math.cos(math.radians(lat0)))
+        return [[lat0 + dlat * math.sin(a), lon0 + dlon * math.cos(a)]
+                for a in (2 * math.pi * k / CIRCLE_VERTICES for k in range(CIRCLE_VERTICES))]
+    poly = doc.get('polygon')
+    if not isinstance(poly, list) or len(poly) < 3:
+        raise ValueError('polygon needs at least 3 [lat, lon] vertices (or give center + radius_m)')
+    out = []
+    for v in poly:
+        lat, lon = (v['lat'], v['lon']) if isinstance(v, dict) else v
+        out.append([float(lat), float(lon)])
+    if out[0] == out[-1]:
+        out.pop()  # closed rings are accepted, stored open
+    if len(out) < 3:
+        raise ValueError('polygon needs at least 3 distinct vertices')
+    return out
+
+
+def normalize_zone(doc):
+    """Validate one zone document; raises ValueError."""
+    if not isinstance(doc, dict):
+        raise ValueError('zone must be an object')
+    kind = doc.get('kind', 'restricted')
+    if kind not in KINDS:
+        raise ValueError(f'kind must be one of {KINDS}')
+    try:
+        vertices = _vertices(doc)
+        severity = float(doc.get('severity', DEFAULT_SEVERITY[kind]))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f'invalid zone geometry: {e}')
+    if not 0 <= severity <= 1:
+        raise ValueError('severity must be between 0 and 1')
+    if not all(-90 <= lat <= 90 and -180 <= lon <= 180 for lat, lon in vertices):
+        raise ValueError('vertex out of range')
+    return {'id': str(doc.get('id') or uuid.uuid4()), 'name': doc.get('name'), 'kind': kind,
+            'severity': severity, 'polygon': vertices}
+
+
+def _inside(x, y, ring):
+    """Even-odd test of one point against [(lon, lat), ...]."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < xi + (y - yi) * (xj - xi) / (yj - yi):
+            inside = not inside
+        j = i
+    return inside
+
+
+class ZoneIndex:
+    def __init__(self, zones):
+        self.zones = zones
+        n = len(zones)
+        self.rings = [[(lon, lat) for lat, lon in z['polygon']] for z in zones]
+        self.severity = np.array([z['severity'] for z in zones], dtype=np.float32)
+        self.corridor = np.array([z['kind'] == 'corridor' for z in zones], dtype=bool)
+        self.bbox = np.array([[min(p[0] for p in r), min(p[1] for p in r), max(p[0] for p in r), max(p[1] for p in r)]
+                              for r in self.rings]).reshape(n, 4)
+        # edges as arrays (x1, y1, y2, dx/dy); horizontal edges never cross a ray and are dropped
+        self.edges = []
+        for r in self.rings:
+            a = np.array(r)
+            b = np.roll(a, -1, axis=0)
+            keep = a[:, 1] != b[:, 1]
+            a, b = a[keep], b[keep]
+            self.edges.append((a[:, 0], a[:, 1], b[:, 1], (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])))
+        self._build_grid()
+
+    def _build_grid(self):
+        self.cells = {}
+        if not len(self.zones):
+            self.grid = None
+            return
+        x0, y0 = self.bbox[:, 0].min(), self.bbox[:, 1].min()
+        x1, y1 = self.bbox[:, 2].max(), self.bbox[:, 3].max()
+        g = max(1, min(GRID_MAX, 2 * math.ceil(math.sqrt(len(self.zones)))))
+        cw, ch = (x1 - x0) / g or 1.0, (y1 - y0) / g or 1.0
+        self.grid = (x0, y0, cw, ch, g)
+        for z, (bx0, by0, bx1, by1) in enumerate(self.bbox):
+            for i in range(min(g - 1, int((bx0 - x0) / cw)), min(g - 1, int((bx1 - x0) / cw)) + 1):
+                for j in range(min(g - 1, int((by0 - y0) / ch)), min(g - 1, int((by1 - y0) / ch)) + 1):
+                    self.cells.setdefault((i, j), []).append(z)
+
+    def containing(self, lat, lon):
+        """Indices of the zones containing one point."""
+        if self.grid is None:
+            return []
+        x0, y0, cw, ch, g = self.grid
+        i, j = (lon - x0) / cw, (lat - y0) / ch
+        if not (0 <= i <= g and 0 <= j <= g):
+            return []
+        out = []
+        for z in self.cells.get((min(g - 1, int(i)), min(g - 1, int(j))), ()):
+            bx0, by0, bx1, by1 = self.bbox[z]
+            if bx0 <= lon <= bx1 and by0 <= lat <= by1 and _inside(lon, lat, self.rings[z]):
+                out.append(z)
+        return out
+
+    def classify_many(self, lat, lon):
+        """Vectorized classification: (severity float32, top zone index int32 or -1, in corridor bool)."""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        n = len(lon)
+        order = np.argsort(lon, kind='stable')
+        xs, ys = lon[order], lat[order]
+        best = np.full(n, -1.0, dtype=np.float32)
+        top = np.full(n, -1, dtype=np.int32)
+        corridor = np.zeros(n, dtype=bool)
+        lo_all = np.searchsorted(xs, self.bbox[:, 0], 'left')
+        hi_all = np.searchsorted(xs, self.bbox[:, 2], 'right')
+        for z in range(len(self.zones)):
+            lo, hi = lo_all[z], hi_all[z]
+            if lo == hi:
+                continue
+            yy = ys[lo:hi]
+            idx = np.flatnonzero((yy >= self.bbox[z, 1]) & (yy <= self.bbox[z, 3])) + lo
+            if not idx.size:
+                continue
+            px, py = xs[idx], ys[idx]
+            inside = np.zeros(idx.size, dtype=bool)
+            x1, y1, y2, slope = self.edges[z]
+            for k in range(len(x1)):
+                inside ^= ((y1[k] > py) != (y2[k] > py)) & (px < x1[k] + (py - y1[k]) * slope[k])
+            idx = idx[inside]
+            if self.corridor[z]:
+                corridor[idx] = True
+                # a corridor is the top zone only where no other zone is; -0.5 ranks it below any severity
+                idx = idx[best[idx] < -0.5]
+                best[idx] = -0.5
+                top[idx] = z
+            else:
+                upd = idx[self.severity[z] > best[idx]]
+                best[upd] = self.severity[z]
+                top[upd] = z
+        out_sev = np.empty(n, dtype=np.float32)
+        out_top = np.empty(n, dtype=np.int32)
+        out_cor = np.empty(n, dtype=bool)
+        out_sev[order], out_top[order], out_cor[order] = np.maximum(best, 0), top, corridor
+        return out_sev, out_top, out_cor
+
+
+class ZoneSet:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = ZoneIndex([])
+
+    def __len__(self):
+        return len(self.index.zones)
+
+    def to_list(self):
+        return list(self.index.zones)
+
+    def replace(self, zones):
+        with self._lock:
+            self.index = ZoneIndex(list(zones))
+
+    def add(self, zones):
+        with self._lock:
+            ids = {z['id'] for z in zones}
+            self.index = ZoneIndex([z for z in self.index.zones if z['id'] not in ids] + list(zones))
+
+    def remove(self, zone_id):
+        with self._lock:
+            keep = [z for z in self.index.zones if z['id'] != zone_id]
+            if len(keep) == len(self.index.zones):
+                return False
+            self.index = ZoneIndex(keep)
+            return True
+
+    def _label(self, index, z, in_corridor):
+        if z < 0:
+            return None
+        zone = index.zones[z]
+        return {'id': zone['id'], 'kind': zone['kind'],
+                'severity': 0.0 if zone['kind'] == 'corridor' else zone['severity'], 'corridor': bool(in_corridor)}
+
+    def classify(self, lat, lon):
+        """Zone label for one point (None outside every zone)."""
+        index = self.index
+        hits = index.containing(lat, lon)
+        if not hits:
+            return None
+        in_corridor = any(index.corridor[z] for z in hits)
+        severe = [z for z in hits if not index.corridor[z]]
+        top = max(severe, key=lambda z: index.severity[z]) if severe else hits[0]
+        return self._label(index, top, in_corridor)
+
+    def classify_many(self, lat, lon):
+        """Zone labels for arrays of points."""
+        index = self.index
+        if not len(index.zones):
+            return [None] * len(lat)
+        _, top, corridor = index.classify_many(lat, lon)
+        return [self._label(index, z, c) for z, c in zip(top.tolist(), corridor.tolist())]
+
+    def annotate(self, threats):
+        """Set ``zone`` on threat docs (vectorized for batches); no-op while no zones are defined."""
+        if not len(self):
+            return threats
+        if len(threats) < 8:
+            for t in threats:
+                loc = t.get('location') or {}
+                t['zone'] = self.classify(loc.get('lat', 0), loc.get('lon', 0))
+            return threats
+        lat = [(t.get('location') or {}).get('lat', 0) for t in threats]
+        lon = [(t.get('location') or {}).get('lon', 0) for t in threats]
+        for t, label in zip(threats, self.classify_many(lat, lon)):
+            t['zone'] = label
+        return threats
+
+    def summary(self):
+        zones = self.index.zones
+        return {'zones': len(zones), **{k: sum(1 for z in zones if z['kind'] == k) for k in KINDS}}
+
+
+ZONES = ZoneSet()
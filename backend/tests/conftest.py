@@ -0,0 +1,17 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def headers():
+    from modules.auth import issue_token
+    return {'Authorization': f"Bearer {issue_token('supervisor', ['operator', 'supervisor'])}"}
@@ -0,0 +1,139 @@
+import threading, time, uuid
+
+import pytest
+
+from modules import command_queue
+from modules.command_queue import CommandPipeline, IdempotencyConflict, QueueFull
+from modules.commands import COMMAND_LOG, DRONE_STATE, PIPELINE
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    written = []
+    monkeypatch.setattr(command_queue, 'append_events', written.extend)
+    return written
+
+
+def _pipeline(applied, **kwargs):
+    pipeline = CommandPipeline(**kwargs)
+
+    def handler(command_id, params):
+        return {'n': params['n']}, [('command_test', {'n': params['n']})], lambda: applied.append(params['n'])
+
+    pipeline.register('test', handler)
+    return pipeline
+
+
+def test_commands_are_applied_in_submission_order(ledger):
+    applied = []
+    pipeline = _pipeline(applied, batch_size=4)
+    ids = [pipeline.submit('test', {'n': n})[0]['id'] for n in range(50)]
+    assert pipeline.drain(timeout=5)
+    assert applied == list(range(50))
+    assert [payload['n'] for _, payload in ledger] == list(range(50))
+    assert all(pipeline.get(i)['status'] == 'applied' for i in ids)
+    assert pipeline.get(ids[7])['result'] == {'n': 7}
+
+
+def test_repeated_idempotency_key_returns_the_original_command(ledger):
+    applied = []
+    pipeline = _pipeline(applied)
+    first, created = pipeline.submit('test', {'n': 1}, idempotency_key='k', fingerprint='f1')
+    again, created_again = pipeline.submit('test', {'n': 1}, idempotency_key='k', fingerprint='f1')
+    assert (created, created_again) == (True, False)
+    assert again['id'] == first['id']
+    pipeline.drain(timeout=5)
+    assert applied == [1] and pipeline.stats['deduplicated'] == 1
+
+
+def test_reused_key_with_a_different_fingerprint_is_refused(ledger):
+    pipeline = _pipeline([])
+    first, _ = pipeline.submit('test', {'n': 1}, idempotency_key='k', fingerprint='f1')
+    with pytest.raises(IdempotencyConflict) as e:
+        pipeline.submit('test', {'n': 2}, idempotency_key='k', fingerprint='f2')
+    assert e.value.command_id == first['id']
+
+
+def test_keys_shared_between_pipelines_deduplicate_across_them(ledger):
+    held = {}
+
+    class Keys:
+        def claim(self, key, value):
+            owner = held.get(key)
+            if owner is None:
+                held[key] = value
+            return owner
+
+        def release(self, key, value):
+            if held.get(key) == value:
+                del held[key]
+
+    applied = []
+    a, b = _pipeline(applied, keys=Keys()), _pipeline(applied, keys=Keys())
+    first, _ = a.submit('test', {'n': 1}, idempotency_key='k', fingerprint='f1')
+    record, created = b.submit('test', {'n': 1}, idempotency_key='k', fingerprint='f1')
+    assert not created and record['id'] == first['id']
+    with pytest.raises(IdempotencyConflict):
+        b.submit('test', {'n': 2}, idempotency_key='k', fingerprint='f2')
+    a.drain(timeout=5)
+    b.drain(timeout=5)
+    assert applied == [1]
+
+
+def test_failed_ledger_write_applies_nothing(monkeypatch):
+    def fail(events):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(command_queue, 'append_events', fail)
+    applied = []
+    pipeline = _pipeline(applied)
+    record, _ = pipeline.submit('test', {'n': 1})
+    pipeline.drain(timeout=5)
+    assert applied == []
+    record = pipeline.get(record['id'])
+    assert record['status'] == 'failed' and record['error'].startswith('ledger_write_failed')
+
+
+def test_full_queue_is_refused_and_releases_the_key(ledger):
+    gate = threading.Event()
+
+    def guard():
+        gate.wait(5)
+        return command_queue.nullcontext()
+
+    pipeline = _pipeline([], max_pending=1, batch_size=1, guard=guard)
+    pipeline.submit('test', {'n': 0})   # taken by the worker, which waits on the gate
+    while pipeline.pending():
+        time.sleep(0.001)
+    pipeline.submit('test', {'n': 1})   # fills the queue
+    with pytest.raises(QueueFull):
+        pipeline.submit('test', {'n': 2}, idempotency_key='k', fingerprint='f')
+    gate.set()
+    pipeline.drain(timeout=5)
+    assert pipeline.submit('test', {'n': 2}, idempotency_key='k', fingerprint='f')[1]
+
+
+def test_api_idempotency_replay_and_mismatch(client, headers, ledger):
+    key = {'Idempotency-Key': str(uuid.uuid4()), **headers}
+    first = client.post('/api/commands/return', headers=key)
+    again = client.post('/api/commands/return', headers=key)
+    assert (first.status_code, again.status_code) == (202, 200)
+    assert first.get_json()['id'] == again.get_json()['id']
+    resp = client.post('/api/commands/abort', headers=key)
+    assert resp.status_code == 422 and resp.get_json()['error'] == 'idempotency_key_reused'
+    resp = client.post('/api/commands/dispatch', json={'threat_id': 'x', 'coordinates': {'lat': 1, 'lon': 2}}, headers=key)
+    assert resp.status_code == 422
+
+
+def test_api_command_is_not_applied_when_the_ledger_write_fails(client, headers, monkeypatch):
+    def fail(events):
+        raise OSError('disk full')
+
+    PIPELINE.drain(timeout=5)
+    monkeypatch.setattr(command_queue, 'append_events', fail)
+    before_log, before_status = len(COMMAND_LOG), DRONE_STATE['status']
+    resp = client.post('/api/commands/dispatch', json={'coordinates': {'lat': 28.6, 'lon': 77.7}}, headers=headers)
+    record = client.get(f"{resp.get_json()['status_url']}?wait=5", headers=headers).get_json()
+    assert record['status'] == 'failed' and 'ledger_write_failed' in record['error']
+    assert len(COMMAND_LOG) == before_log and DRONE_STATE['status'] == before_status
+    assert DRONE_STATE['target_location'] != {'lat': 28.6, 'lon': 77.7}
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from modules.mqtt_bridge import LocalBroker, MQTTBridge, decode_detections, encode_detections
+from modules.threats import THREATS, WHITELIST
+from modules.whitelist import normalize_change
+
+RID = 'RID-abc123'
+
+
+@pytest.fixture
+def bridge():
+    broker = LocalBroker()
+    client = broker.client()
+    bridge = MQTTBridge(client, linger_ms=1)
+    client.connect()
+    bridge.start()
+    change = normalize_change([RID])
+    WHITELIST.add_rules(change)
+    yield broker, bridge
+    bridge.stop()
+    WHITELIST.remove_rules(change)
+
+
+@pytest.mark.parametrize('fmt, encode', [('compact', encode_detections),
+                                          ('json', lambda docs: json.dumps(docs).encode())])
+def test_whitelisted_remote_id_survives_the_bridge(bridge, fmt, encode):
+    broker, bridge = bridge
+    sensor = f'test-{fmt}'
+    broker.publish(f'kavach/sensors/{sensor}/detections',
+                   encode([{'class': 'drone', 'confidence': 0.95, 'lat': 28.5, 'lon': 77.6, 'remote_id': RID}]))
+    bridge.drain()
+    threats = [t for t in THREATS.values() if t.get('source') == f'mqtt:{sensor}']
+    assert [(t['remote_id'], t['authorized']) for t in threats] == [(RID, True)]
+    assert bridge.stats['decode_errors'] == 0
+
+
+def test_oversize_remote_id_is_rejected():
+    long_rid = 'X' * 33
+    with pytest.raises(ValueError):
+        encode_detections([{'class': 'drone', 'remote_id': long_rid}])
+    with pytest.raises(ValueError):
+        decode_detections(json.dumps([{'class': 'drone', 'remote_id': long_rid}]).encode())
+
+
+def test_failing_batch_is_counted_and_ingestion_continues(bridge, monkeypatch):
+    broker, bridge = bridge
+    process = bridge._process
+    calls = []
+
+    def flaky(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        process(batch)
+
+    monkeypatch.setattr(bridge, '_process', flaky)
+    payload = encode_detections([{'class': 'drone', 'confidence': 0.95, 'lat': 28.5, 'lon': 77.6}])
+    broker.publish('kavach/sensors/test-flaky/detections', payload)
+    bridge.drain()
+    broker.publish('kavach/sensors/test-flaky/detections', payload)
+    bridge.drain()
+    assert bridge.stats['batch_errors'] == 1
+    assert bridge.stats['batches'] == 1
+    assert bridge._consumer.is_alive()
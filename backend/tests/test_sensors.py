@@ -0,0 +1,29 @@
+import pytest
+
+from modules.threats import THREATS
+
+
+@pytest.mark.parametrize('body, loc', [
+    ({'vision': ['drone']}, ['vision', 0]),
+    ({'vision': [{'class': 'drone', 'confidence': 2}]}, ['vision', 0, 'confidence']),
+    ({'vision': [{'class': 'drone', 'confidence': 0.9}], 'location': {'lat': 'x', 'lon': 77.6}}, ['location', 'lat']),
+    ({'vision': [{'class': 'drone', 'confidence': 0.9}], 'remote_id': 5}, ['remote_id']),
+    ({'rf': {'iq_b64': '', 'sample_rate_hz': 5}}, ['rf', 'sample_rate_hz']),
+    ({'audio': {'pcm_b64': '', 'sample_rate_hz': 12345}}, ['audio', 'sample_rate_hz']),
+])
+def test_malformed_analyze_payloads_are_rejected(client, headers, body, loc):
+    before = len(THREATS)
+    resp = client.post('/api/sensors/analyze', json=body, headers=headers)
+    assert resp.status_code == 400
+    assert resp.get_json()['error'] == 'invalid_input'
+    assert [e['loc'] for e in resp.get_json()['detail']] == [loc]
+    assert len(THREATS) == before
+
+
+def test_vision_detection_raises_a_threat_at_the_given_location(client, headers):
+    resp = client.post('/api/sensors/analyze', headers=headers, json={
+        'vision': [{'class': 'drone', 'confidence': 0.99}], 'location': {'lat': 28.51, 'lon': 77.61}, 'remote_id': 'RID-sens'})
+    assert resp.status_code == 200
+    threat = resp.get_json()['threat']
+    assert threat['location'] == {'lat': 28.51, 'lon': 77.61} and threat['remote_id'] == 'RID-sens'
+    assert THREATS[threat['id']]['source'] == 'sensor_fusion'
@@ -0,0 +1,117 @@
+import os, stat, tempfile, threading, time, uuid
+
+import pytest
+
+from modules.shared_state import SharedState, StateServer, apply_op, parse_address, start_server
+from modules.threats import THREATS
+
+
+@pytest.fixture
+def server():
+    s = StateServer(log_size=3)
+    yield s
+    s.close()
+
+
+def _doc(**fields):
+    return {'id': f'test-ss-{uuid.uuid4()}', 'class': 'drone', 'confidence': 0.9, 'location': {'lat': 0, 'lon': 0},
+            'status': 'detected', 'created_at': '2026-01-01T00:00:00Z', 'remote_id': None, 'authorized': False, **fields}
+
+
+def test_log_replays_ops_then_falls_back_to_a_snapshot(server):
+    a, b = _doc(), _doc()
+    server.publish('w1', [('threats', [a])])
+    server.publish('w2', [('threats', [b]), ('commands', [{'id': 'c1'}])])
+    mode, ops, head = server.since(0)
+    assert (mode, head) == ('ops', 3)
+    assert [(seq, origin, kind) for seq, origin, kind, _ in ops] == [(1, 'w1', 'threats'), (2, 'w2', 'threats'),
+                                                                     (3, 'w2', 'commands')]
+    assert server.since(3) == ('ops', [], 3)
+    server.publish('w1', [('commands', [{'id': 'c2'}])])  # log holds 3 ops: seq 1 has been dropped
+    mode, state, head = server.since(0)
+    assert (mode, head) == ('snapshot', 4)
+    assert set(state['threats']) == {a['id'], b['id']}
+    assert [c['id'] for c in state['commands']] == ['c1', 'c2']
+
+
+def test_ledger_is_one_chain_across_workers(server):
+    first = server.ledger_append('w1', [('e', {'timestamp': 't1'})])
+    second = server.ledger_append('w2', [('e', {'timestamp': 't2'}), ('e', {'timestamp': 't3'})])
+    entries = first + second
+    assert [e['id'] for e in entries] == [1, 2, 3]
+    assert entries[0]['prev_chain_hash'] == '0' * 64
+    assert all(b['prev_chain_hash'] == a['chain_hash'] for a, b in zip(entries, entries[1:]))
+
+
+def test_command_keys_are_held_until_released_by_their_holder(server):
+    assert server.claim_key('k', 'cmd-1') is None
+    assert server.claim_key('k', 'cmd-2') == 'cmd-1'
+    server.release_key('k', 'cmd-2')
+    assert server.claim_key('k', 'cmd-3') == 'cmd-1'
+    server.release_key('k', 'cmd-1')
+    assert server.claim_key('k', 'cmd-3') is None
+
+
+def test_command_lease_is_exclusive_and_expires(server):
+    assert server.acquire_commands('w1', timeout=0)
+    assert not server.acquire_commands('w2', timeout=0.05)
+    waiter = threading.Thread(target=lambda: results.append(server.acquire_commands('w2', timeout=5)))
+    results = []
+    waiter.start()
+    time.sleep(0.05)
+    server.release_commands('w1')
+    waiter.join()
+    assert results == [True]
+    server.release_commands('w1')  # not the holder: no effect
+    assert not server.acquire_commands('w1', timeout=0)
+    server.release_commands('w2')
+    assert server.acquire_commands('w1', timeout=0, ttl=0.05)
+    assert server.acquire_commands('w2', timeout=1)  # w1's lease expired
+
+
+def test_drone_state_from_before_the_latest_command_is_ignored():
+    state = {'drone_state': None}
+    apply_op(state, 'drone_state', [{'status': 'en_route', 'last_command_at': '2026-01-01T00:00:02Z'}])
+    apply_op(state, 'drone_state', [{'status': 'idle', 'last_command_at': '2026-01-01T00:00:01Z'}])
+    assert state['drone_state']['status'] == 'en_route'
+    apply_op(state, 'drone_state', [{'status': 'on_station', 'last_command_at': '2026-01-01T00:00:02Z'}])
+    assert state['drone_state']['status'] == 'on_station'
+
+
+@pytest.mark.parametrize('address, expected', [('/tmp/s.sock', '/tmp/s.sock'), ('127.0.0.1:5000', ('127.0.0.1', 5000)),
+                                                ('localhost:5000', ('localhost', 5000)), ('[::1]:5000', ('::1', 5000))])
+def test_loopback_and_unix_addresses_are_accepted(address, expected):
+    assert parse_address(address) == expected
+
+
+@pytest.mark.parametrize('address', ['0.0.0.0:5000', '10.1.2.3:5000', 'example.com:5000', '[::]:5000'])
+def test_non_loopback_tcp_addresses_are_refused(address):
+    with pytest.raises(ValueError):
+        parse_address(address)
+
+
+@pytest.mark.parametrize('authkey', [None, ''])
+def test_server_and_workers_refuse_to_start_without_an_authkey(authkey):
+    sock = os.path.join(tempfile.mkdtemp(), 'state.sock')
+    with pytest.raises(ValueError):
+        start_server(sock, authkey)
+    with pytest.raises(ValueError):
+        SharedState(sock, authkey)
+
+
+def test_writes_published_by_one_worker_reach_another():
+    sock = os.path.join(tempfile.mkdtemp(), 'state.sock')
+    manager = start_server(sock, 'test-secret')
+    try:
+        assert stat.S_IMODE(os.stat(sock).st_mode) == 0o600
+        writer, reader = SharedState(sock, 'test-secret'), SharedState(sock, 'test-secret')
+        doc = _doc()
+        writer.publish('threats', [doc])
+        assert reader.head() == 1 and doc['id'] not in THREATS
+        reader.sync()
+        assert THREATS[doc['id']] == doc
+        assert (reader.seq, reader.stats['synced_ops']) == (1, 1)
+        with pytest.raises(Exception):
+            SharedState(sock, 'wrong-secret')
+    finally:
+        manager.shutdown()
@@ -0,0 +1,81 @@
+import math, time
+
+import pytest
+
+from modules.commands import DRONE_STATE
+from modules.threats import THREATS, add_threat, update_positions
+from modules.tracks import METERS_PER_DEG, TRACK_TTL_S, TrackStore
+
+BASE = (28.5, 77.6)
+KX = METERS_PER_DEG * math.cos(math.radians(BASE[0]))
+
+
+def _fly(store, tid, x0, y0, vx, vy, t0, fixes=10):
+    """Constant-velocity target starting (x0, y0) metres from BASE, one fix per second."""
+    for k in range(fixes):
+        store.update_many([tid], [BASE[0] + (y0 + vy * k) / METERS_PER_DEG], [BASE[1] + (x0 + vx * k) / KX], t0 + k)
+    return t0 + fixes - 1
+
+
+def _threat(location):
+    threat = {'id': f'test-track-{len(THREATS)}', 'class': 'drone', 'confidence': 0.9, 'location': location,
+              'status': 'detected', 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+              'remote_id': None, 'authorized': False}
+    return add_threat(threat)
+
+
+def test_velocity_and_intercept_point():
+    store = TrackStore()
+    now = _fly(store, 'a', 2000.0, 0.0, -10.0, 5.0, 1.7e9)
+    s = store.predict('a', *BASE, 25.0, now=now)
+    assert s['reachable']
+    assert s['threat_velocity']['east_mps'] == pytest.approx(-10.0, abs=0.01)
+    assert s['threat_velocity']['north_mps'] == pytest.approx(5.0, abs=0.01)
+    # the target meets the interceptor at the aim point after time_to_go_s
+    tgo = s['time_to_go_s']
+    x, y = 2000.0 - 10.0 * (9 + tgo), 5.0 * (9 + tgo)
+    px, py = (s['point']['lon'] - BASE[1]) * KX, (s['point']['lat'] - BASE[0]) * METERS_PER_DEG
+    assert math.hypot(x - px, y - py) < 1.0
+    assert math.hypot(px, py) == pytest.approx(25.0 * tgo, rel=1e-3)
+
+
+def test_faster_target_running_away_is_unreachable():
+    store = TrackStore()
+    now = _fly(store, 'a', 2000.0, 0.0, 40.0, 0.0, 1.7e9)
+    s = store.predict('a', *BASE, 25.0, now=now)
+    assert not s['reachable'] and s['time_to_go_s'] is None
+    assert (s['point']['lon'] - BASE[1]) * KX == pytest.approx(2000.0 + 40.0 * 9, abs=1.0)
+
+
+def test_stale_fixes_are_dropped_and_expired_tracks_not_extrapolated():
+    store = TrackStore()
+    now = _fly(store, 'a', 1000.0, 0.0, 10.0, 0.0, 1.7e9)
+    assert not store.update_many(['a'], [BASE[0]], [BASE[1]], now - 5).any()
+    assert store.stats['stale_fixes'] == 1
+    assert store.predict('a', *BASE, 25.0, now=now + TRACK_TTL_S) is not None
+    assert store.predict('a', *BASE, 25.0, now=now + TRACK_TTL_S + 1) is None
+    count, solutions = store.predict_all(*BASE, 25.0, now=now + TRACK_TTL_S + 1)
+    assert (count, solutions) == (0, [])
+
+
+def test_unparsable_location_inserts_threat_without_track():
+    from modules.tracks import TRACKS
+    threat = _threat({'lat': 'x', 'lon': 77.6})
+    assert THREATS[threat['id']] is threat
+    assert threat['id'] not in TRACKS
+
+
+def test_dispatch_flies_to_last_location_when_intercept_is_unreachable(client, headers, monkeypatch):
+    threat = _threat({'lat': BASE[0], 'lon': BASE[1] + 0.05})
+    # zigzag fixes: the fitted (aim) position is off the last reported location
+    now = time.time()
+    update_positions([(threat['id'], BASE[0] + 0.001 * (k % 2), BASE[1] + 0.05 + 0.001 * k, now - 5 + k)
+                      for k in range(5)])
+    monkeypatch.setitem(DRONE_STATE, 'speed_mps', 0.001)
+    resp = client.post('/api/commands/dispatch', json={'threat_id': threat['id']}, headers=headers)
+    assert resp.status_code == 202
+    record = client.get(f"{resp.get_json()['status_url']}?wait=5", headers=headers).get_json()
+    assert record['status'] == 'applied'
+    assert record['result']['extra']['coordinates'] == threat['location']
+    assert record['result']['extra']['coordinates'] != DRONE_STATE['intercept']['point']
+    assert DRONE_STATE['intercept']['reachable'] is False
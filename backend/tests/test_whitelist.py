@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from modules.threats import THREATS, add_threats
+from modules.whitelist import WhitelistRules, normalize_change
+
+
+def _rules(**change):
+    rules = WhitelistRules()
+    rules.add_rules(normalize_change(change))
+    return rules
+
+
+def test_exact_prefix_and_range_rules():
+    rules = _rules(exact=['RID-A'], prefix=['FA3-', 'FA3-XY'],
+                   ranges=[{'from': 'SN-0100', 'to': 'SN-0199', 'operator': 'a'},
+                           {'from': 'SN-0150', 'to': 'SN-0250', 'operator': 'b'}])
+    assert 'RID-A' in rules and 'RID-AB' not in rules
+    assert 'FA3-1234' in rules and 'FA3' not in rules
+    assert 'SN-0100' in rules and 'SN-0225' in rules and 'SN-0250' in rules
+    assert 'SN-0099' not in rules and 'SN-0251' not in rules
+    assert rules.summary()['merged_ranges'] == 1
+    assert rules.match_many(['RID-A', 'FA3-9', 'SN-0300', 'nope']) == {'RID-A', 'FA3-9'}
+    assert rules.explain('SN-0120') == {'type': 'range', 'from': 'SN-0100', 'to': 'SN-0199', 'operator': 'a'}
+    assert rules.explain('FA3-1') == {'type': 'prefix', 'prefix': 'FA3-'}
+
+
+def test_removed_rules_stop_matching():
+    rules = _rules(prefix=['FA3-'], ranges=[['SN-1', 'SN-5']])
+    rules.remove_rules(normalize_change({'prefix': ['FA3-'], 'ranges': [['SN-1', 'SN-5']]}))
+    assert 'FA3-1' not in rules and 'SN-3' not in rules and len(rules) == 0
+
+
+@pytest.mark.parametrize('rid', [123, None, 1.5, b'SN-1'])
+def test_non_string_ids_never_match(rid):
+    rules = _rules(exact=['123'], prefix=['1'], ranges=[['0', 'z']])
+    assert rid not in rules
+    assert rules.match_many([rid]) == set()
+
+
+@pytest.mark.parametrize('change', [{'exact': [123]}, {'prefix': ['']}, {'ranges': [['b', 'a']]}, {'exact': 'x'}])
+def test_invalid_changes_are_rejected(change):
+    with pytest.raises(ValueError):
+        normalize_change(change)
+
+
+def _threats(rids):
+    docs = [{'id': f'test-wl-{uuid.uuid4()}', 'class': 'drone', 'confidence': 0.9, 'location': {'lat': 0, 'lon': 0},
+             'status': 'detected', 'created_at': '2026-01-01T00:00:00Z', 'remote_id': rid, 'authorized': False}
+            for rid in rids]
+    return add_threats(docs)
+
+
+def test_rule_changes_reclassify_only_matching_threats(client, headers):
+    tag = uuid.uuid4().hex[:6].upper()
+    threats = _threats([f'P{tag}-1', f'P{tag}-2', f'S{tag}-05', f'S{tag}-50', f'X{tag}'])
+    change = {'prefix': [f'P{tag}-'], 'ranges': [{'from': f'S{tag}-00', 'to': f'S{tag}-09'}]}
+    resp = client.post('/api/airspace/whitelist/rules', json=change, headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['reclassified'] == 3
+    assert [THREATS[t['id']]['authorized'] for t in threats] == [True, True, True, False, False]
+    resp = client.post('/api/airspace/whitelist/rules?mode=remove', json=change, headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['reclassified'] == 3
+    assert not any(THREATS[t['id']]['authorized'] for t in threats)
+
+
+def test_integer_remote_ids_are_rejected_and_do_not_break_rule_changes(client, headers):
+    resp = client.post('/api/threats/', json={'remote_id': 12345}, headers=headers)
+    assert resp.status_code == 400
+    resp = client.post('/api/airspace/whitelist', json={'remote_id': 12345}, headers=headers)
+    assert resp.status_code == 400
+    # a non-string ID stored by an older build or another path is skipped by the index
+    _threats([12345])
+    change = {'prefix': ['INT-TEST-'], 'ranges': [['INT-A', 'INT-B']]}
+    assert client.post('/api/airspace/whitelist/rules', json=change, headers=headers).status_code == 200
+    assert client.post('/api/airspace/whitelist/rules?mode=remove', json=change, headers=headers).status_code == 200
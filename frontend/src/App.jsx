@@ -142,18 +142,10 @@ function App() {
     setClassDist(arr);
   };
 
-  const exportEvidence = async () => {
-    try {
-      const r = await axios.get(`${API}/evidence/bundle`);
-      const bstr = atob(r.data.base64);
-      const bytes = new Uint8Array(bstr.length);
-      for (let i=0;i<bstr.length;i++) bytes[i] = bstr.charCodeAt(i);
-      const blob = new Blob([bytes], {type:'application/zip'});
-      const url = URL.createObjectURL(blob);
-      const a = document.createElement('a');
-      a.href = url; a.download = r.data.filename; a.click();
-      URL.revokeObjectURL(url);
-    } catch(e){console.error(e);}  
+  const exportEvidence = () => {
+    // Server streams the zip (application/zip, Content-Disposition: attachment)
+    const a = document.createElement('a');
+    a.href = `${API}/evidence/bundle`; a.click();
   };
 
   const corruptLedger = async () => {